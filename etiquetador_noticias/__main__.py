@@ -0,0 +1,4 @@
+import sys
+from etiquetador_noticias.cli import main
+
+sys.exit(main())
@@ -1 +1,5 @@
-from etiquetador_noticias.analyser.analyser import *
\ No newline at end of file
+from etiquetador_noticias.analyser.analyser import *
+from etiquetador_noticias.analyser.cache import ArticleCache
+from etiquetador_noticias.analyser.result import AnalysisResult
+from etiquetador_noticias.analyser.relabel import TermIndex
+from etiquetador_noticias.analyser.store import ResultStore
@@ -1,15 +1,11 @@
 import os
-import spacy
-import es_core_news_md
-import nltk
-nltk.download('punkt')
-from newspaper import Article
-import pkg_resources
-import pandas as pd
-import numpy as np
-import re
-from bs4 import BeautifulSoup
-from etiquetador_noticias.tjtool import ReporterExtractor, SpacyReporterExtractor, Entities
+# newspaper, pandas and spacy are imported on first use, they are slow to import
+from etiquetador_noticias.tjtool import ReporterExtractor, SpacyReporterExtractor, TriageExtractor, Entities
+from etiquetador_noticias.resources import registry
+from etiquetador_noticias.profiling import stage
+from etiquetador_noticias.analyser.cache import ArticleCache, content_hash
+from etiquetador_noticias.analyser.result import (AnalysisResult, classify, banner_message,
+                                                  reporters_message, publi_message)
 
 # THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 this_dir, this_filename = os.path.split(__file__)
@@ -23,6 +19,14 @@ class Analyser():
         The url to the article to be analysed and labelled
     variant : str, optional
         The variant of the tree used to classify the article. Allowed values are "seria" or "gamberra" (default is "seria")
+    html : str, optional
+        The html of the article when it has already been downloaded. If given, the url is not fetched again
+    cache : ArticleCache, optional
+        On-disk cache of downloaded and parsed articles. Cached articles are neither downloaded nor parsed again
+    extractor : ReporterExtractor or SpacyReporterExtractor, optional
+        The extractor of the reporters, entities and sources, which can be shared by many analysers (default is a new extractor of the engine)
+    engine : str, optional
+        The extractor used without extractor: "full" parses the whole text (ReporterExtractor) and "triage" estimates the sources with the gazetteers and parses only the articles near the boundary of the category (TriageExtractor). Default is "full"
     Returns
     -------
     Full report in text form
@@ -32,163 +36,294 @@ class Analyser():
     >>> from etiquetador_noticias.analyser import Analyser
     >>> url = "https://www.news_article_url"
     >>> Analyser(url)
+
+    To re-label articles offline keep them in a cache, or read a saved html:
+
+    >>> cache = ArticleCache("articles.sqlite")
+    >>> Analyser(url, cache=cache)
+    >>> Analyser.from_file(url, "article.html")
+
+    The whole analysis is returned as an AnalysisResult:
+
+    >>> result = Analyser(url).analyse()
+    >>> result.category, result.to_json()
+    >>> print(result.render_report())
+
+    To label large corpora faster, with the triage engine:
+
+    >>> result = Analyser(url, engine="triage").analyse()
+
+    To analyse many articles at once use the batch entry point:
+
+    >>> for record in Analyser.analyse_many([url1, url2]):
+    ...     print(record["url"], record["category"])
     """
-    __has_data = False # to avoid load the data once and again
+    ENGINES = ("full", "triage")
 
-    def __init__(self, url, variant="seria"):
+    def __init__(self, url, variant="seria", html=None, cache=None, extractor=None, engine="full"):
         # inputs
         self.url = url
+        self.extractor = extractor
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, use one of {self.ENGINES}")
+        self.engine = engine
         if not isinstance(variant, str) or variant not in ["seria","gamberra"]:
             raise TypeError("""The parameter 'variant' of the tree must be a string containing 
                 the name of the  desired variant. Allowed values are "seria" or "gamberra".""")
         self.variant = variant
-        # load spanish model
-        self._nlp = es_core_news_md.load()
         # load data
         self._load_data()
         
         # initalize article
-        self.article = Article(self.url)
-        # download and parse article
-        self.article.download()
-        self.article.parse()
+        with stage('article') as article_stage:
+            from newspaper import Article
+            self.article = Article(self.url)
+            cached = None
+            if cache is not None:
+                with stage('article_cache') as s:
+                    cached = cache.get(self.url) if html is None else cache.get_by_hash(content_hash(html))
+                    s.cache_hit = cached is not None
+            if cached is not None:
+                self._load_cached(cached)
+            else:
+                # download (unless the html is given) and parse article
+                with stage('article_download') as s:
+                    self.article.download(input_html=html)
+                    s.sizes['bytes'] = len(self.article.html or '')
+                with stage('newspaper_parse') as s:
+                    self.article.parse()
+                    s.sizes['chars'] = len(self.article.text)
+                if cache is not None:
+                    cache.put(self.url, self.article.html, self.article.text,
+                              self.article.authors, self.article.publish_date)
+        self._article_seconds = article_stage.wall
         # store basic info
         self.text = self.article.text
         self.source_url = self.article.source_url
-        if self.source_url in self.df_url_media.media_url.tolist():
-            self.recognized_media = True
-        else:
-            self.recognized_media = False
-            
+        # O(1) lookup of the media by the domain of the article
+        self.media_record = self.media_index.lookup(self.source_url or self.url)
+        self.recognized_media = self.media_record is not None
         if self.recognized_media:
-            self.media_name = self.df_url_media.loc[self.df_url_media.media_url==self.source_url,'media_name'].iloc[0]
+            self.media_name = self.media_record.media_name
         else:
             self.media_name = self.source_url
 
             
+    def _load_cached(self, cached):
+        """Cargar un articulo de la cache sin descargarlo ni parsearlo.
+        """
+        self.article.download(input_html=cached.html)
+        self.article.set_text(cached.text)
+        self.article.set_authors(cached.authors)
+        if cached.publish_date:
+            from dateutil.parser import parse as parse_date
+            self.article.publish_date = parse_date(cached.publish_date)
+        self.article.is_parsed = True
+
+    @classmethod
+    def from_file(cls, url, path, variant="seria", **kwargs):
+        """Analizar un articulo guardado en un fichero html.
+
+        Parameters
+        ----------
+        url : str
+            The url of the article, used to recognize the media
+        path : str
+            The html file
+        """
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        return cls(url, variant=variant, html=html, **kwargs)
+
+    @classmethod
+    def analyse_many(cls, items, variant="seria", **kwargs):
+        """Analizar muchos articulos en paralelo.
+
+        Parameters
+        ----------
+        items : iterable
+            URLs, (url, html) pairs or {"url": ..., "html": ...} dicts
+        variant : str, optional
+            The variant of the tree used to classify the articles
+        **kwargs
+            Options for etiquetador_noticias.analyser.batch.analyse_many
+
+        Returns
+        -------
+        Generator of dict records, in completion order
+        """
+        from etiquetador_noticias.analyser.batch import analyse_many
+        return analyse_many(items, variant=variant, **kwargs)
+
     def _load_data(self):
         """Cargar los datos necesarios.
         """
-        if not self.__has_data:
-            table_file = os.path.join(this_dir, "data", "tabla_de_inversores_y_grandes_anunciantes.xlsx")
-            self.df_fin = pd.read_excel(table_file)
-            self.df_url_media = self.df_fin[["media_name","media_url"]].drop_duplicates()
-            self.__has_data = True
+        # the compiled index of the media is shared by every analyser of the process
+        self.media_index = registry.media_index()
+
+    @property
+    def df_fin(self):
+        """The investors table as a DataFrame (loaded with pandas on first use).
+        """
+        return registry.investors()
+
+    @property
+    def df_url_media(self):
+        """The (media_name, media_url) pairs of the investors table as a DataFrame.
+        """
+        return registry.media()
 
         
+    def _find_banners(self):
+        """Return the BannerMatch of the article.
+        """
+        return registry.banner_detector().detect(self.article.html, self.source_url or self.url)
+
+    def _find_reporters(self):
+        """Return the reporters, entities and sources of the article text.
+        """
+        extractor = self.extractor
+        if extractor is None:
+            extractor = TriageExtractor() if self.engine == "triage" else ReporterExtractor()
+        extractor.parse(self.article.text)
+        return extractor.get_reporters(), extractor.get_entities(), extractor.get_sources()
+
+    def _find_publi(self, ignore_case=False, ignore_accents=False):
+        """Return the investors and advertisers of the media mentioned in the
+        article, their types and the count and offsets of the mentions.
+        """
+        if not self.recognized_media:
+            return [], [], {}
+        # single scan of the article for all the pat_entities of the media
+        matcher = registry.sponsor_matcher(self.media_record.media_url, ignore_case, ignore_accents)
+        matches = matcher.search(self.article.text)
+        detected = [(ele, pat_type) for ele, pat_type in self.media_record.sponsors if ele in matches]
+        return [ele for ele, _ in detected], [pat_type for _, pat_type in detected], matches
+
+    def analyse(self, ignore_case=False, ignore_accents=False):
+        """Analizar el articulo y devolver un AnalysisResult.
+
+        Runs every stage once, without printing nor changing the analyser,
+        and records the seconds spent in each of them. The stages are also
+        reported to the enabled profiler (see etiquetador_noticias.profiling).
+
+        Parameters
+        ----------
+        ignore_case : bool, optional
+            Match the investors and advertisers regardless of upper/lower case
+        ignore_accents : bool, optional
+            Match the investors and advertisers regardless of accents
+        """
+        with stage('banners', bytes=len(self.article.html or '')) as banners_stage:
+            banners = self._find_banners()
+
+        with stage('reporters', chars=len(self.article.text)) as reporters_stage:
+            reporters, entities, sources = self._find_reporters()
+            translate = registry.entities()
+            reporters_plus = translate.describe_many(reporters)
+            entities_plus = translate.describe_many(entities)
+            sources_plus = translate.describe_many(sources)
+            reporters_stage.sizes['entities'] = len(reporters) + len(entities) + len(sources)
+
+        with stage('publi', chars=len(self.article.text)) as publi_stage:
+            detected_pat, detected_pat_types, _ = self._find_publi(ignore_case, ignore_accents)
+
+        with stage('category') as category_stage:
+            num_total_sources = len(reporters) + len(sources)
+            category = classify(self.variant, banners.sponsored, bool(detected_pat), num_total_sources)
+
+        timings = {'article': self._article_seconds,
+                   'banners': banners_stage.wall,
+                   'reporters': reporters_stage.wall,
+                   'publi': publi_stage.wall,
+                   'category': category_stage.wall}
+        publish_date = self.article.publish_date
+        return AnalysisResult(
+            url=self.url,
+            source_url=self.source_url,
+            variant=self.variant,
+            media_name=self.media_name,
+            recognized_media=self.recognized_media,
+            publish_date=publish_date.isoformat() if publish_date else None,
+            authors=list(self.article.authors),
+            sponsored=banners.sponsored,
+            sponsor=banners.sponsor,
+            banner_rules=banners.media_rules,
+            reporters=reporters_plus,
+            entities=entities_plus,
+            sources=sources_plus,
+            num_total_sources=num_total_sources,
+            pub_text=bool(detected_pat),
+            detected_pat=detected_pat,
+            detected_pat_types=detected_pat_types,
+            category=category,
+            timings=timings)
+
     def detect_banners(self):
         """Detectar si el articulo es explicitamente publicitario.
+
+        The badges of sponsored articles are looked up with the rules of the
+        media declared in analyser/data/banner_rules.json. Only the media
+        that opt in are checked for the common markers such as
+        "patrocinado por".
         """
-        if self.media_name=="EL PAÍS":
-            soup = BeautifulSoup(self.article.html, 'html5lib')
-            self.pat_list = []
-            try:
-                res = soup.find_all('a',{"class","badge_link"})[0]
-                detected_text = self._nlp(res.get_text(separator=" "))
-                self.pat_list = [ent for ent in detected_text.ents]
-                self.pat = True
-                self.pat_out_msg = f"\n- Hemos detectado que este es un articulo patrocinado por {detected_text.ents[0]}\n"
-            except:
-                self.pat = False
-                self.pat_out_msg = "\n- No hemos detectado patrocinio explicito\n"
-        else:
-            self.pat = False
-            self.pat_out_msg = f"\n- De momento no tenemos un método para detectar patrocinio explicito en el medio {self.source_url} :(\n"
+        found = self._find_banners()
+        self.pat = found.sponsored
+        self.pat_list = [found.sponsor] if found.sponsor else []
+        self.pat_out_msg = banner_message(found.sponsored, found.sponsor, found.media_rules, self.source_url)
             
     def detect_reporters(self):
         """Detectar fuentes utilizando la herramienta de TJTool.
         """
-        extractor = ReporterExtractor()
-        translate = Entities()
-        extractor.parse(self.article.text)
-        self.reporters = extractor.get_reporters()
-        self.entities = extractor.get_entities()
-        self.sources = extractor.get_sources()
+        translate = registry.entities()
+        self.reporters, self.entities, self.sources = self._find_reporters()
         
-        fd = lambda x: translate.getFullDescription(x)
-        self.reporters_plus = list(map(fd, extractor.get_reporters()))
-        self.entities_plus = list(map(fd, extractor.get_entities()))
-        self.sources_plus = list(map(fd, extractor.get_sources()))
+        self.reporters_plus = translate.describe_many(self.reporters)
+        self.entities_plus = translate.describe_many(self.entities)
+        self.sources_plus = translate.describe_many(self.sources)
         # count reporters and sources
         self.num_reporters = len(self.reporters)
         self.num_sources = len(self.sources)
         self.total_sources = self.reporters + self.sources
         self.num_total_sources = self.num_reporters + self.num_sources
         
-        self.reporters_out_msg = f"- Hemos encontrado {self.num_total_sources} fuente(s) en el artículo:\n"
+        self.reporters_out_msg = reporters_message(self.num_total_sources)
 
         
-    def detect_publi_in_text(self):
+    def detect_publi_in_text(self, ignore_case=False, ignore_accents=False):
         """Detectar si el articulo habla sobre uno de los grandes patrocinadores o inversores del medio.
+
+        All the investors and advertisers of the media are searched at once
+        with an automaton that is built only once per media. The count and
+        the offsets of every mention are stored in detected_pat_matches.
+
+        Parameters
+        ----------
+        ignore_case : bool, optional
+            Match the names regardless of upper/lower case (default is False)
+        ignore_accents : bool, optional
+            Match the names regardless of accents (default is False)
         """
-        self.pub_text = False
+        detected, types, matches = self._find_publi(ignore_case, ignore_accents)
+        self.pub_text = bool(detected)
+        self.pub_text_out_msg = publi_message(self.recognized_media, detected, types,
+                                              self.media_name, self.source_url)
         if self.recognized_media:
-            # select pat_entitites related to media
-            df_fin_media = self.df_fin[self.df_fin.media_url==self.source_url]            
-            self.detected_pat = []
-            # check if the pat_entity is contained in the article
-            for ele in df_fin_media.pat_entity.tolist():
-                if ele in self.article.text:
-                    pat_type = df_fin_media[df_fin_media.pat_entity==ele].pat_type.iloc[0]
-                    self.pub_text_out_msg = f"\n- Hemos detectado que este articulo habla sobre {ele}, que es un {pat_type} de {self.media_name}\n"
-                    self.detected_pat.append(ele)
-                    self.pub_text = True
-            if not self.detected_pat: 
-                self.pub_text_out_msg = f"\n- No hemos detectado que este articulo hable sobre algún gran anunciante o inversor de {self.media_name}\n"
-                    
+            self.detected_pat_matches = matches
+            self.detected_pat = detected
             return self.detected_pat
-        else:
-            self.pub_text_out_msg = f"\n- De momento no tenemos información sobre los financiadores del medio {self.source_url} :(\n"
             
 
     def get_category(self):
-        # si tiene patrocinio explicito...
-        if self.pat:
-            # variante seria
-            if self.variant == "seria":
-                # si contiene publicidad en el texto es publicidad
-                if self.pub_text:
-                    self.category = "Publicidad"
-                # si no contiene publicidad en el texto es contenido patrocinado
-                else:
-                    self.category = "Contenido Patrocinado"
-            # variante gamberra: si tiene patrocinio es publicidad
-            else:    
-                self.category = "Publicidad"
-        # si no tiene patrocinio explicito...
-        else:
-            if self.num_total_sources > 2:
-                # si tiene más de dos fuentes pero habla de un inversor o gran anunciante es publicidad encubierta
-                if self.pub_text:
-                    self.category = "Publicidad Encubierta"
-                # si tiene más de dos fuentes pero NO habla de un inversor o gran anunciante es información
-                else:
-                    self.category = "Información"
-            else:
-                # si tiene menos de dos fuentes pero habla de un inversor o gran anunciante es publicidad encubierta
-                if self.pub_text:
-                    self.category = "Publicidad Encubierta"
-                # si tiene menos de dos fuentes pero NO habla de un inversor o gran anunciante es contenido parcial
-                else:
-                    self.category = "Contenido Parcial"
-                    
+        self.category = classify(self.variant, self.pat, self.pub_text, self.num_total_sources)
         return self.category
                 
        
     def full_report(self):
-        print("------------------------FULL REPORT---------------------\n")
-        date = self.article.publish_date.strftime("%d-%m-%Y %H:%M:%S")
-        print(f"Fecha de publicación: {date}\n")
-        print(f"Autores:")
-        print(self.article.authors)
-        print("\n------------------\n")
-        self.detect_banners()
-        print(self.pat_out_msg)
-        self.detect_reporters()
-        print(self.reporters_out_msg)
-        print(self.total_sources)
-        self.detect_publi_in_text()
-        print(self.pub_text_out_msg)
-        print("------------------\n")
-        self.get_category()
-        print(f"\nEl artículo ha sido clasificado como {self.category}\n")
\ No newline at end of file
+        """Imprimir el informe completo del articulo.
+
+        The report is rendered from analyse(), whose result is kept in
+        self.result.
+        """
+        self.result = self.analyse()
+        print(self.result.render_report())
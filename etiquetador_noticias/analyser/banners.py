@@ -0,0 +1,206 @@
+import os
+import re
+import json
+from collections import namedtuple
+from html.parser import HTMLParser
+
+from etiquetador_noticias.analyser.media_index import domain_of, domain_candidates
+
+
+this_dir, this_filename = os.path.split(__file__)
+
+BANNER_RULES = os.path.join(this_dir, "data", "banner_rules.json")
+
+# sponsored: whether the article is explicitly sponsored
+# sponsor: the name of the sponsor, when it could be read
+# method: "media" for a rule of the media, "fallback" for the shared markers
+# media_rules: whether the media has rules of its own
+BannerMatch = namedtuple('BannerMatch', ['sponsored', 'sponsor', 'method', 'media_rules'])
+
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+              'link', 'meta', 'source', 'track', 'wbr'}
+_HIDDEN_TAGS = {'script', 'style', 'noscript', 'template', 'svg'}
+# text blocks longer than this are article text, not labels
+_MAX_LABEL = 100
+# paragraphs shorter than this do not count as article body
+_MIN_PARAGRAPH = 40
+
+
+class _StopScan(Exception):
+    pass
+
+
+class _BannerScanner(HTMLParser):
+    """ Scan the html up to the first badge of the selectors or up to the
+    first max_paragraphs paragraphs of the body, collecting the short text
+    blocks on the way.
+    """
+
+    def __init__(self, selectors, max_paragraphs):
+        super().__init__(convert_charrefs=True)
+        self.selectors = selectors
+        self.max_paragraphs = max_paragraphs
+        self.badge = None
+        self.labels = []
+        self._paragraphs = 0
+        self._paragraph = []
+        self._hidden = 0
+        self._capture = None  # [tag, depth, text parts]
+        self._block = []
+
+    def scan(self, html):
+        try:
+            self.feed(html)
+            self.close()
+        except _StopScan:
+            pass
+        self._flush()
+        return self
+
+    def _matches(self, selector, tag, attrs):
+        if selector.get('tag', tag) != tag:
+            return False
+        attrs = dict(attrs)
+        if 'class' in selector and selector['class'] not in (attrs.get('class') or '').split():
+            return False
+        for name, value in selector.get('attrs', {}).items():
+            if attrs.get(name) != value:
+                return False
+        return True
+
+    def _flush(self):
+        text = ' '.join(''.join(self._block).split())
+        self._block = []
+        if text and len(text) <= _MAX_LABEL:
+            self.labels.append(text)
+
+    def _finish_badge(self, text):
+        self.badge = ' '.join(text.split())
+        raise _StopScan()
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _HIDDEN_TAGS:
+            self._hidden += 1
+            return
+        self._flush()
+        if self._capture is not None:
+            if tag == self._capture[0]:
+                self._capture[1] += 1
+            elif tag == 'img':
+                self._capture[2].append(dict(attrs).get('alt') or '')
+            return
+        if tag == 'p':
+            self._paragraph = []
+        for selector in self.selectors:
+            if self._matches(selector, tag, attrs):
+                attrs = dict(attrs)
+                label = attrs.get('title') or attrs.get('aria-label') or attrs.get('alt') or ''
+                if tag in _VOID_TAGS:
+                    self._finish_badge(label)
+                self._capture = [tag, 1, [], label]
+                return
+
+    def handle_endtag(self, tag):
+        if tag in _HIDDEN_TAGS:
+            self._hidden = max(self._hidden - 1, 0)
+            return
+        self._flush()
+        if self._capture is not None:
+            if tag == self._capture[0]:
+                self._capture[1] -= 1
+                if self._capture[1] == 0:
+                    text = ' '.join(''.join(self._capture[2]).split())
+                    self._finish_badge(text or self._capture[3])
+            return
+        if tag == 'p' and len(''.join(self._paragraph).strip()) >= _MIN_PARAGRAPH:
+            self._paragraphs += 1
+            if self._paragraphs >= self.max_paragraphs:
+                raise _StopScan()
+
+    def handle_data(self, data):
+        if self._hidden:
+            return
+        if self._capture is not None:
+            self._capture[2].append(data)
+            return
+        self._block.append(data)
+        self._paragraph.append(data)
+
+
+class BannerDetector(object):
+    """Detector de patrocinio explicito en la cabecera de los articulos.
+
+    The rules are declared in a JSON file. Every media can declare
+    selectors (tag, class and attributes) of the badge that marks its
+    sponsored articles. Media whose rules set "fallback" to true, every
+    media of the investors table in the default rules, are also checked
+    for the shared markers, such as "patrocinado por" or "publirreportaje",
+    in the short text blocks (labels, kickers, bylines) of the page; the
+    markers are never searched in the pages of the other media, where a
+    paragraph or a menu link would mark every article. The
+    html is scanned with the standard library parser and the scan stops at
+    the badge or after the first paragraphs of the article body.
+
+    Parameters
+    ----------
+    rules_file : str, optional
+        The JSON file of rules (default is analyser/data/banner_rules.json)
+
+    Examples
+    --------
+    >>> detector = BannerDetector()
+    >>> detector.detect('<a class="badge_link">Ofrecido por Banco X</a>', "https://elpais.com")
+    BannerMatch(sponsored=True, sponsor='Banco X', method='media', media_rules=True)
+    """
+
+    def __init__(self, rules_file=None):
+        self.rules_file = rules_file or BANNER_RULES
+        with open(self.rules_file, encoding="utf-8") as f:
+            rules = json.load(f)
+        fallback = rules.get("fallback", {})
+        self.markers = [marker.lower() for marker in fallback.get("markers", [])]
+        self.max_paragraphs = fallback.get("max_paragraphs", 2)
+        self.sponsor_re = re.compile(rules["sponsor"], re.IGNORECASE) if rules.get("sponsor") else None
+        self.media = {domain_of(domain): rule for domain, rule in rules.get("media", {}).items()}
+
+    def rules_for(self, url):
+        """ Return the rules of the media of the url, or None.
+        """
+        for domain in domain_candidates(url or ''):
+            if domain in self.media:
+                return self.media[domain]
+        return None
+
+    def _sponsor(self, text):
+        """ Return the sponsor named in a badge or label, or None.
+        """
+        if self.sponsor_re is not None:
+            match = self.sponsor_re.search(text)
+            if match:
+                return match.group('sponsor').strip()
+        return None
+
+    def detect(self, html, url):
+        """ Return the BannerMatch of the html of an article of the url.
+        """
+        rules = self.rules_for(url)
+        selectors = rules.get("selectors", []) if rules else []
+        max_paragraphs = rules.get("max_paragraphs", self.max_paragraphs) if rules else self.max_paragraphs
+        scanner = _BannerScanner(selectors, max_paragraphs).scan(html or '')
+        if scanner.badge is not None:
+            sponsor = self._sponsor(scanner.badge)
+            if sponsor is None and len(scanner.badge) <= _MAX_LABEL:
+                sponsor = scanner.badge or None
+            return BannerMatch(True, sponsor, "media", rules is not None)
+        if not (rules and rules.get("fallback")):
+            return BannerMatch(False, None, None, rules is not None)
+        labels = scanner.labels
+        for i, label in enumerate(labels):
+            lower = label.lower()
+            if any(marker in lower for marker in self.markers):
+                # the sponsor can be in the next block, e.g. "<span>Ofrecido por</span> <b>X</b>"
+                sponsor = self._sponsor(label)
+                if sponsor is None and i + 1 < len(labels):
+                    sponsor = self._sponsor(f"{label} {labels[i + 1]}")
+                return BannerMatch(True, sponsor, "fallback", rules is not None)
+        return BannerMatch(False, None, None, rules is not None)
@@ -0,0 +1,221 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from etiquetador_noticias import profiling
+from etiquetador_noticias.profiling import stage
+
+
+def download(url):
+    """Descargar el html de un articulo.
+
+    Raises
+    ------
+    IOError
+        If the article could not be downloaded
+    """
+    from newspaper import Article
+    from newspaper.article import ArticleDownloadState
+    with stage('download') as s:
+        article = Article(url)
+        article.download()
+        if article.download_state != ArticleDownloadState.SUCCESS:
+            raise IOError(f"Could not download {url}: {article.download_exception_msg}")
+        s.sizes['bytes'] = len(article.html)
+    return article.html
+
+
+_caches = {}  # ArticleCache of each cache file opened by this process
+
+
+def _open_cache(path):
+    from etiquetador_noticias.analyser.cache import ArticleCache
+    if path not in _caches:
+        _caches[path] = ArticleCache(path)
+    return _caches[path]
+
+
+def analyse_article(url, html=None, variant="seria", cache=None, profile=False, terms=False, engine="full"):
+    """Analizar un articulo y devolver el resultado como un registro.
+
+    The article is downloaded when no html is given and it is not in the
+    cache file. With profile the events of the stages are returned in the
+    "profile" key of the record, and with terms the terms of the article
+    for the TermIndex in the "terms" key and the engine of the Analyser,
+    "full" or "triage", in the "engine" key, so that the article is
+    analysed again with the same engine.
+    """
+    from etiquetador_noticias.analyser.analyser import Analyser
+    if profile:
+        with profiling.collect() as events:
+            record = analyse_article(url, html, variant, cache, terms=terms, engine=engine)
+        record["profile"] = events
+        return record
+    cache = _open_cache(cache) if cache is not None else None
+    analyser = Analyser(url, variant=variant, html=html, cache=cache, engine=engine)
+    record = {"url": url, "ok": True, **analyser.analyse().to_dict()}
+    if terms:
+        from etiquetador_noticias.analyser.relabel import article_terms
+        record["terms"] = article_terms(analyser.article.text, record)
+        record["engine"] = engine
+    return record
+
+
+def _download_profiled(url):
+    with profiling.collect() as events:
+        html = download(url)
+    return html, events
+
+
+def _failure(url, error):
+    return {"url": url,
+            "ok": False,
+            "error": f"{type(error).__name__}: {error}"}
+
+
+def _split_item(item):
+    """Return the (url, html, id) of an input item. Raises ValueError for
+    items without url.
+    """
+    if isinstance(item, str):
+        url, html, item_id = item, None, None
+    elif isinstance(item, dict):
+        url, html, item_id = item.get("url"), item.get("html"), item.get("id")
+    else:
+        try:
+            url, html = item
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid item {item!r}, use a url, a (url, html) pair or a dict") from None
+        item_id = None
+    if not isinstance(url, str) or not url:
+        raise ValueError(f"The item {item_id if item_id is not None else item!r} has no url")
+    return url, html, item_id
+
+
+def analyse_many(items, variant="seria", workers=None, download_workers=16, max_pending=None,
+                 cache=None, fetcher=None, profiler=None, terms=False, engine="full"):
+    """Analizar muchos articulos solapando la descarga y el analisis.
+
+    Downloads run in a thread pool while parsing, extraction and
+    classification run in a process pool, so the throughput is limited by
+    the number of cores and not by the network latency. Each process loads
+    the shared resources once, the first time it needs them.
+
+    Parameters
+    ----------
+    items : iterable
+        URLs, (url, html) pairs or {"url": ..., "html": ..., "id": ...}
+        dicts. Items with html are not downloaded again. The optional id is
+        copied to the record of the item
+    variant : str, optional
+        The variant of the tree used to classify the articles
+    workers : int, optional
+        Number of analysis processes (default is the number of cores). With
+        0 the articles are analysed in the calling process
+    download_workers : int, optional
+        Number of download threads (default is 16)
+    max_pending : int, optional
+        Maximum number of articles in flight. It bounds the memory used when
+        items is a long stream (default is four times the number of analysis
+        workers plus download workers)
+    cache : str, optional
+        Path of an ArticleCache file. Cached articles are not downloaded and
+        new ones are stored in it
+    fetcher : AsyncFetcher, optional
+        Fetcher used for the downloads instead of the download threads, with
+        pooled connections and per-host rate limits
+    profiler : Profiler, optional
+        Profiler that receives the stages of every article, including those
+        analysed in other processes
+    terms : bool, optional
+        Add to the records the "terms" of the article for a TermIndex
+    engine : str, optional
+        The engine of the extraction, "full" or "triage" (see Analyser)
+
+    Returns
+    -------
+    Generator of dict records in completion order. Articles that fail, and
+    items without url, yield a record with "ok" set to False and the
+    "error" message instead of stopping the batch.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 4 * (max(workers, 1) + download_workers)
+    items = iter(items)
+
+    downloads = ThreadPoolExecutor(max_workers=download_workers) if fetcher is None else None
+    if workers:
+        analysis = ProcessPoolExecutor(max_workers=workers)
+    else:
+        analysis = ThreadPoolExecutor(max_workers=1)
+    pending = {}  # future -> (stage, url, id)
+    failed = []  # records of the invalid items, yielded without analysis
+    profile = profiler is not None
+
+    def fill():
+        while len(pending) < max_pending:
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            try:
+                url, html, item_id = _split_item(item)
+            except ValueError as e:
+                record = _failure(None, e)
+                if isinstance(item, dict) and item.get("id") is not None:
+                    record["id"] = item["id"]
+                failed.append(record)
+                continue
+            if html is None and not (cache is not None and url in _open_cache(cache)):
+                if fetcher is not None:
+                    future = fetcher.submit(url)
+                else:
+                    future = downloads.submit(_download_profiled if profile else download, url)
+                pending[future] = ("download", url, item_id)
+            else:
+                future = analysis.submit(analyse_article, url, html, variant, cache, profile, terms, engine)
+                pending[future] = ("analyse", url, item_id)
+
+    try:
+        fill()
+        while pending or failed:
+            while failed:
+                yield failed.pop(0)
+            if not pending:
+                fill()
+                continue
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, url, item_id = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = _failure(url, e)
+                else:
+                    if stage == "download" and fetcher is not None and result.error:
+                        result = _failure(url, IOError(f"Could not download {url}: {result.error}"))
+                    elif stage == "download":
+                        if fetcher is not None:
+                            html = result.html
+                            if profile:
+                                profiler.add(('fetch', result.seconds, 0.0, {'bytes': len(html)},
+                                              result.not_modified))
+                        elif profile:
+                            html, events = result
+                            profiler.add_many(events)
+                        else:
+                            html = result
+                        future = analysis.submit(analyse_article, url, html, variant, cache, profile, terms, engine)
+                        pending[future] = ("analyse", url, item_id)
+                        continue
+                    elif profile:
+                        profiler.add_many(result.pop("profile", ()))
+                if item_id is not None:
+                    result["id"] = item_id
+                yield result
+            fill()
+    finally:
+        for future in pending:
+            future.cancel()
+        if downloads is not None:
+            downloads.shutdown(wait=True)
+        analysis.shutdown(wait=True)
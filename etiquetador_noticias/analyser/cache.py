@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import namedtuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+
+CachedArticle = namedtuple('CachedArticle', ['url', 'content_hash', 'html', 'text', 'authors', 'publish_date'])
+
+# query parameters that do not change the article
+_TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'ref', 'ns_')
+
+
+def normalise_url(url):
+    """Normalizar una url para usarla como clave de la cache.
+
+    The scheme and host are lowercased, the default port, the fragment,
+    the trailing slash and the tracking parameters are removed and the
+    query parameters are sorted.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower() or 'http'
+    host = (parts.hostname or '').lower()
+    if parts.port and not ((scheme == 'http' and parts.port == 80) or
+                           (scheme == 'https' and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path.rstrip('/') or '/'
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not k.lower().startswith(_TRACKING_PARAMS))
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+def content_hash(html):
+    """Devolver el hash del contenido de un articulo.
+    """
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+    return hashlib.sha256(html).hexdigest()
+
+
+class ArticleCache(object):
+    """Cache en disco de los articulos descargados y parseados.
+
+    The raw html, the extracted text, the authors and the publish date of
+    every article are stored in a sqlite file. Contents are addressed by
+    the hash of their html, so several urls with the same html share the
+    entry, and urls are stored normalised.
+
+    Parameters
+    ----------
+    path : str
+        The sqlite file of the cache
+    ttl : float, optional
+        Seconds after which a cached url is downloaded again (default is
+        None, entries never expire)
+    max_bytes : int, optional
+        Maximum size of the stored contents. The least recently used urls
+        are evicted when it is exceeded (default is 1 GB)
+
+    Examples
+    --------
+    >>> from etiquetador_noticias.analyser import Analyser, ArticleCache
+    >>> cache = ArticleCache("articles.sqlite", ttl=7 * 24 * 3600)
+    >>> Analyser(url, cache=cache)                     # downloads and stores
+    >>> Analyser(url, variant="gamberra", cache=cache) # read from disk
+    """
+
+    def __init__(self, path, ttl=None, max_bytes=2**30):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY, content_hash TEXT NOT NULL,
+                fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)""")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS contents (
+                content_hash TEXT PRIMARY KEY, html BLOB, text TEXT,
+                authors TEXT, publish_date TEXT, size INTEGER NOT NULL)""")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS validators (
+                url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT)""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS urls_accessed ON urls (accessed_at)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS urls_hash ON urls (content_hash)")
+
+    def _row_to_article(self, url, row):
+        content_hash, html, text, authors, publish_date = row
+        return CachedArticle(url, content_hash, zlib.decompress(html).decode('utf-8'),
+                             text, json.loads(authors), publish_date)
+
+    def get(self, url, expired=False):
+        """Return the CachedArticle of the url, or None if it is not
+        cached or has expired (unless expired is True).
+        """
+        key = normalise_url(url)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("""SELECT c.content_hash, c.html, c.text, c.authors,
+                c.publish_date, u.fetched_at FROM urls u JOIN contents c
+                ON u.content_hash = c.content_hash WHERE u.url = ?""", (key,)).fetchone()
+            if row is None:
+                return None
+            if not expired and self.ttl is not None and now - row[5] > self.ttl:
+                return None
+            with self._db:
+                self._db.execute("UPDATE urls SET accessed_at = ? WHERE url = ?", (now, key))
+        return self._row_to_article(url, row[:5])
+
+    def get_by_hash(self, content_hash):
+        """Return the CachedArticle stored for the html with that hash, or
+        None.
+        """
+        with self._lock:
+            row = self._db.execute("""SELECT content_hash, html, text, authors, publish_date
+                FROM contents WHERE content_hash = ?""", (content_hash,)).fetchone()
+        if row is None:
+            return None
+        return self._row_to_article(None, row)
+
+    def put(self, url, html, text, authors, publish_date):
+        """Store a parsed article and return the hash of its content.
+
+        publish_date can be a datetime or its ISO string.
+        """
+        if hasattr(publish_date, 'isoformat'):
+            publish_date = publish_date.isoformat()
+        chash = content_hash(html)
+        html = zlib.compress(html.encode('utf-8'))
+        size = len(html) + len(text.encode('utf-8'))
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("""INSERT OR REPLACE INTO contents
+                (content_hash, html, text, authors, publish_date, size)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                (chash, html, text, json.dumps(list(authors)), publish_date, size))
+            if url is not None:
+                self._db.execute("INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?)",
+                                 (normalise_url(url), chash, now, now))
+            self._evict()
+        return chash
+
+    def touch(self, url):
+        """Mark the cached url as fetched now, e.g. when the server answers
+        that it has not been modified.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("UPDATE urls SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                             (now, now, normalise_url(url)))
+
+    def get_validators(self, url):
+        """Return the (etag, last_modified) headers of the last download of
+        the url, to make a conditional request. Missing ones are None.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT etag, last_modified FROM validators WHERE url = ?",
+                                   (normalise_url(url),)).fetchone()
+        return tuple(row) if row else (None, None)
+
+    def set_validators(self, url, etag, last_modified):
+        """Store the ETag and Last-Modified headers of a download.
+        """
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO validators VALUES (?, ?, ?)",
+                             (normalise_url(url), etag, last_modified))
+
+    def _evict(self):
+        """ Remove the least recently used urls, and the contents no longer
+        referenced, until the cache fits in max_bytes.
+        """
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM contents").fetchone()[0]
+        while total > self.max_bytes:
+            oldest = self._db.execute("""SELECT url, content_hash FROM urls
+                ORDER BY accessed_at, rowid LIMIT 64""").fetchall()
+            if not oldest:
+                self._db.execute("DELETE FROM contents")
+                break
+            # one url at a time, the contents may be shared with newer urls
+            for url, chash in oldest:
+                self._db.execute("DELETE FROM urls WHERE url = ?", (url,))
+                self._db.execute("DELETE FROM validators WHERE url = ?", (url,))
+                row = self._db.execute("""SELECT size FROM contents WHERE content_hash = ? AND
+                    content_hash NOT IN (SELECT content_hash FROM urls)""", (chash,)).fetchone()
+                if row is not None:
+                    self._db.execute("DELETE FROM contents WHERE content_hash = ?", (chash,))
+                    total -= row[0]
+                    if total <= self.max_bytes:
+                        break
+
+    def clear(self):
+        """Remove every entry of the cache.
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM urls")
+            self._db.execute("DELETE FROM contents")
+            self._db.execute("DELETE FROM validators")
+
+    def __contains__(self, url):
+        return self.get(url) is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,212 @@
+import asyncio
+import threading
+from collections import namedtuple, defaultdict
+from urllib.parse import urlsplit
+
+from etiquetador_noticias.resources import require
+
+
+FetchResult = namedtuple('FetchResult', ['url', 'status', 'html', 'error', 'not_modified', 'seconds'])
+
+# statuses worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class AsyncFetcher(object):
+    """Descargador asincrono de articulos.
+
+    Articles are downloaded with asyncio over a pool of keep-alive
+    connections, with a limit of concurrent requests per host and a
+    minimum delay between the requests to the same host. Failed requests
+    (connection errors, timeouts, 429 and 5xx) are retried with exponential
+    backoff. When a cache is given, the ETag and Last-Modified headers are
+    stored and used to make conditional requests: a 304 answer returns the
+    cached html, and is a failed download for the urls not in the cache.
+
+    The fetcher runs its own event loop in a background thread, so it can
+    be used from synchronous code: submit() returns a concurrent future
+    and fetch_many() a generator of results in completion order.
+
+    It needs aiohttp, the "async" extra of the package.
+
+    Parameters
+    ----------
+    concurrency : int, optional
+        Maximum number of simultaneous connections (default is 64)
+    per_host : int, optional
+        Maximum number of simultaneous connections per host (default is 4)
+    delay : float, optional
+        Minimum seconds between the start of two requests to the same host
+        (default is 0.25)
+    retries : int, optional
+        Retries of a failed request (default is 3)
+    backoff : float, optional
+        Seconds before the first retry, doubled on every retry (default is 0.5)
+    timeout : float, optional
+        Seconds for a whole request (default is 30)
+    cache : ArticleCache, optional
+        Cache of the articles used for conditional requests
+
+    Examples
+    --------
+    >>> with AsyncFetcher(per_host=2, cache=cache) as fetcher:
+    ...     for result in fetcher.fetch_many(urls):
+    ...         analyser = Analyser(result.url, html=result.html)
+    """
+
+    user_agent = "Mozilla/5.0 (compatible; etiquetador_noticias)"
+
+    def __init__(self, concurrency=64, per_host=4, delay=0.25, retries=3, backoff=0.5,
+                 timeout=30, cache=None):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.delay = delay
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._host_locks = {}
+        self._host_slots = {}
+        self._next_request = defaultdict(float)
+
+    # -- event loop in a background thread --------------------------------
+
+    def start(self):
+        """Start the event loop thread and the connection pool.
+        """
+        if self._loop is not None:
+            return self
+        require("aiohttp", "async")
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self._loop).result()
+        return self
+
+    def close(self):
+        """Close the connections and stop the event loop thread.
+        """
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = self._thread = self._session = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    async def _open(self):
+        aiohttp = require("aiohttp", "async")
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host,
+                                         ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(
+            connector=connector, headers={"User-Agent": self.user_agent},
+            timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    # -- requests -----------------------------------------------------------
+
+    async def _polite(self, host):
+        """Wait until a new request to the host is allowed.
+        """
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            wait = self._next_request[host] - self._loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_request[host] = self._loop.time() + self.delay
+
+    def _conditional(self, url):
+        """Return the cached article of the url, or None, and the headers of
+        a conditional request for it.
+        """
+        headers = {}
+        if self.cache is None:
+            return None, headers
+        cached = self.cache.get(url, expired=True)
+        if cached is not None:
+            etag, last_modified = self.cache.get_validators(url)
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return cached, headers
+
+    async def fetch(self, url):
+        """Download the url and return a FetchResult. It never raises: the
+        error of a failed download is in the result.
+        """
+        aiohttp = require("aiohttp", "async")
+        start = self._loop.time()
+        host = urlsplit(url).netloc.lower()
+        slots = self._host_slots.setdefault(host, asyncio.Semaphore(self.per_host))
+        # the cache is a sqlite file: it is read and written in threads, not
+        # in the event loop where it would stall every download
+        cached, headers = await self._loop.run_in_executor(None, self._conditional, url)
+
+        error, status = None, None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+            async with slots:
+                await self._polite(host)
+                try:
+                    async with self._session.get(url, headers=headers) as response:
+                        status = response.status
+                        if status == 304:
+                            if cached is None:
+                                # only cached urls are requested conditionally
+                                return FetchResult(url, status, None, "HTTP 304 without a cached copy",
+                                                   False, self._loop.time() - start)
+                            await self._loop.run_in_executor(None, self.cache.touch, url)
+                            return FetchResult(url, status, cached.html, None, True,
+                                               self._loop.time() - start)
+                        if status in RETRY_STATUSES:
+                            error = f"HTTP {status}"
+                            continue
+                        if status >= 400:
+                            return FetchResult(url, status, None, f"HTTP {status}", False,
+                                               self._loop.time() - start)
+                        html = await response.text(errors="replace")
+                        if self.cache is not None:
+                            await self._loop.run_in_executor(
+                                None, self.cache.set_validators, url, response.headers.get("ETag"),
+                                response.headers.get("Last-Modified"))
+                        return FetchResult(url, status, html, None, False, self._loop.time() - start)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = f"{type(e).__name__}: {e}"
+        return FetchResult(url, status, None, error, False, self._loop.time() - start)
+
+    def submit(self, url):
+        """Schedule the download of the url and return a
+        concurrent.futures.Future of its FetchResult.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self.fetch(url), self._loop)
+
+    def fetch_many(self, urls, max_pending=None):
+        """Download the urls and yield their FetchResult in completion
+        order, with at most max_pending downloads in flight (default is
+        twice the concurrency).
+        """
+        from concurrent.futures import wait, FIRST_COMPLETED
+        max_pending = max_pending or 2 * self.concurrency
+        urls = iter(urls)
+        pending = set()
+        while True:
+            for url in urls:
+                pending.add(self.submit(url))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
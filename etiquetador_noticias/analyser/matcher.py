@@ -0,0 +1,112 @@
+import unicodedata
+from collections import deque
+
+
+def _fold_char(c, ignore_case, ignore_accents):
+    """ Normalise a single character without changing the length of the
+    text, so that the offsets found in the folded text are valid in the
+    original one.
+    """
+    if ignore_accents:
+        c = unicodedata.normalize('NFD', c)[0]
+    if ignore_case:
+        lower = c.lower()
+        if len(lower) == 1:
+            c = lower
+    return c
+
+
+def fold(text, ignore_case=False, ignore_accents=False):
+    """ Normalise the text for matching, keeping one char per char.
+    """
+    if not (ignore_case or ignore_accents):
+        return text
+    return ''.join(_fold_char(c, ignore_case, ignore_accents) for c in text)
+
+
+class SponsorMatcher(object):
+    """ Aho-Corasick automaton that finds every occurrence of a set of
+    patterns in a single linear scan of the text.
+
+    Parameters
+    ----------
+    patterns : iterable of str
+        The strings to look for. Duplicates and empty strings are ignored
+    ignore_case : bool, optional
+        Match regardless of upper/lower case (default is False)
+    ignore_accents : bool, optional
+        Match regardless of accents, e.g. "Telefonica" matches "Telefónica"
+        (default is False)
+
+    Examples
+    --------
+    >>> matcher = SponsorMatcher(["Vodafone", "Sabadell"])
+    >>> matcher.search("Vodafone y Sabadell")
+    {'Vodafone': {'count': 1, 'offsets': [(0, 8)]}, 'Sabadell': {'count': 1, 'offsets': [(11, 19)]}}
+    """
+
+    def __init__(self, patterns, ignore_case=False, ignore_accents=False):
+        self.ignore_case = ignore_case
+        self.ignore_accents = ignore_accents
+        self.patterns = list(dict.fromkeys(p for p in patterns if p))
+
+        # trie: transitions, failure links and the patterns ending in each node
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for i, pattern in enumerate(self.patterns):
+            node = 0
+            for c in fold(pattern, ignore_case, ignore_accents):
+                nxt = self._goto[node].get(c)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][c] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(i)
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        """ Compute the failure links breadth-first and merge the outputs of
+        the suffixes into every node.
+        """
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for c, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(c, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def finditer(self, text):
+        """ Yield (start, end, pattern) for every occurrence in the text,
+        overlapping ones included.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        lengths = [len(p) for p in self.patterns]
+        node = 0
+        for end, c in enumerate(fold(text, self.ignore_case, self.ignore_accents), 1):
+            while node and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+            for i in out[node]:
+                yield end - lengths[i], end, self.patterns[i]
+
+    def search(self, text):
+        """ Return a dict with the count and the offsets of every pattern
+        found in the text.
+        """
+        found = {}
+        for start, end, pattern in self.finditer(text):
+            match = found.setdefault(pattern, {'count': 0, 'offsets': []})
+            match['count'] += 1
+            match['offsets'].append((start, end))
+        return found
+
+    def __len__(self):
+        return len(self.patterns)
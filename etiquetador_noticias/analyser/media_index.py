@@ -0,0 +1,183 @@
+import os
+import pickle
+import hashlib
+import threading
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+
+this_dir, this_filename = os.path.split(__file__)
+
+INVESTORS_TABLE = os.path.join(this_dir, "data", "tabla_de_inversores_y_grandes_anunciantes.xlsx")
+DEFAULT_CACHE_DIR = os.environ.get("ETIQUETADOR_CACHE_DIR",
+                                   os.path.join(os.path.expanduser("~"), ".cache", "etiquetador_noticias"))
+
+# increase when the layout of the compiled index changes
+INDEX_FORMAT = 1
+
+MediaRecord = namedtuple('MediaRecord', ['media_name', 'media_url', 'domain', 'sponsors'])
+
+
+def domain_of(url):
+    """Devolver el dominio de una url, sin el esquema, el puerto ni "www.".
+
+    >>> domain_of("https://www.ElPais.com/economia/")
+    'elpais.com'
+    """
+    url = url.strip()
+    if "//" not in url:
+        url = "//" + url
+    host = (urlsplit(url).hostname or "").rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+    return host
+
+
+def domain_candidates(url):
+    """Devolver el dominio de una url y sus dominios padre, del mas
+    especifico al mas general, sin llegar al dominio de primer nivel.
+
+    >>> list(domain_candidates("https://cincodias.elpais.com/x"))
+    ['cincodias.elpais.com', 'elpais.com']
+    """
+    domain = domain_of(url)
+    while "." in domain:
+        yield domain
+        domain = domain.partition(".")[2]
+
+
+class MediaIndex(object):
+    """Indice de los medios y de sus inversores y grandes anunciantes.
+
+    The investors table is compiled into a dict from the domain of every
+    media to its MediaRecord, with the (pat_entity, pat_type) pairs of its
+    sponsors. The compiled index is pickled in cache_dir and reused while
+    the table does not change, so neither pandas nor openpyxl are needed
+    to look up a media.
+
+    Urls are matched by domain: the scheme, the port, the path and "www."
+    are ignored, and a subdomain matches its media unless it is a media of
+    its own.
+
+    Parameters
+    ----------
+    table_file : str, optional
+        The investors xlsx table (default is the one in the package)
+    cache_dir : str, optional
+        Directory of the compiled index (default is ~/.cache/etiquetador_noticias
+        or the ETIQUETADOR_CACHE_DIR environment variable). With None the
+        index is not stored
+
+    Examples
+    --------
+    >>> index = MediaIndex()
+    >>> index.lookup("https://www.elpais.com/economia/2020/x.html").media_name
+    'EL PAÍS'
+    >>> index.sponsors("https://elpais.com")[:1]
+    [('Banco Sabadell', 'gran anunciante')]
+    """
+
+    def __init__(self, table_file=None, cache_dir=DEFAULT_CACHE_DIR):
+        self.table_file = table_file or INVESTORS_TABLE
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        self._domains = None
+        self.source_hash = None
+
+    def _table_hash(self):
+        with open(self.table_file, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def _index_file(self):
+        name = os.path.splitext(os.path.basename(self.table_file))[0]
+        return os.path.join(self.cache_dir, f"{name}.v{INDEX_FORMAT}.pickle")
+
+    def _read_index(self, source_hash):
+        """ Return the compiled domains of the table, or None if there is
+        none, it cannot be unpickled (e.g. written by another layout of the
+        package) or it was compiled from another version of the table.
+        """
+        try:
+            with open(self._index_file(), 'rb') as f:
+                stored = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        if stored.get("source_hash") != source_hash:
+            return None
+        return stored["domains"]
+
+    def _write_index(self, source_hash, domains):
+        """ Store the compiled domains atomically. A cache directory that
+        cannot be written only means the table is compiled again next time.
+        """
+        index_file = self._index_file()
+        tmp = f"{index_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                pickle.dump({"source_hash": source_hash, "domains": domains}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, index_file)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def compile(self):
+        """ Read the xlsx table and return the dict of domains.
+        """
+        import pandas as pd
+        df = pd.read_excel(self.table_file)
+        rows = {}
+        for media_name, media_url, entity, pat_type in zip(
+                df.media_name, df.media_url, df.pat_entity, df.pat_type):
+            if not isinstance(media_url, str) or not media_url.strip():
+                continue
+            domain = domain_of(media_url)
+            name, url, sponsors = rows.setdefault(domain, (media_name, media_url.strip().rstrip("/"), []))
+            if isinstance(entity, str) and entity.strip():
+                sponsors.append((entity.strip(), pat_type))
+        return {domain: MediaRecord(name, url, domain, tuple(sponsors))
+                for domain, (name, url, sponsors) in rows.items()}
+
+    def load(self):
+        """ Load the compiled index, compiling the table if it changed.
+        """
+        if self._domains is None:
+            with self._lock:
+                if self._domains is None:
+                    source_hash = self._table_hash()
+                    domains = None
+                    if self.cache_dir:
+                        domains = self._read_index(source_hash)
+                    if domains is None:
+                        domains = self.compile()
+                        if self.cache_dir:
+                            self._write_index(source_hash, domains)
+                    self.source_hash = source_hash
+                    self._domains = domains
+        return self
+
+    def lookup(self, url):
+        """ Return the MediaRecord of the media of the url, or None.
+        """
+        domains = self.load()._domains
+        for domain in domain_candidates(url):
+            record = domains.get(domain)
+            if record is not None:
+                return record
+        return None
+
+    def sponsors(self, url):
+        """ Return the (pat_entity, pat_type) pairs of the media of the url.
+        """
+        record = self.lookup(url)
+        return list(record.sponsors) if record is not None else []
+
+    def __contains__(self, url):
+        return self.lookup(url) is not None
+
+    def __iter__(self):
+        return iter(self.load()._domains.values())
+
+    def __len__(self):
+        return len(self.load()._domains)
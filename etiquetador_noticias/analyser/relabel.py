@@ -0,0 +1,366 @@
+import os
+import csv
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+
+from etiquetador_noticias.analyser.media_index import domain_candidates, domain_of
+from etiquetador_noticias.tjtool.tjtool import normalise_name
+
+
+this_dir, this_filename = os.path.split(__file__)
+
+TJTOOL_DATA = os.path.join(os.path.dirname(this_dir), "tjtool", "data")
+
+# reasons to update an article, from the cheapest to the most expensive
+DESCRIBE, ANALYSE = "describe", "analyse"
+
+
+def data_snapshot():
+    """Devolver el contenido de los ficheros de datos del analisis.
+
+    The snapshot is a dict of plain JSON types with the reported verbs,
+    sources and locations, the rows of the entities table, the sponsors
+    of every media of the investors table and the banner rules, so that
+    two snapshots can be compared with diff_snapshots.
+    """
+    from etiquetador_noticias.resources import registry
+    from etiquetador_noticias.tjtool.taxonomy import CATEGORIES
+    from etiquetador_noticias.analyser.banners import BANNER_RULES
+    snapshot = {}
+    for file_name, _ in CATEGORIES:
+        with open(os.path.join(TJTOOL_DATA, file_name), encoding="utf-8") as f:
+            snapshot[os.path.splitext(file_name)[0]] = sorted({t.strip() for t in f if t.strip()})
+    with open(os.path.join(TJTOOL_DATA, "entities.csv"), encoding="utf-8") as f:
+        snapshot["entities"] = {row["Entity"]: [row["Type"], row["FullName"], row.get("Aliases") or ""]
+                                for row in csv.DictReader(f)}
+    snapshot["sponsors"] = {record.domain: sorted(entity for entity, _ in record.sponsors)
+                            for record in registry.media_index()}
+    with open(BANNER_RULES, encoding="utf-8") as f:
+        rules = json.load(f)
+    snapshot["banner_rules"] = {domain_of(domain): json.dumps(rule, sort_keys=True)
+                                for domain, rule in rules.get("media", {}).items()}
+    snapshot["banner_fallback"] = json.dumps({"fallback": rules.get("fallback"), "sponsor": rules.get("sponsor")},
+                                             sort_keys=True)
+    return snapshot
+
+
+def _changed(old, new):
+    """ Return the keys added, removed or changed between two lists or
+    dicts.
+    """
+    if isinstance(new, dict):
+        return {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+    return set(old) ^ set(new)
+
+
+def _fallback_domains(snapshot):
+    """ Return the domains whose banner rules use the shared markers.
+    """
+    return {domain for domain, rule in snapshot["banner_rules"].items() if json.loads(rule).get("fallback")}
+
+
+def diff_snapshots(old, new):
+    """Comparar dos instantaneas de los ficheros de datos.
+
+    Returns a dict with the reported verbs, sources, locations and entity
+    names (with their aliases) that were added, removed or changed, the
+    sponsors changed of every media domain, the domains whose banner
+    rules changed and, when the shared banner markers changed, the domains
+    that use them.
+    """
+    entities = set()
+    for name in _changed(old["entities"], new["entities"]):
+        entities.add(name)
+        for row in (old["entities"].get(name), new["entities"].get(name)):
+            if row is not None:
+                entities.update(alias for alias in row[2].split("|") if alias)
+    sponsors = {}
+    for domain in set(old["sponsors"]) | set(new["sponsors"]):
+        changed = _changed(old["sponsors"].get(domain, []), new["sponsors"].get(domain, []))
+        if changed:
+            sponsors[domain] = changed
+    return {"reported_verbs": _changed(old["reported_verbs"], new["reported_verbs"]),
+            "sources": _changed(old["sources"], new["sources"]),
+            "locations": _changed(old["locations"], new["locations"]),
+            "entities": entities,
+            "sponsors": sponsors,
+            "banner_rules": _changed(old["banner_rules"], new["banner_rules"]),
+            "banner_fallback": (_fallback_domains(old) | _fallback_domains(new)
+                                if old["banner_fallback"] != new["banner_fallback"] else set())}
+
+
+def _term_id(term):
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def _words(text):
+    return normalise_name(text).split()
+
+
+def article_terms(text, record):
+    """Devolver los terminos del articulo para el indice invertido.
+
+    The terms are the distinct normalised words of the text, the names of
+    the reporters, entities and sources found ("n:" prefix) and the domains
+    of the media ("m:" prefix), as 64 bit hashes.
+    """
+    terms = set(_words(text))
+    for field in ("reporters", "entities", "sources"):
+        terms.update("n:" + normalise_name(d["name"]) for d in record.get(field) or ())
+    terms.update("m:" + domain for domain in domain_candidates(record.get("source_url") or record["url"]))
+    return sorted(_term_id(term) for term in terms)
+
+
+class TermIndex(object):
+    """Indice invertido de los terminos de los articulos analizados.
+
+    Every article analysed with terms (see article_terms) is stored with
+    its record and its terms, and the postings of every term are kept in
+    an indexed sqlite table. The index also keeps the snapshot of the data
+    files its records were analysed with: when the files change, affected()
+    returns only the articles where a changed term may appear.
+
+    - reported verbs: the articles with any conjugated form of the verb
+    - sources and locations: the articles with all the words of the term
+    - investors and advertisers: every article of the media
+    - banner rules: every article of the media (of the media that use the
+      shared markers when they change)
+    - entities: the articles where the name was found. They only need to
+      be described again, the extraction and the category do not change
+    - the pending articles, whose analysis failed in the last relabel
+
+    Parameters
+    ----------
+    path : str
+        The sqlite file of the index
+
+    Examples
+    --------
+    >>> index = TermIndex("index.sqlite")
+    >>> changes = diff_snapshots(index.snapshot(), data_snapshot())
+    >>> affected = index.affected(changes)
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS articles
+                (id INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE, record TEXT NOT NULL,
+                 terms BLOB NOT NULL, updated REAL NOT NULL)""")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS postings
+                (term INTEGER NOT NULL, article INTEGER NOT NULL, PRIMARY KEY (term, article))
+                WITHOUT ROWID""")
+
+    def snapshot(self):
+        """ Return the snapshot of the data files of the records, or None.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'snapshot'").fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set_snapshot(self, snapshot, pending=None):
+        """ Store the snapshot of the data files and, when given, the
+        articles still pending of analysis with it.
+        """
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('snapshot', ?)", (json.dumps(snapshot),))
+            if pending is not None:
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('pending', ?)",
+                                 (json.dumps(sorted(pending)),))
+
+    def pending(self):
+        """ Return the articles whose last analysis failed, which are
+        analysed again by the next relabel.
+        """
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'pending'").fetchone()
+        return set(json.loads(row[0])) if row is not None else set()
+
+    def add_many(self, records):
+        """ Store the records with their "terms" (which are removed from the
+        records), replacing the previous record of the same url.
+        """
+        with self._lock, self._db:
+            for record in records:
+                terms = array('q', record.pop("terms"))
+                row = self._db.execute("SELECT id, terms FROM articles WHERE url = ?",
+                                       (record["url"],)).fetchone()
+                data = (json.dumps(record, ensure_ascii=False), terms.tobytes(), time.time())
+                if row is None:
+                    article = self._db.execute(
+                        "INSERT INTO articles (url, record, terms, updated) VALUES (?, ?, ?, ?)",
+                        (record["url"],) + data).lastrowid
+                else:
+                    article, old = row
+                    old_terms = array('q')
+                    old_terms.frombytes(old)
+                    self._db.executemany("DELETE FROM postings WHERE term = ? AND article = ?",
+                                         [(term, article) for term in old_terms])
+                    self._db.execute("UPDATE articles SET record = ?, terms = ?, updated = ? WHERE id = ?",
+                                     data + (article,))
+                self._db.executemany("INSERT OR IGNORE INTO postings VALUES (?, ?)",
+                                     [(term, article) for term in terms])
+
+    def add(self, record):
+        self.add_many([record])
+
+    def update_record(self, article, record):
+        """ Replace the record of an article, keeping its terms.
+        """
+        with self._lock, self._db:
+            self._db.execute("UPDATE articles SET record = ?, updated = ? WHERE id = ?",
+                             (json.dumps(record, ensure_ascii=False), time.time(), article))
+
+    def record(self, article):
+        with self._lock:
+            row = self._db.execute("SELECT record FROM articles WHERE id = ?", (article,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def _with_any(self, terms):
+        terms = sorted({_term_id(term) for term in terms})
+        if not terms:
+            return set()
+        with self._lock:
+            return {row[0] for row in self._db.execute(
+                f"SELECT DISTINCT article FROM postings WHERE term IN ({','.join('?' * len(terms))})",
+                terms)}
+
+    def _with_all(self, terms):
+        terms = sorted({_term_id(term) for term in terms})
+        if not terms:
+            return set()
+        query = " INTERSECT ".join(["SELECT article FROM postings WHERE term = ?"] * len(terms))
+        with self._lock:
+            return {row[0] for row in self._db.execute(query, terms)}
+
+    def affected(self, changes):
+        """ Return the articles that the changes of diff_snapshots can
+        affect, as a dict of article id -> DESCRIBE or ANALYSE.
+        """
+        from etiquetador_noticias.tjtool.conjugation import conjugate
+        analyse = set()
+        for verb in changes["reported_verbs"]:
+            analyse |= self._with_any(conjugate(verb))
+        for term in changes["sources"] | changes["locations"]:
+            analyse |= self._with_all(_words(term))
+        # the sponsors are matched as substrings, maybe regardless of case
+        # and accents, which the words of the index do not tell
+        for domain in changes["sponsors"]:
+            analyse |= self._with_any(["m:" + domain])
+        for domain in changes["banner_rules"]:
+            analyse |= self._with_any(["m:" + domain])
+        for domain in changes["banner_fallback"]:
+            analyse |= self._with_any(["m:" + domain])
+        analyse |= self.pending()
+        describe = self._with_any("n:" + normalise_name(name) for name in changes["entities"])
+        affected = dict.fromkeys(describe - analyse, DESCRIBE)
+        affected.update(dict.fromkeys(analyse, ANALYSE))
+        return affected
+
+    def urls(self, articles):
+        """ Return the url of every article id.
+        """
+        articles = list(articles)
+        urls = {}
+        with self._lock:
+            for start in range(0, len(articles), 500):
+                chunk = articles[start:start + 500]
+                urls.update(self._db.execute(
+                    f"SELECT id, url FROM articles WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        return urls
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+
+def redescribe(record):
+    """Describir de nuevo los nombres de un registro con la tabla de entidades.
+    """
+    from etiquetador_noticias.resources import registry
+    translate = registry.entities()
+    for field in ("reporters", "entities", "sources"):
+        record[field] = translate.describe_many([d["name"] for d in record[field]])
+    return record
+
+
+def relabel(index, cache=None, dry_run=False, **kwargs):
+    """Reetiquetar solo los articulos afectados por los cambios de los datos.
+
+    The current data files are compared with the snapshot of the index.
+    Articles whose entities changed are described again; the articles
+    where a changed verb, source, location, sponsor or banner rule may
+    appear are analysed again with analyse_many, with the variant and the
+    engine of their previous record. Their html is read from the cache
+    when given, otherwise they are downloaded. The index is updated and,
+    once every article is done, its snapshot: the articles whose analysis
+    failed keep their previous record and are kept as pending, to be
+    analysed again by the next relabel even if the data files do not
+    change again.
+
+    Parameters
+    ----------
+    index : TermIndex
+        The index of the analysed articles
+    cache : str, optional
+        Path of the ArticleCache file with the html of the articles
+    dry_run : bool, optional
+        Only yield a summary of the changes and the affected articles
+    **kwargs
+        Options for analyse_many (workers, download_workers...)
+
+    Returns
+    -------
+    Generator of the updated records, in completion order
+    """
+    from etiquetador_noticias.analyser.batch import analyse_many
+    old = index.snapshot()
+    if old is None:
+        raise ValueError(f"The index {index.path} has no snapshot of the data files, "
+                         "label the articles with --index first")
+    new = data_snapshot()
+    changes = diff_snapshots(old, new)
+    affected = index.affected(changes)
+    if dry_run:
+        yield {"changes": {name: (len(value) if not isinstance(value, bool) else value)
+                           for name, value in changes.items()},
+               "indexed": len(index),
+               "pending": len(index.pending()),
+               DESCRIBE: sum(1 for reason in affected.values() if reason == DESCRIBE),
+               ANALYSE: sum(1 for reason in affected.values() if reason == ANALYSE)}
+        return
+
+    by_options, ids, failed = {}, {}, set()
+    for article, reason in affected.items():
+        record = index.record(article)
+        if reason == DESCRIBE:
+            record = redescribe(record)
+            index.update_record(article, record)
+            yield record
+        else:
+            options = (record.get("variant") or "seria", record.get("engine") or "full")
+            by_options.setdefault(options, []).append(article)
+            ids[article] = record.get("id")
+    for (variant, engine), articles in by_options.items():
+        urls = index.urls(articles)
+        # the article identifies the record while it is in flight
+        items = ({"url": urls[article], "id": article} for article in articles)
+        for record in analyse_many(items, variant=variant, cache=cache, terms=True, engine=engine, **kwargs):
+            article = record.pop("id")
+            if ids[article] is not None:
+                record["id"] = ids[article]
+            if record["ok"]:
+                index.add(record)
+            else:
+                failed.add(article)
+            yield record
+    index.set_snapshot(new, pending=failed)
@@ -0,0 +1,193 @@
+import json
+
+from etiquetador_noticias.resources import require
+
+
+# stages of the analysis, in order, timed in AnalysisResult.timings
+STAGES = ('article', 'banners', 'reporters', 'publi', 'category')
+
+
+def classify(variant, pat, pub_text, num_total_sources):
+    """Clasificar un articulo con el arbol de la variante.
+
+    Parameters
+    ----------
+    variant : str
+        "seria" or "gamberra"
+    pat : bool
+        Whether the article is explicitly sponsored
+    pub_text : bool
+        Whether the article talks about an investor or big advertiser of the media
+    num_total_sources : int
+        The number of reporters and sources of the article
+    """
+    # si tiene patrocinio explicito...
+    if pat:
+        # variante seria
+        if variant == "seria":
+            # si contiene publicidad en el texto es publicidad
+            if pub_text:
+                return "Publicidad"
+            # si no contiene publicidad en el texto es contenido patrocinado
+            return "Contenido Patrocinado"
+        # variante gamberra: si tiene patrocinio es publicidad
+        return "Publicidad"
+    # si no tiene patrocinio explicito...
+    if num_total_sources > 2:
+        # si tiene más de dos fuentes pero habla de un inversor o gran anunciante es publicidad encubierta
+        if pub_text:
+            return "Publicidad Encubierta"
+        # si tiene más de dos fuentes pero NO habla de un inversor o gran anunciante es información
+        return "Información"
+    # si tiene menos de dos fuentes pero habla de un inversor o gran anunciante es publicidad encubierta
+    if pub_text:
+        return "Publicidad Encubierta"
+    # si tiene menos de dos fuentes pero NO habla de un inversor o gran anunciante es contenido parcial
+    return "Contenido Parcial"
+
+
+def banner_message(sponsored, sponsor, banner_rules, source_url):
+    """Mensaje del informe sobre el patrocinio explicito.
+    """
+    if sponsored and sponsor:
+        return f"\n- Hemos detectado que este es un articulo patrocinado por {sponsor}\n"
+    if sponsored:
+        return "\n- Hemos detectado que este es un articulo patrocinado\n"
+    if banner_rules:
+        return "\n- No hemos detectado patrocinio explicito\n"
+    return f"\n- De momento no tenemos un método para detectar patrocinio explicito en el medio {source_url} :(\n"
+
+
+def reporters_message(num_total_sources):
+    """Mensaje del informe sobre las fuentes.
+    """
+    return f"- Hemos encontrado {num_total_sources} fuente(s) en el artículo:\n"
+
+
+def publi_message(recognized_media, detected_pat, detected_pat_types, media_name, source_url):
+    """Mensaje del informe sobre los inversores y anunciantes mencionados.
+    """
+    if not recognized_media:
+        return f"\n- De momento no tenemos información sobre los financiadores del medio {source_url} :(\n"
+    if not detected_pat:
+        return f"\n- No hemos detectado que este articulo hable sobre algún gran anunciante o inversor de {media_name}\n"
+    # the last one found is reported
+    return (f"\n- Hemos detectado que este articulo habla sobre {detected_pat[-1]}, "
+            f"que es un {detected_pat_types[-1]} de {media_name}\n")
+
+
+class AnalysisResult(object):
+    """Resultado del analisis de un articulo.
+
+    A plain record of everything found in the article, with the seconds
+    spent in each stage. It is cheap to serialise with to_dict() and
+    to_json(), many results can be converted at once to an Arrow table
+    with to_arrow(), and the text report is rendered on demand with
+    render_report().
+
+    Reporters, entities and sources are the {'name', 'fullname', 'type'}
+    descriptions of the Entities table.
+    """
+
+    FIELDS = ('url', 'source_url', 'variant', 'media_name', 'recognized_media', 'publish_date',
+              'authors', 'sponsored', 'sponsor', 'banner_rules', 'reporters', 'entities',
+              'sources', 'num_total_sources', 'pub_text', 'detected_pat', 'detected_pat_types',
+              'category', 'timings')
+    __slots__ = FIELDS
+
+    def __init__(self, **fields):
+        for field in self.FIELDS:
+            setattr(self, field, fields.pop(field, None))
+        if fields:
+            raise TypeError(f"Unknown fields of AnalysisResult: {', '.join(sorted(fields))}")
+
+    def __repr__(self):
+        return f"AnalysisResult(url={self.url!r}, category={self.category!r})"
+
+    def __eq__(self, other):
+        return isinstance(other, AnalysisResult) and self.to_dict() == other.to_dict()
+
+    def to_dict(self):
+        """Return the result as a dict of plain JSON types.
+        """
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, record):
+        """Build a result from a dict of to_dict(), ignoring other keys.
+        """
+        return cls(**{field: record.get(field) for field in cls.FIELDS})
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def render_report(self):
+        """Devolver el informe completo en texto.
+        """
+        if self.publish_date:
+            from dateutil.parser import parse as parse_date
+            date = parse_date(self.publish_date).strftime("%d-%m-%Y %H:%M:%S")
+        else:
+            date = "desconocida"
+        total_sources = [d['name'] for d in self.reporters + self.sources]
+        lines = ["------------------------FULL REPORT---------------------\n",
+                 f"Fecha de publicación: {date}\n",
+                 "Autores:",
+                 str(self.authors),
+                 "\n------------------\n",
+                 banner_message(self.sponsored, self.sponsor, self.banner_rules, self.source_url),
+                 reporters_message(self.num_total_sources),
+                 str(total_sources),
+                 publi_message(self.recognized_media, self.detected_pat, self.detected_pat_types,
+                               self.media_name, self.source_url),
+                 "------------------\n",
+                 f"\nEl artículo ha sido clasificado como {self.category}\n"]
+        return "\n".join(lines)
+
+    @staticmethod
+    def to_arrow(results):
+        """Convert an iterable of results to a pyarrow Table with the schema
+        of arrow_schema(). pyarrow is an optional dependency, imported on
+        first use (the "arrow" extra of the package).
+        """
+        pa = require("pyarrow", "arrow")
+        columns = {field: [] for field in AnalysisResult.FIELDS}
+        for result in results:
+            for field in AnalysisResult.FIELDS:
+                columns[field].append(getattr(result, field))
+        columns['timings'] = [{stage: (timings or {}).get(stage) for stage in STAGES}
+                              for timings in columns['timings']]
+        return pa.Table.from_pydict(columns, schema=arrow_schema())
+
+
+def arrow_schema():
+    """Return the pyarrow schema of the results.
+    """
+    pa = require("pyarrow", "arrow")
+    described = pa.list_(pa.struct([('name', pa.string()), ('fullname', pa.string()),
+                                    ('type', pa.string())]))
+    return pa.schema([
+        ('url', pa.string()),
+        ('source_url', pa.string()),
+        ('variant', pa.dictionary(pa.int8(), pa.string())),
+        ('media_name', pa.dictionary(pa.int32(), pa.string())),
+        ('recognized_media', pa.bool_()),
+        ('publish_date', pa.string()),
+        ('authors', pa.list_(pa.string())),
+        ('sponsored', pa.bool_()),
+        ('sponsor', pa.dictionary(pa.int32(), pa.string())),
+        ('banner_rules', pa.bool_()),
+        ('reporters', described),
+        ('entities', described),
+        ('sources', described),
+        ('num_total_sources', pa.int32()),
+        ('pub_text', pa.bool_()),
+        ('detected_pat', pa.list_(pa.string())),
+        ('detected_pat_types', pa.list_(pa.string())),
+        ('category', pa.dictionary(pa.int8(), pa.string())),
+        ('timings', pa.struct([(stage, pa.float64()) for stage in STAGES])),
+    ])
@@ -0,0 +1,314 @@
+import os
+import time
+import uuid
+
+from etiquetador_noticias.analyser.media_index import domain_of
+from etiquetador_noticias.analyser.result import AnalysisResult
+from etiquetador_noticias.resources import require
+
+
+this_dir, this_filename = os.path.split(__file__)
+
+# partition columns of the store, in the order of the directories
+PARTITIONS = ("media", "month")
+# month of the articles without publish date
+UNKNOWN_MONTH = "unknown"
+
+
+def partition_of(record):
+    """Devolver la particion (media, month) de un resultado.
+
+    The media is the domain of the source url (or of the url) and the month
+    the "YYYY-MM" of the publish date, UNKNOWN_MONTH without date.
+    """
+    media = domain_of(record.get("source_url") or record["url"]) or "unknown"
+    date = record.get("publish_date")
+    return media, (date[:7] if date else UNKNOWN_MONTH)
+
+
+def _partition_schema():
+    pa = require("pyarrow", "arrow")
+    return pa.schema([(name, pa.string()) for name in PARTITIONS])
+
+
+def _where(where):
+    """ Return the dataset expression of a dict of column -> value or list
+    of values, or None.
+    """
+    ds = require("pyarrow.dataset", "arrow")
+    expression = None
+    for column, value in (where or {}).items():
+        if isinstance(value, (list, tuple, set, frozenset)):
+            condition = ds.field(column).isin(sorted(value))
+        else:
+            condition = ds.field(column) == value
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _add_counts(total, counts):
+    return counts if total is None else total.add(counts, fill_value=0)
+
+
+class ResultStore(object):
+    """Almacen columnar de los resultados del analisis.
+
+    The results are appended in batches to Parquet files partitioned by
+    media and month (hive directories media=elpais.com/month=2020-11), with
+    the schema of arrow_schema(): the variant, media name, sponsor and
+    category are dictionary-encoded in Arrow, and every string column, also
+    the names of the entities and of the investors found, is
+    dictionary-encoded in the Parquet pages. The queries read only the
+    columns they need, skip the partitions excluded by their media and
+    month filters and aggregate batch by batch, so memory does not grow
+    with the number of rows.
+
+    Appending writes a new file for every partition of the batch; compact()
+    joins the files of every partition after many small batches. The
+    batches numbered by a run can be discarded after a checkpoint, so that
+    an interrupted run that resumes does not append them twice.
+
+    Parameters
+    ----------
+    path : str
+        The directory of the store
+    row_group_size : int, optional
+        The maximum rows of the row groups of the Parquet files
+
+    Examples
+    --------
+    >>> store = ResultStore("resultados")
+    >>> store.append(records)
+    >>> store.category_share(where={"month": ["2020-10", "2020-11"]})["Publicidad Encubierta"]
+    >>> store.mentions("Banco Santander")
+    """
+
+    def __init__(self, path, row_group_size=128 * 1024):
+        self.path = path
+        self.row_group_size = row_group_size
+        os.makedirs(path, exist_ok=True)
+
+    def _partition_dir(self, media, month):
+        return os.path.join(self.path, f"media={media}", f"month={month}")
+
+    def _write(self, table, directory, batch=None):
+        pq = require("pyarrow.parquet", "arrow")
+        os.makedirs(directory, exist_ok=True)
+        if batch is None:
+            name = f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+        else:
+            run, number = batch
+            name = f"part-{run}-{number:08d}-{uuid.uuid4().hex[:8]}.parquet"
+        # written under a temporary name, readers never see partial files
+        tmp = os.path.join(directory, "." + name)
+        pq.write_table(table, tmp, row_group_size=self.row_group_size, compression="zstd")
+        os.replace(tmp, os.path.join(directory, name))
+
+    def append(self, records, batch=None):
+        """Añadir un lote de resultados al almacen.
+
+        Parameters
+        ----------
+        records : iterable
+            AnalysisResult objects or their dicts (the records of
+            analyse_many; failed records, with "ok" false, are skipped)
+        batch : tuple, optional
+            The (run, number) of the batch, a hexadecimal id of the run and
+            an increasing number, kept in the names of its files so that
+            the batches appended after a checkpoint can be discarded (see
+            discard_batches)
+
+        Returns
+        -------
+        The number of results appended
+        """
+        partitions = {}
+        for record in records:
+            if isinstance(record, AnalysisResult):
+                result = record
+                record = result.to_dict()
+            elif not record.get("ok", True):
+                continue
+            else:
+                result = AnalysisResult.from_dict(record)
+            partitions.setdefault(partition_of(record), []).append(result)
+        for (media, month), results in partitions.items():
+            self._write(AnalysisResult.to_arrow(results), self._partition_dir(media, month), batch)
+        return sum(len(results) for results in partitions.values())
+
+    def dataset(self):
+        """Devolver el pyarrow Dataset del almacen.
+        """
+        ds = require("pyarrow.dataset", "arrow")
+        from etiquetador_noticias.analyser.result import arrow_schema
+        schema = arrow_schema()
+        for field in _partition_schema():
+            schema = schema.append(field)
+        return ds.dataset(self.path, schema=schema, format="parquet",
+                          partitioning=ds.partitioning(_partition_schema(), flavor="hive"))
+
+    def scan(self, columns, where=None, batch_size=256 * 1024):
+        """Recorrer las columnas pedidas del almacen por lotes.
+
+        Parameters
+        ----------
+        columns : list
+            The columns to read, including "media" and "month"
+        where : dict, optional
+            Column -> value, or list of values, that the rows must have.
+            Filters on "media" and "month" skip whole partitions
+
+        Returns
+        -------
+        Generator of pandas DataFrames
+        """
+        for batch in self.dataset().to_batches(columns=list(columns), filter=_where(where),
+                                               batch_size=batch_size):
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def count(self, by=PARTITIONS, where=None):
+        """Contar los articulos por los valores de las columnas by.
+
+        Returns
+        -------
+        A pandas Series of the number of articles, indexed by the columns by
+        """
+        import pandas as pd
+        by = list(by)
+        total = None
+        for frame in self.scan(by, where):
+            total = _add_counts(total, frame.groupby(by, observed=True).size())
+        if total is None:
+            return pd.Series([], dtype="int64", name="articles")
+        return total.astype("int64").sort_index().rename("articles")
+
+    def category_share(self, by=PARTITIONS, where=None):
+        """Devolver la proporcion de cada categoria por media y mes.
+
+        Parameters
+        ----------
+        by : tuple, optional
+            The columns of the groups, by default the media and the month
+        where : dict, optional
+            Filters of the rows, as in scan()
+
+        Returns
+        -------
+        A pandas DataFrame indexed by the columns by, with a column of the
+        share of the articles of every category and a "total" column
+        """
+        counts = self.count(list(by) + ["category"], where)
+        if counts.empty:
+            import pandas as pd
+            return pd.DataFrame()
+        table = counts.unstack("category", fill_value=0)
+        total = table.sum(axis=1)
+        share = table.div(total, axis=0)
+        share.columns = [str(column) for column in share.columns]
+        share["total"] = total
+        return share
+
+    def mentions(self, name, columns=("url", "media", "month", "category"), where=None):
+        """Devolver los articulos que mencionan un inversor o anunciante.
+
+        An article mentions the name when it is in the investors and
+        advertisers found in its text (detected_pat) or it is the sponsor
+        of its banner.
+
+        Returns
+        -------
+        A pandas DataFrame with the columns of the articles
+        """
+        import pandas as pd
+        columns = list(columns)
+        read = list(dict.fromkeys(columns + ["detected_pat", "sponsor"]))
+        frames = []
+        for frame in self.scan(read, where):
+            found = frame["detected_pat"].explode()
+            mask = (frame["sponsor"] == name) | frame.index.isin(found.index[found == name])
+            if mask.any():
+                frames.append(frame.loc[mask, columns])
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def mention_counts(self, by=("media",), where=None):
+        """Contar los articulos que mencionan cada inversor o anunciante.
+
+        Returns
+        -------
+        A pandas Series of the number of articles, indexed by the columns by
+        and the name ("name")
+        """
+        import pandas as pd
+        by = list(by)
+        total = None
+        for frame in self.scan(by + ["detected_pat"], where):
+            # a name counts once per article
+            names = frame.explode("detected_pat").dropna(subset=["detected_pat"])
+            names = names.reset_index().drop_duplicates(["index", "detected_pat"])
+            names = names.drop(columns="index").rename(columns={"detected_pat": "name"})
+            if len(names):
+                total = _add_counts(total, names.groupby(by + ["name"], observed=True).size())
+        if total is None:
+            return pd.Series([], dtype="int64", name="articles")
+        return total.astype("int64").sort_values(ascending=False).rename("articles")
+
+    def partitions(self):
+        """Devolver las particiones (media, month) del almacen.
+        """
+        found = []
+        for media_dir in sorted(os.listdir(self.path)):
+            if not media_dir.startswith("media="):
+                continue
+            for month_dir in sorted(os.listdir(os.path.join(self.path, media_dir))):
+                if month_dir.startswith("month="):
+                    found.append((media_dir[len("media="):], month_dir[len("month="):]))
+        return found
+
+    def discard_batches(self, run, after):
+        """Borrar los lotes de una ejecucion posteriores a un punto de control.
+
+        The files of the batches of the run numbered above after are
+        removed, e.g. those appended by an interrupted label run after its
+        last checkpoint, which are appended again when it resumes.
+
+        Returns
+        -------
+        The number of files removed
+        """
+        removed = 0
+        for media, month in self.partitions():
+            directory = self._partition_dir(media, month)
+            for f in os.listdir(directory):
+                parts = f[:-len(".parquet")].split("-") if f.endswith(".parquet") else []
+                if len(parts) == 4 and parts[1] == run and int(parts[2]) > after:
+                    os.remove(os.path.join(directory, f))
+                    removed += 1
+        return removed
+
+    def compact(self):
+        """Unir los ficheros de cada particion en uno solo.
+
+        Returns
+        -------
+        The number of partitions rewritten
+        """
+        pa = require("pyarrow", "arrow")
+        pq = require("pyarrow.parquet", "arrow")
+        rewritten = 0
+        for media, month in self.partitions():
+            directory = self._partition_dir(media, month)
+            files = sorted(f for f in os.listdir(directory) if f.endswith(".parquet") and not f.startswith("."))
+            if len(files) < 2:
+                continue
+            table = pa.concat_tables([pq.read_table(os.path.join(directory, f)) for f in files])
+            self._write(table, directory)
+            for f in files:
+                os.remove(os.path.join(directory, f))
+            rewritten += 1
+        return rewritten
+
+    def __len__(self):
+        return sum(fragment.metadata.num_rows for fragment in self.dataset().get_fragments())
@@ -0,0 +1,3 @@
+"""Benchmarks of the etiquetador. They run offline and print their
+measures; run them with python -m etiquetador_noticias.bench.<name>.
+"""
@@ -0,0 +1,93 @@
+"""Benchmark of the de-duplication of reporter and entity names.
+
+    python -m etiquetador_noticias.bench.dedup --sizes 100 1000 5000
+
+The results are checked against the reference in tests/test_dedup.py.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+from etiquetador_noticias.tjtool.dedup import remove_contained
+
+FIRST_NAMES = ["Pedro", "Ana", "Luis", "María", "José", "Carmen", "Pablo", "Isabel",
+               "Juan", "Lucía", "Manuel", "Teresa", "Javier", "Sonia", "Miguel"]
+SURNAMES = ["Sánchez", "García", "López", "Martínez", "Fernández", "Polanco", "Guindos",
+            "Rodríguez", "Gómez", "Díaz", "Ruiz", "Alcántara", "Varela", "Navarro"]
+
+
+def synthetic_names(n, seed=0):
+    """Return n candidate names like the ones of a long interview: full
+    names, surnames alone and composed names, with repetitions.
+    """
+    rnd = random.Random(seed)
+    names = []
+    while len(names) < n:
+        name = f"{rnd.choice(FIRST_NAMES)} {rnd.choice(SURNAMES)} {rnd.choice(SURNAMES)}{rnd.randint(0, n)}"
+        names.append(name)
+        # the short forms of the name also appear in the text
+        if rnd.random() < 0.5:
+            names.append(name.split(' ', 1)[1])
+        if rnd.random() < 0.2:
+            names.append(rnd.choice(SURNAMES))
+    return names[:n]
+
+
+def quadratic_remove_contained(name_list):
+    """The former implementation, kept as the reference.
+    """
+    new_name_list = []
+    for w1 in name_list:
+        repeated = False
+        remain = set(name_list)-set([w1])
+        for w2 in remain:
+            if w1 in w2:
+                repeated = True
+        if not repeated:
+            new_name_list.append(w1)
+    return list(set(new_name_list))
+
+
+def best_time(func, names, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(names)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def run(sizes, repeat=3, reference_limit=2000):
+    measures = []
+    for n in sizes:
+        names = synthetic_names(n)
+        seconds, result = best_time(remove_contained, names, repeat)
+        measure = {"names": n, "kept": len(result), "seconds": seconds}
+        if n <= reference_limit:
+            measure["reference_seconds"], _ = best_time(quadratic_remove_contained, names, 1)
+        measures.append(measure)
+    return measures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 1000, 2000, 5000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--reference-limit", type=int, default=2000,
+                        help="largest size also run with the quadratic reference")
+    parser.add_argument("--json", action="store_true", help="print the measures as JSON")
+    args = parser.parse_args(argv)
+    measures = run(args.sizes, args.repeat, args.reference_limit)
+    if args.json:
+        print(json.dumps(measures, indent=2))
+        return 0
+    print(f"{'names':>8} {'kept':>8} {'indexed (ms)':>14} {'quadratic (ms)':>16}")
+    for m in measures:
+        ref = f"{m['reference_seconds'] * 1000:16.1f}" if "reference_seconds" in m else f"{'-':>16}"
+        print(f"{m['names']:>8} {m['kept']:>8} {m['seconds'] * 1000:14.1f} {ref}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
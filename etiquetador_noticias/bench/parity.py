@@ -0,0 +1,100 @@
+"""Parity of the 'spacy' engine of SpacyReporterExtractor against the
+'pattern' one (pattern for the sentences, spaCy for the entities).
+
+    python -m etiquetador_noticias.bench.parity article1.txt corpus.jsonl ...
+
+Inputs are text files or JSONL files with a "text" field per line. For
+every text both engines are run and their reporters, entities and sources
+compared as sets. Exits with 1 when the mean Jaccard of the reporters is
+below --min-agreement (0.8 by default).
+"""
+import sys
+import json
+import time
+import argparse
+
+FIELDS = ('reporters', 'entities', 'sources')
+# minimum mean Jaccard of the reporters of both engines
+DEFAULT_MIN_AGREEMENT = 0.8
+
+
+def load_texts(paths):
+    """Yield (name, text) for every text of the files.
+    """
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            if path.endswith(".jsonl"):
+                for n, line in enumerate(f):
+                    if line.strip():
+                        record = json.loads(line)
+                        yield record.get("id", f"{path}:{n}"), record["text"]
+            else:
+                yield path, f.read()
+
+
+def jaccard(a, b):
+    a, b = set(a), set(b)
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def compare(texts, reference, candidate):
+    """Run both extractors over the texts and return the per-text
+    differences and the aggregated agreement.
+    """
+    report = {"texts": 0, "exact": {f: 0 for f in FIELDS}, "jaccard": {f: 0.0 for f in FIELDS},
+              "seconds": {"reference": 0.0, "candidate": 0.0}, "differences": []}
+    for name, text in texts:
+        outputs = []
+        for label, extractor in (("reference", reference), ("candidate", candidate)):
+            start = time.perf_counter()
+            extractor.parse(text)
+            outputs.append({"reporters": extractor.get_reporters(),
+                            "entities": extractor.get_entities(),
+                            "sources": extractor.get_sources()})
+            report["seconds"][label] += time.perf_counter() - start
+        ref, cand = outputs
+        report["texts"] += 1
+        diff = {}
+        for field in FIELDS:
+            report["jaccard"][field] += jaccard(ref[field], cand[field])
+            if set(ref[field]) == set(cand[field]):
+                report["exact"][field] += 1
+            else:
+                diff[field] = {"missing": sorted(set(ref[field]) - set(cand[field])),
+                               "extra": sorted(set(cand[field]) - set(ref[field]))}
+        if diff:
+            report["differences"].append({"text": name, **diff})
+    for field in FIELDS:
+        report["jaccard"][field] /= max(report["texts"], 1)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="text or JSONL files")
+    parser.add_argument("--min-agreement", type=float, default=DEFAULT_MIN_AGREEMENT,
+                        help="minimum mean Jaccard of the reporters")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    from etiquetador_noticias.tjtool import SpacyReporterExtractor
+    reference = SpacyReporterExtractor(engine='pattern', memo=False, neardup=False)
+    candidate = SpacyReporterExtractor(engine='spacy', memo=False, neardup=False)
+    report = compare(load_texts(args.paths), reference, candidate)
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(f"texts: {report['texts']}")
+        for field in FIELDS:
+            print(f"{field:>10}: exact {report['exact'][field]}/{report['texts']}, "
+                  f"mean jaccard {report['jaccard'][field]:.3f}")
+        seconds = report["seconds"]
+        print(f"time: pattern {seconds['reference']:.2f} s, spacy {seconds['candidate']:.2f} s")
+    return 0 if report["jaccard"]["reporters"] >= args.min_agreement else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""Benchmark suite of the extractors and the analyser over an offline corpus.
+
+    python -m etiquetador_noticias.bench.suite -o bench.json
+    python -m etiquetador_noticias.bench.suite --synthetic 200 --long 1 --baseline bench.json
+
+The corpus is the checked-in bench/corpus/articles.jsonl plus the given
+JSONL files and synthetic articles; nothing is downloaded. Every target is
+measured warm (resources loaded, latency percentiles and throughput over
+the corpus) and cold (a new process, from the import of the package to the
+first article analysed). The measures are written as JSON and can be
+compared with a previous run with --baseline.
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import platform
+import subprocess
+import tempfile
+
+from etiquetador_noticias.profiling import percentile
+
+this_dir, this_filename = os.path.split(__file__)
+
+CORPUS = os.path.join(this_dir, "corpus", "articles.jsonl")
+TARGETS = ("reporter_extractor", "spacy_extractor", "spacy_engine", "triage_engine", "entities", "publi",
+           "analyser")
+
+
+def load_corpus(paths):
+    """Return the records of the JSONL files, with the article text
+    extracted offline from the html when the record has none.
+    """
+    items = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            items.extend(json.loads(line) for line in f if line.strip())
+    for item in items:
+        if "text" not in item:
+            from newspaper import Article
+            article = Article(item["url"])
+            article.download(input_html=item["html"])
+            article.parse()
+            item["text"] = article.text
+    return items
+
+
+# capitalised word sequences, the names looked up in the Entities table
+_NAME = re.compile(r"[A-ZÁÉÍÓÚÑ][\wáéíóúñü]+(?:\s+(?:de\s+|del\s+)?[A-ZÁÉÍÓÚÑ][\wáéíóúñü]+)*")
+
+
+def setup(target, items):
+    """Return the function that runs the target over one item.
+    """
+    from etiquetador_noticias.resources import registry
+    if target == "reporter_extractor":
+        from etiquetador_noticias.tjtool import ReporterExtractor
+        extractor = ReporterExtractor(memo=False, neardup=False)
+        return lambda item: extractor.parse(item["text"])
+    if target in ("spacy_extractor", "spacy_engine"):
+        from etiquetador_noticias.tjtool import SpacyReporterExtractor
+        engine = "spacy" if target == "spacy_engine" else "pattern"
+        extractor = SpacyReporterExtractor(memo=False, engine=engine, neardup=False)
+        return lambda item: extractor.parse(item["text"])
+    if target == "triage_engine":
+        from etiquetador_noticias.tjtool import ReporterExtractor, TriageExtractor
+        extractor = TriageExtractor(full=ReporterExtractor(memo=False, neardup=False))
+        return lambda item: extractor.parse(item["text"])
+    if target == "entities":
+        entities = registry.entities()
+        names = {id(item): _NAME.findall(item["text"]) for item in items}
+        return lambda item: entities.describe_many(names[id(item)])
+    if target == "publi":
+        from etiquetador_noticias.analyser import Analyser
+        analysers = {id(item): Analyser(item["url"], html=item["html"]) for item in items}
+        return lambda item: analysers[id(item)].detect_publi_in_text()
+    if target == "analyser":
+        from etiquetador_noticias.analyser import Analyser
+        from etiquetador_noticias.tjtool import ReporterExtractor
+        extractor = ReporterExtractor(neardup=False)
+
+        def run(item):
+            # every run analyses the article again, not the memoized result
+            registry.memo().clear()
+            return Analyser(item["url"], html=item["html"], extractor=extractor).analyse()
+        return run
+    raise ValueError(f"Unknown target {target!r}, use one of {', '.join(TARGETS)}")
+
+
+def run_warm(target, items, repeat=3):
+    """Measure the target with every resource loaded: a first pass to warm
+    up and repeat passes over the corpus.
+    """
+    from etiquetador_noticias.resources import registry
+    registry.warm_up()
+    run = setup(target, items)
+    for item in items:
+        run(item)
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            t = time.perf_counter()
+            run(item)
+            latencies.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    chars = repeat * sum(len(item["text"]) for item in items)
+    return {"items": len(latencies),
+            "seconds": elapsed,
+            "items_per_second": len(latencies) / elapsed if elapsed else None,
+            "chars_per_second": chars / elapsed if elapsed else None,
+            "latency_ms": {f"p{q}": percentile(latencies, q) * 1000 for q in (50, 90, 99)},
+            "max_ms": latencies[-1] * 1000 if latencies else None}
+
+
+_COLD_SCRIPT = """
+import sys, json, time
+start = time.perf_counter()
+from etiquetador_noticias.bench.suite import setup
+with open(sys.argv[2], encoding="utf-8") as f:
+    item = json.loads(f.readline())
+run = setup(sys.argv[1], [item])
+run(item)
+print(json.dumps({"seconds": time.perf_counter() - start}))
+"""
+
+
+def run_cold(target, items, repeat=3):
+    """Measure, in new processes, the time from the import of the package
+    to the result of the first article (the loading of the resources
+    included).
+    """
+    with tempfile.NamedTemporaryFile("w", suffix=".jsonl", encoding="utf-8", delete=False) as f:
+        f.write(json.dumps(items[0], ensure_ascii=False) + "\n")
+    try:
+        times = []
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, "-c", _COLD_SCRIPT, target, f.name], check=True,
+                                 stdout=subprocess.PIPE, universal_newlines=True).stdout
+            times.append(json.loads(out.strip().splitlines()[-1])["seconds"])
+    finally:
+        os.remove(f.name)
+    times.sort()
+    return {"runs": len(times), "median_seconds": percentile(times, 50), "min_seconds": times[0]}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=this_dir, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              universal_newlines=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def corpus_info(items):
+    h = hashlib.sha256()
+    for item in items:
+        h.update(item["html"].encode("utf-8"))
+    return {"items": len(items),
+            "chars": sum(len(item["text"]) for item in items),
+            "sha256": h.hexdigest()[:16]}
+
+
+def compare(report, baseline, tolerance):
+    """Return the regressions of the report against the baseline: warm
+    p50 latencies and cold medians more than tolerance slower.
+    """
+    regressions = []
+    for target, measures in report["results"].items():
+        old = baseline.get("results", {}).get(target, {})
+        pairs = []
+        if "warm" in measures and "warm" in old:
+            pairs.append(("warm p50 ms", old["warm"]["latency_ms"]["p50"], measures["warm"]["latency_ms"]["p50"]))
+        if "cold" in measures and "cold" in old:
+            pairs.append(("cold median s", old["cold"]["median_seconds"], measures["cold"]["median_seconds"]))
+        for name, before, now in pairs:
+            if before and now > before * (1 + tolerance):
+                regressions.append({"target": target, "measure": name, "baseline": before, "current": now})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="*", help="JSONL files of {url, html[, text]} records "
+                        "(default is the checked-in corpus)")
+    parser.add_argument("--targets", nargs="+", default=list(TARGETS), choices=TARGETS)
+    parser.add_argument("--modes", nargs="+", default=["warm", "cold"], choices=["warm", "cold"])
+    parser.add_argument("--repeat", type=int, default=3, help="passes over the corpus (warm)")
+    parser.add_argument("--cold-runs", type=int, default=3, help="new processes per target (cold)")
+    parser.add_argument("--synthetic", type=int, default=0, help="synthetic articles to add")
+    parser.add_argument("--long", type=int, default=0, help="long synthetic articles to add")
+    parser.add_argument("--long-paragraphs", type=int, default=300)
+    parser.add_argument("-o", "--output", default=None, help="JSON file of the measures (default is stdout)")
+    parser.add_argument("--baseline", default=None, help="JSON file of a previous run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown against the baseline (default is 20%%)")
+    parser.add_argument("--profile", default=None, help="file for the per-stage profile of the warm runs")
+    args = parser.parse_args(argv)
+
+    from etiquetador_noticias.bench.synthetic import synthetic_corpus
+    items = load_corpus(args.corpus or [CORPUS])
+    items.extend(synthetic_corpus(args.synthetic))
+    items.extend(synthetic_corpus(args.long, paragraphs=args.long_paragraphs, seed=1))
+
+    profiler = None
+    if args.profile:
+        from etiquetador_noticias import profiling
+        profiler = profiling.enable()
+
+    report = {"meta": {"python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "git_commit": _git_commit(),
+                       "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                       "corpus": corpus_info(items)},
+              "results": {}}
+    for target in args.targets:
+        measures = report["results"][target] = {}
+        if "warm" in args.modes:
+            measures["warm"] = run_warm(target, items, args.repeat)
+        if "cold" in args.modes:
+            measures["cold"] = run_cold(target, items, args.cold_runs)
+        print(f"{target}: {json.dumps(measures)}", file=sys.stderr)
+
+    if profiler is not None:
+        profiler.write(args.profile)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+        status = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Generator of synthetic news articles for the benchmarks.
+
+    python -m etiquetador_noticias.bench.synthetic -n 100 --paragraphs 12 > corpus.jsonl
+
+Every line is a {"id", "url", "html", "text"} record, like the ones of the
+checked-in corpus, so the output can be given to the benchmark suite or to
+"etiquetador label". The articles are reproducible for a given seed.
+"""
+import sys
+import json
+import random
+import argparse
+from html import escape
+
+from etiquetador_noticias.bench.dedup import FIRST_NAMES, SURNAMES
+
+VERBS = ["afirmó", "aseguró", "explicó", "declaró", "indicó", "añadió", "denunció",
+         "confirmó", "advirtió", "señaló", "reconoció", "destacó"]
+ROLES = ["el portavoz de", "la presidenta de", "el secretario general de", "la directora de",
+         "el consejero delegado de", "la responsable de comunicación de"]
+ORGANISATIONS = ["la Asociación de Consumidores", "el Ministerio de Hacienda", "la patronal del sector",
+                 "la Confederación Hidrográfica", "el Colegio de Médicos", "la Federación de Municipios"]
+SOURCES = ["Europa Press", "EFE", "Reuters", "Agencias"]
+SPONSORS = ["Telefónica", "Banco Sabadell", "Vodafone", "Banco Santander", "HSBC"]
+TOPICS = ["la subida de los precios", "el nuevo plan de inversiones", "la reforma laboral",
+          "el cierre de oficinas", "las ayudas a la vivienda", "el despliegue de la fibra"]
+FILLERS = ["La medida afectará a miles de hogares durante los próximos meses.",
+           "El debate se prolongará previsiblemente hasta el final de la legislatura.",
+           "Los datos del último trimestre confirman la tendencia de los meses anteriores.",
+           "La propuesta deberá pasar todavía por el Consejo de Ministros.",
+           "Las organizaciones del sector piden más tiempo para adaptarse a los cambios."]
+
+
+def _person(rnd):
+    return f"{rnd.choice(FIRST_NAMES)} {rnd.choice(SURNAMES)}"
+
+
+def _sentence(rnd, sponsor_rate):
+    kind = rnd.random()
+    topic = rnd.choice(TOPICS)
+    if kind < 0.35:
+        return (f"{rnd.choice(ROLES).capitalize()} {rnd.choice(ORGANISATIONS)}, {_person(rnd)}, "
+                f"{rnd.choice(VERBS)} que {topic} es una prioridad.")
+    if kind < 0.5:
+        return f"Según {rnd.choice(SOURCES)}, {topic} se aprobará antes del verano."
+    if kind < 0.5 + sponsor_rate:
+        return f"{rnd.choice(SPONSORS)} {rnd.choice(VERBS)} que participará en {topic}."
+    if kind < 0.75:
+        return f"{_person(rnd)} {rnd.choice(VERBS)} en una entrevista que {topic} llega tarde."
+    return rnd.choice(FILLERS)
+
+
+def synthetic_article(n, paragraphs=8, sentences=4, seed=0, media_url="https://elpais.com",
+                      sponsor_rate=0.1):
+    """Return the n-th synthetic article as a {"id", "url", "html", "text"}
+    record.
+    """
+    rnd = random.Random(f"{seed}:{n}")
+    title = f"Nuevo debate sobre {rnd.choice(TOPICS)}"
+    body = [" ".join(_sentence(rnd, sponsor_rate) for _ in range(sentences))
+            for _ in range(paragraphs)]
+    html = ('<!DOCTYPE html><html lang="es"><head><meta charset="utf-8">'
+            f'<title>{escape(title)}</title></head><body><header><h1>{escape(title)}</h1></header>'
+            '<article>\n' + "\n".join(f"<p>{escape(p, quote=False)}</p>" for p in body) +
+            '\n</article></body></html>')
+    return {"id": f"synthetic-{seed}-{n}",
+            "url": f"{media_url}/sintetico/{seed}/{n}.html",
+            "html": html,
+            "text": "\n\n".join(body)}
+
+
+def synthetic_corpus(count, paragraphs=8, sentences=4, seed=0, **kwargs):
+    """Yield count synthetic articles.
+    """
+    for n in range(count):
+        yield synthetic_article(n, paragraphs, sentences, seed, **kwargs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--count", type=int, default=100, help="number of articles")
+    parser.add_argument("--paragraphs", type=int, default=8, help="paragraphs per article")
+    parser.add_argument("--sentences", type=int, default=4, help="sentences per paragraph")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--media-url", default="https://elpais.com")
+    args = parser.parse_args(argv)
+    for article in synthetic_corpus(args.count, args.paragraphs, args.sentences, args.seed,
+                                    media_url=args.media_url):
+        sys.stdout.write(json.dumps(article, ensure_ascii=False) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+"""Speed and accuracy of the 'triage' engine (TriageExtractor) against the
+full extractor.
+
+    python -m etiquetador_noticias.bench.triage
+    python -m etiquetador_noticias.bench.triage corpus.jsonl --synthetic 200 --paragraphs 1
+
+The corpus is the checked-in bench/corpus/articles.jsonl, or the given
+JSONL files, plus synthetic articles; nothing is downloaded. Every text is
+parsed by the full extractor and by the triage engine, which escalates to
+the same full extractor near the boundary of the category. The report
+compares the times, the number of escalations, the count of reporters and
+sources and the side of the boundary (more than two) they fall on. Exits
+with 1 when the share of texts on the same side of the boundary is below
+--min-agreement (0.9 by default).
+"""
+import sys
+import json
+import time
+import argparse
+
+from etiquetador_noticias.bench.parity import FIELDS, jaccard
+
+# minimum share of texts on the same side of the boundary for both engines
+DEFAULT_MIN_AGREEMENT = 0.9
+
+
+def _count(result):
+    return len(result["reporters"]) + len(result["sources"])
+
+
+def _parse(extractor, text):
+    extractor.parse(text)
+    return {"reporters": extractor.get_reporters(),
+            "entities": extractor.get_entities(),
+            "sources": extractor.get_sources()}
+
+
+def compare(items, full, triage, boundary=2):
+    """Run both engines over the texts and return the per-text differences
+    of the count of reporters and sources and the aggregated measures.
+    """
+    report = {"texts": 0, "escalated": 0, "boundary_agreement": 0, "count_exact": 0,
+              "count_mean_abs_error": 0.0, "jaccard": {f: 0.0 for f in FIELDS},
+              "seconds": {"full": 0.0, "triage": 0.0}, "differences": []}
+    for item in items:
+        text = item["text"]
+        start = time.perf_counter()
+        reference = _parse(full, text)
+        report["seconds"]["full"] += time.perf_counter() - start
+        escalated = triage.escalated
+        start = time.perf_counter()
+        candidate = _parse(triage, text)
+        report["seconds"]["triage"] += time.perf_counter() - start
+
+        report["texts"] += 1
+        report["escalated"] += triage.escalated - escalated
+        ref_count, cand_count = _count(reference), _count(candidate)
+        report["count_exact"] += ref_count == cand_count
+        report["count_mean_abs_error"] += abs(ref_count - cand_count)
+        for field in FIELDS:
+            report["jaccard"][field] += jaccard(reference[field], candidate[field])
+        if (ref_count > boundary) == (cand_count > boundary):
+            report["boundary_agreement"] += 1
+        else:
+            report["differences"].append({"text": item.get("id", item.get("url")),
+                                          "full": ref_count, "triage": cand_count})
+    texts = max(report["texts"], 1)
+    report["count_mean_abs_error"] /= texts
+    for field in FIELDS:
+        report["jaccard"][field] /= texts
+    seconds = report["seconds"]
+    report["speedup"] = seconds["full"] / seconds["triage"] if seconds["triage"] else None
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="*", help="JSONL files of {url, html[, text]} records "
+                        "(default is the checked-in corpus)")
+    parser.add_argument("--synthetic", type=int, default=0, help="synthetic articles to add")
+    parser.add_argument("--paragraphs", type=int, default=2,
+                        help="paragraphs of the synthetic articles (short ones fall near the boundary)")
+    parser.add_argument("--full", default="pattern", choices=["pattern", "spacy"],
+                        help="full extractor: ReporterExtractor or the 'spacy' engine of SpacyReporterExtractor")
+    parser.add_argument("--margin", type=int, default=1,
+                        help="counts of reporters and sources within margin of the boundary are escalated")
+    parser.add_argument("--min-agreement", type=float, default=DEFAULT_MIN_AGREEMENT,
+                        help="minimum share of texts on the same side of the boundary")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    from etiquetador_noticias.bench.suite import CORPUS, load_corpus
+    from etiquetador_noticias.bench.synthetic import synthetic_corpus
+    from etiquetador_noticias.tjtool import ReporterExtractor, SpacyReporterExtractor, TriageExtractor
+    items = load_corpus(args.corpus or [CORPUS])
+    items.extend(synthetic_corpus(args.synthetic, paragraphs=args.paragraphs))
+
+    if args.full == "spacy":
+        full = SpacyReporterExtractor(engine="spacy", memo=False, neardup=False)
+    else:
+        full = ReporterExtractor(memo=False, neardup=False)
+    triage = TriageExtractor(full=full, margin=args.margin)
+    report = compare(items, full, triage, boundary=triage.boundary)
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        texts = max(report["texts"], 1)
+        print(f"texts: {report['texts']}, escalated {report['escalated']} "
+              f"({report['escalated'] / texts:.0%})")
+        print(f"boundary: same side {report['boundary_agreement']}/{report['texts']}; "
+              f"count: exact {report['count_exact']}/{report['texts']}, "
+              f"mean abs error {report['count_mean_abs_error']:.2f}")
+        for field in FIELDS:
+            print(f"{field:>10}: mean jaccard {report['jaccard'][field]:.3f}")
+        seconds = report["seconds"]
+        print(f"time: full {seconds['full']:.2f} s, triage {seconds['triage']:.2f} s "
+              f"(x{report['speedup'] or 0:.1f})")
+    return 0 if report["boundary_agreement"] >= args.min_agreement * report["texts"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
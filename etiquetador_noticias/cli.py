@@ -0,0 +1,398 @@
+import os
+import sys
+import json
+import uuid
+import argparse
+
+
+def read_records(stream):
+    """Leer los articulos de un flujo JSONL.
+
+    Every line is either a plain url, a JSON string with the url or a JSON
+    object with "url" and optionally "html" and "id". Yields
+    (line_number, record) pairs, with record as a dict, or None for blank
+    lines. Lines that are not valid JSON or have no url yield a failed
+    record, with "ok" set to False and the "error" message, instead of
+    stopping the stream.
+    """
+    for n, line in enumerate(stream):
+        line = line.strip()
+        if not line:
+            yield n, None
+            continue
+        record = None
+        try:
+            if line.startswith('{'):
+                record = json.loads(line)
+            elif line.startswith('"'):
+                record = {"url": json.loads(line)}
+            else:
+                record = {"url": line}
+            if not isinstance(record, dict):
+                raise ValueError(f"line {n + 1} is not a JSON object")
+            if not isinstance(record.get("url"), str) or not record["url"]:
+                raise ValueError(f"line {n + 1} has no url")
+        except ValueError as e:
+            failed = {"url": None, "ok": False, "error": f"{type(e).__name__}: {e}"}
+            if isinstance(record, dict) and "id" in record:
+                failed["id"] = record["id"]
+            record = failed
+        yield n, record
+
+
+class Checkpoint(object):
+    """Punto de control para reanudar un etiquetado interrumpido.
+
+    Results arrive in completion order, so the checkpoint keeps the first
+    input line not yet finished (every line before it is done) and the
+    finished lines after it, which are at most the articles in flight. It
+    also keeps the size of the output when it was saved: the results
+    written after it are not in the checkpoint, so on resume the output is
+    truncated to it and they are written again, once. For the same reason
+    it keeps the id of the run and the number of the last batch of results
+    appended to the store: the later batches are discarded on resume.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.next_line = 0
+        self.done = set()
+        self.offset = None
+        self.run = uuid.uuid4().hex[:12]
+        self.batch = 0
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            self.next_line = state["next_line"]
+            self.done = set(state["done"])
+            self.offset = state.get("offset")
+            self.run = state.get("run") or self.run
+            self.batch = state.get("batch", 0)
+
+    def is_done(self, n):
+        return n < self.next_line or n in self.done
+
+    def mark(self, n):
+        self.done.add(n)
+        while self.next_line in self.done:
+            self.done.remove(self.next_line)
+            self.next_line += 1
+
+    def save(self, offset=None):
+        """ Save the state, with the size in bytes of the flushed output.
+        """
+        if not self.path:
+            return
+        self.offset = offset
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"next_line": self.next_line, "done": sorted(self.done), "offset": offset,
+                       "run": self.run, "batch": self.batch}, f)
+        os.replace(tmp, self.path)
+
+
+def label(args):
+    """Etiquetar un corpus JSONL y escribir los resultados en JSONL.
+    """
+    from etiquetador_noticias.analyser.batch import analyse_many
+
+    checkpoint = Checkpoint(args.checkpoint)
+    resuming = checkpoint.next_line > 0 or checkpoint.done
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    if args.output == "-":
+        sink = sys.stdout
+    else:
+        sink = open(args.output, "a" if resuming else "w", encoding="utf-8")
+        if resuming and checkpoint.offset is not None:
+            # drop the results written after the checkpoint, and a partial last line
+            sink.truncate(checkpoint.offset)
+
+    ids = {}  # input line -> id of the records in flight
+    profiler = None
+    index, indexed = None, []
+    if args.index:
+        from etiquetador_noticias.analyser.relabel import TermIndex, data_snapshot
+        index = TermIndex(args.index)
+        snapshot = data_snapshot()
+        if index.snapshot() is None:
+            index.set_snapshot(snapshot)
+        elif index.snapshot() != snapshot:
+            print(f"warning: the data files changed since the articles of {args.index} were analysed, "
+                  "run 'etiquetador relabel' to update them", file=sys.stderr)
+    store, stored = None, []
+    if args.store:
+        from etiquetador_noticias.analyser.store import ResultStore
+        store = ResultStore(args.store)
+        if resuming:
+            # drop the batches appended after the checkpoint
+            store.discard_batches(checkpoint.run, checkpoint.batch)
+    if args.profile:
+        from etiquetador_noticias.profiling import Profiler
+        profiler = Profiler()
+
+    written = 0
+
+    def save():
+        nonlocal indexed, stored
+        sink.flush()
+        if index is not None:
+            index.add_many(indexed)
+            indexed = []
+        if store is not None and stored:
+            checkpoint.batch += 1
+            store.append(stored, batch=(checkpoint.run, checkpoint.batch))
+            stored = []
+        checkpoint.save(sink.tell() if sink is not sys.stdout else None)
+
+    def write(n, result):
+        nonlocal written
+        if "terms" in result:
+            indexed.append(dict(result))
+            del result["terms"]
+        if store is not None:
+            stored.append(result)
+        sink.write(json.dumps(result, ensure_ascii=False) + "\n")
+        checkpoint.mark(n)
+        written += 1
+        if written % args.checkpoint_every == 0:
+            save()
+
+    def items():
+        for n, record in read_records(source):
+            if checkpoint.is_done(n):
+                continue
+            if record is None:
+                checkpoint.mark(n)
+                continue
+            if record.get("ok") is False:
+                # invalid line: its failure is written without analysing it
+                record.setdefault("id", n)
+                write(n, record)
+                continue
+            # the input line identifies the record while it is in flight
+            ids[n] = record.get("id", n)
+            record["id"] = n
+            yield record
+
+    try:
+        results = analyse_many(items(), variant=args.variant, workers=args.workers,
+                               download_workers=args.download_workers,
+                               max_pending=args.max_pending, cache=args.cache,
+                               profiler=profiler, terms=index is not None, engine=args.engine)
+        for result in results:
+            n = result["id"]
+            result["id"] = ids.pop(n)
+            write(n, result)
+    finally:
+        save()
+        if profiler is not None:
+            profile_format = args.profile_format or ("prometheus" if args.profile.endswith(".prom") else "json")
+            profiler.write(args.profile, profile_format)
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    return 0
+
+
+def relabel(args):
+    """Reetiquetar los articulos de un indice afectados por cambios en los datos.
+    """
+    from etiquetador_noticias.analyser.relabel import TermIndex, relabel as relabel_index
+    index = TermIndex(args.index)
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        for record in relabel_index(index, cache=args.cache, dry_run=args.dry_run,
+                                    workers=args.workers, download_workers=args.download_workers):
+            sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if sink is not sys.stdout:
+            sink.close()
+    return 0
+
+
+def report(args):
+    """Escribir en CSV un agregado del almacen de resultados.
+    """
+    from etiquetador_noticias.analyser.store import ResultStore
+    store = ResultStore(args.store)
+    where = {column: values for column, values in (("media", args.media), ("month", args.month),
+                                                   ("variant", args.variant)) if values}
+    if args.mentions:
+        table = store.mentions(args.mentions, where=where)
+    elif args.query == "categories":
+        table = store.category_share(by=args.by, where=where)
+    elif args.query == "mentions":
+        table = store.mention_counts(by=args.by, where=where)
+    else:
+        table = store.count(by=args.by, where=where)
+    table.to_csv(sys.stdout if args.output == "-" else args.output, index=not args.mentions)
+    return 0
+
+
+def serve(args):
+    """Servir el etiquetado por HTTP con los modelos precargados.
+    """
+    from etiquetador_noticias.service import LabellingService, make_server
+    service = LabellingService(variant=args.variant, max_batch=args.max_batch,
+                               max_wait=args.max_wait / 1000, queue_size=args.queue_size,
+                               prepare_workers=args.prepare_workers, cache=args.cache,
+                               spacy_engine=args.spacy_engine)
+    server = make_server(service, args.host, args.port, args.socket,
+                         request_timeout=args.timeout, verbose=args.verbose)
+    address = f"unix:{args.socket}" if args.socket else f"http://{args.host}:{args.port}"
+    print(f"etiquetador serving on {address}", file=sys.stderr)
+    service.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+# modules that must not be imported by "import etiquetador_noticias..."
+HEAVY_MODULES = ["spacy", "es_core_news_md", "pattern", "pandas", "newspaper", "bs4", "nltk"]
+# maximum import time in seconds
+STARTUP_BUDGET = 0.5
+
+_STARTUP_SCRIPT = """
+import sys, time, json
+t = time.perf_counter()
+import etiquetador_noticias.tjtool, etiquetador_noticias.analyser
+elapsed = time.perf_counter() - t
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def startup(args):
+    """Medir el tiempo de importacion del paquete en un proceso nuevo.
+
+    Fails (exit code 1) when the import takes more than the budget or when
+    it imports any of the heavy dependencies.
+    """
+    import subprocess
+    times, heavy = [], []
+    for _ in range(args.repeat):
+        out = subprocess.run([sys.executable, "-c", _STARTUP_SCRIPT % HEAVY_MODULES],
+                             check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+        measure = json.loads(out)
+        times.append(measure["seconds"])
+        heavy = measure["heavy"]
+    best = min(times)
+    print(f"import time: {best * 1000:.1f} ms (budget {args.budget * 1000:.0f} ms)")
+    if heavy:
+        print(f"heavy modules imported at startup: {', '.join(heavy)}")
+    return 0 if best <= args.budget and not heavy else 1
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="etiquetador",
+        description="Auditor de transparencia informativa en medios digitales")
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    p = commands.add_parser("label", help="etiquetar un corpus de articulos en JSONL")
+    p.add_argument("input", nargs="?", default="-",
+                   help="JSONL file with urls or {url, html} records (default is stdin)")
+    p.add_argument("-o", "--output", default="-",
+                   help="JSONL file for the results (default is stdout)")
+    p.add_argument("--variant", default="seria", choices=["seria", "gamberra"],
+                   help="variant of the classification tree")
+    p.add_argument("--workers", type=int, default=None,
+                   help="analysis processes (default is the number of cores)")
+    p.add_argument("--download-workers", type=int, default=16,
+                   help="download threads")
+    p.add_argument("--max-pending", type=int, default=None,
+                   help="maximum number of articles in flight")
+    p.add_argument("--cache", default=None,
+                   help="sqlite file of the article cache")
+    p.add_argument("--checkpoint", default=None,
+                   help="file to resume an interrupted run from")
+    p.add_argument("--checkpoint-every", type=int, default=100,
+                   help="results between checkpoints")
+    p.add_argument("--profile", default=None,
+                   help="file for the per-stage times, sizes and cache hits")
+    p.add_argument("--profile-format", default=None, choices=["json", "prometheus"],
+                   help="format of the profile (default is prometheus for .prom files, else json)")
+    p.add_argument("--engine", default="full", choices=["full", "triage"],
+                   help="full parsing of every article, or gazetteers and parsing only near the category boundary")
+    p.add_argument("--index", default=None,
+                   help="sqlite file of the term index used by 'relabel'")
+    p.add_argument("--store", default=None,
+                   help="directory of the Parquet results store used by 'report'")
+    p.set_defaults(func=label)
+
+    p = commands.add_parser("report", help="agregar los resultados del almacen")
+    p.add_argument("store", help="directory of the results store written by 'label --store'")
+    p.add_argument("query", nargs="?", default="categories", choices=["categories", "mentions", "count"],
+                   help="share of every category, articles per investor or advertiser, or articles")
+    p.add_argument("--by", nargs="+", default=["media", "month"],
+                   help="columns of the groups (default is media and month)")
+    p.add_argument("--media", nargs="+", default=None, help="only these media domains")
+    p.add_argument("--month", nargs="+", default=None, help="only these months (YYYY-MM)")
+    p.add_argument("--variant", default=None, help="only this variant")
+    p.add_argument("--mentions", default=None,
+                   help="list the articles that mention this investor or advertiser")
+    p.add_argument("-o", "--output", default="-", help="CSV file (default is stdout)")
+    p.set_defaults(func=report)
+
+    p = commands.add_parser("relabel", help="reetiquetar los articulos afectados por cambios en los datos")
+    p.add_argument("index", help="sqlite file of the term index written by 'label --index'")
+    p.add_argument("-o", "--output", default="-",
+                   help="JSONL file for the updated results (default is stdout)")
+    p.add_argument("--cache", default=None,
+                   help="sqlite file of the article cache, to avoid downloading the articles again")
+    p.add_argument("--workers", type=int, default=None,
+                   help="analysis processes (default is the number of cores)")
+    p.add_argument("--download-workers", type=int, default=16,
+                   help="download threads")
+    p.add_argument("--dry-run", action="store_true",
+                   help="only count the changes and the affected articles")
+    p.set_defaults(func=relabel)
+
+    p = commands.add_parser("serve", help="servir el etiquetado por HTTP con los modelos precargados")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8080)
+    p.add_argument("--socket", default=None,
+                   help="path of a Unix socket to listen on instead of the TCP port")
+    p.add_argument("--variant", default="seria", choices=["seria", "gamberra"],
+                   help="default variant of the classification tree")
+    p.add_argument("--max-batch", type=int, default=16,
+                   help="maximum number of articles per micro-batch")
+    p.add_argument("--max-wait", type=float, default=10,
+                   help="milliseconds a micro-batch waits for more articles")
+    p.add_argument("--queue-size", type=int, default=256,
+                   help="maximum number of queued articles, beyond it requests get 503")
+    p.add_argument("--prepare-workers", type=int, default=8,
+                   help="threads downloading and parsing the articles")
+    p.add_argument("--cache", default=None,
+                   help="sqlite file of the article cache")
+    p.add_argument("--spacy-engine", default=None, choices=["pattern", "spacy"],
+                   help="extract with SpacyReporterExtractor and this engine, batched across articles")
+    p.add_argument("--timeout", type=float, default=300,
+                   help="seconds a request waits for its result")
+    p.add_argument("--verbose", action="store_true", help="log every request")
+    p.set_defaults(func=serve)
+
+    p = commands.add_parser("startup", help="comprobar el tiempo de arranque del paquete")
+    p.add_argument("--budget", type=float, default=STARTUP_BUDGET,
+                   help="maximum import time in seconds")
+    p.add_argument("--repeat", type=int, default=3,
+                   help="number of measures, the best one is used")
+    p.set_defaults(func=startup)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
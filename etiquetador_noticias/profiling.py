@@ -0,0 +1,245 @@
+import json
+import time
+import bisect
+import threading
+
+
+# CPU time of the calling thread when available (python >= 3.7)
+_cpu_time = getattr(time, 'thread_time', time.process_time)
+
+# upper bounds in seconds of the buckets of the wall time histograms
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Stage(object):
+    """ Timer of a stage of the analysis, used as a context manager.
+
+    The wall and CPU time are always measured. When the stage ends it is
+    reported to the enabled Profiler and to the collectors of the thread,
+    if any. Sizes of the input (chars, sentences, entities...) and whether
+    a cache was hit can be set inside the block.
+
+    >>> with stage('parsetree', chars=len(text)) as s:
+    ...     tree = parsetree(text)
+    ...     s.sizes['sentences'] = len(tree)
+    """
+
+    __slots__ = ('name', 'sizes', 'cache_hit', 'wall', 'cpu', '_start', '_start_cpu')
+
+    def __init__(self, name, sizes):
+        self.name = name
+        self.sizes = sizes
+        self.cache_hit = None
+        self.wall = self.cpu = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._start_cpu = _cpu_time()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self._start
+        self.cpu = _cpu_time() - self._start_cpu
+        collectors = getattr(_local, 'collectors', None)
+        if _profiler is None and not collectors:
+            return
+        event = (self.name, self.wall, self.cpu, self.sizes, self.cache_hit)
+        if _profiler is not None:
+            _profiler.add(event)
+        if collectors:
+            for events in collectors:
+                events.append(event)
+
+
+class _StageStats(object):
+
+    def __init__(self, buckets):
+        self.count = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.histogram = [0] * (len(buckets) + 1)
+        self.sizes = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def to_dict(self, buckets):
+        return {"count": self.count,
+                "wall_seconds": self.wall,
+                "cpu_seconds": self.cpu,
+                "histogram": {**{str(le): n for le, n in zip(buckets, self.histogram)},
+                              "+Inf": self.histogram[-1]},
+                "sizes": dict(self.sizes),
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses}
+
+
+class Profiler(object):
+    """Medidas por etapa del analisis de los articulos.
+
+    Aggregates the events of the stages: the number of calls, the wall and
+    CPU seconds with a histogram of the wall time, the sum of the input
+    sizes and the cache hits and misses. Callbacks receive every event as
+    a (name, wall, cpu, sizes, cache_hit) tuple.
+
+    Parameters
+    ----------
+    buckets : tuple of float, optional
+        Upper bounds in seconds of the histogram buckets
+
+    Examples
+    --------
+    >>> from etiquetador_noticias import profiling
+    >>> profiler = profiling.enable()
+    >>> Analyser(url).analyse()
+    >>> print(profiler.to_prometheus())
+    >>> profiling.disable()
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.callbacks = []
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, event):
+        """ Aggregate the event of a stage.
+        """
+        name, wall, cpu, sizes, cache_hit = event
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = _StageStats(self.buckets)
+            stats.count += 1
+            stats.wall += wall
+            stats.cpu += cpu
+            stats.histogram[bisect.bisect_left(self.buckets, wall)] += 1
+            for unit, size in sizes.items():
+                stats.sizes[unit] = stats.sizes.get(unit, 0) + size
+            if cache_hit is True:
+                stats.cache_hits += 1
+            elif cache_hit is False:
+                stats.cache_misses += 1
+        for callback in self.callbacks:
+            callback(event)
+
+    def add_many(self, events):
+        """ Aggregate the events collected elsewhere, e.g. in another process.
+        """
+        for event in events:
+            self.add(tuple(event))
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+
+    def snapshot(self):
+        """ Return the aggregated measures as a dict of plain types.
+        """
+        with self._lock:
+            return {name: stats.to_dict(self.buckets) for name, stats in sorted(self._stages.items())}
+
+    def to_json(self):
+        return json.dumps({"buckets": list(self.buckets), "stages": self.snapshot()}, indent=2)
+
+    def to_prometheus(self, prefix="etiquetador"):
+        """ Return the measures in the Prometheus text exposition format.
+        """
+        stages = self.snapshot()
+        lines = [f"# HELP {prefix}_stage_seconds Wall time of the stages of the analysis.",
+                 f"# TYPE {prefix}_stage_seconds histogram"]
+        for name, stats in stages.items():
+            cumulative = 0
+            for le, n in stats["histogram"].items():
+                cumulative += n
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stats["wall_seconds"]}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+        lines += [f"# HELP {prefix}_stage_cpu_seconds_total CPU time of the stages of the analysis.",
+                  f"# TYPE {prefix}_stage_cpu_seconds_total counter"]
+        for name, stats in stages.items():
+            lines.append(f'{prefix}_stage_cpu_seconds_total{{stage="{name}"}} {stats["cpu_seconds"]}')
+        lines += [f"# HELP {prefix}_stage_input_total Size of the input of the stages.",
+                  f"# TYPE {prefix}_stage_input_total counter"]
+        for name, stats in stages.items():
+            for unit, size in sorted(stats["sizes"].items()):
+                lines.append(f'{prefix}_stage_input_total{{stage="{name}",unit="{unit}"}} {size}')
+        lines += [f"# HELP {prefix}_stage_cache_total Cache lookups of the stages.",
+                  f"# TYPE {prefix}_stage_cache_total counter"]
+        for name, stats in stages.items():
+            if stats["cache_hits"] or stats["cache_misses"]:
+                lines.append(f'{prefix}_stage_cache_total{{stage="{name}",result="hit"}} {stats["cache_hits"]}')
+                lines.append(f'{prefix}_stage_cache_total{{stage="{name}",result="miss"}} {stats["cache_misses"]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, format="json"):
+        """ Write the measures to a file as "json" or "prometheus".
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus() if format == "prometheus" else self.to_json())
+
+
+def percentile(sorted_values, q):
+    """Return the q-th percentile (0-100) of sorted values, interpolated.
+    """
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+_profiler = None
+_local = threading.local()
+
+
+def stage(name, **sizes):
+    """Return the Stage timer of a stage of the analysis.
+    """
+    return Stage(name, sizes)
+
+
+def enable(profiler=None):
+    """Report the stages of the process to the profiler (a new one by
+    default) and return it.
+    """
+    global _profiler
+    _profiler = profiler if profiler is not None else Profiler()
+    return _profiler
+
+
+def disable():
+    """Stop reporting the stages. Returns the profiler that was enabled.
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def get_profiler():
+    """Return the enabled profiler, or None.
+    """
+    return _profiler
+
+
+class collect(object):
+    """ Collect the events of the stages run by the current thread, e.g.
+    to send them from a worker process to the parent.
+
+    >>> with collect() as events:
+    ...     Analyser(url).analyse()
+    >>> profiler.add_many(events)
+    """
+
+    def __enter__(self):
+        self.events = []
+        if not hasattr(_local, 'collectors'):
+            _local.collectors = []
+        _local.collectors.append(self.events)
+        return self.events
+
+    def __exit__(self, *exc):
+        _local.collectors.pop()
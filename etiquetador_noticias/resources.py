@@ -0,0 +1,267 @@
+import os
+import hashlib
+import importlib
+import threading
+
+
+this_dir, this_filename = os.path.split(__file__)
+
+
+class ResourceRegistry(object):
+    """ Process-wide registry for the heavy resources shared by every
+    extractor and analyser: the spaCy pipeline, the pattern taxonomy, the
+    entities table and the investors table.
+
+    Resources are loaded lazily the first time they are requested and then
+    reused by every instance. Loading is protected by a lock so that several
+    threads asking for the same resource only load it once.
+
+    Examples
+    --------
+    >>> from etiquetador_noticias.resources import registry
+    >>> registry.warm_up()      # load everything before serving requests
+    >>> nlp = registry.nlp()    # shared spaCy pipeline
+    >>> registry.reset()        # forget everything (useful in tests)
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._resources = {}
+
+    def _get(self, name, loader):
+        """ Return the resource stored under name, loading it if needed.
+        """
+        try:
+            return self._resources[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._resources:
+                self._resources[name] = loader()
+            return self._resources[name]
+
+    def nlp(self):
+        """Return the shared spaCy pipeline for spanish.
+        """
+        return self._get('nlp', _load_nlp)
+
+    def taxonomy_loader(self):
+        """Return the TaxonomyLoader of the process.
+        """
+        def load():
+            from etiquetador_noticias.tjtool.taxonomy import TaxonomyLoader
+            return TaxonomyLoader()
+        return self._get('taxonomy_loader', load)
+
+    def taxonomy(self):
+        """Return pattern's taxonomy with the reported verbs, sources and
+        locations loaded.
+        """
+        return self.taxonomy_loader().load()
+
+    def spacy_matchers(self):
+        """Return the spaCy matchers of reported verbs and of sources and
+        locations, built from the same data files as the taxonomy.
+        """
+        def load():
+            from etiquetador_noticias.tjtool.matchers import build_spacy_matchers
+            return build_spacy_matchers(self.nlp())
+        return self._get('spacy_matchers', load)
+
+    def gazetteer(self):
+        """Return the Gazetteer of the TriageExtractor, compiled from the
+        same data files as the taxonomy.
+        """
+        def load():
+            from etiquetador_noticias.tjtool.triage import Gazetteer
+            return Gazetteer()
+        return self._get('gazetteer', load)
+
+    def reload_taxonomy(self):
+        """Apply the changes of the data files to the taxonomy and return
+        its new version. Memoized extractions of the old data are no longer
+        used.
+        """
+        with self._lock:
+            version = self.taxonomy_loader().reload()
+            self._resources.pop('data_fingerprint', None)
+            self._resources.pop('spacy_matchers', None)
+            self._resources.pop('gazetteer', None)
+        return version
+
+    def entities(self):
+        """Return the shared Entities table.
+        """
+        return self._get('entities', _load_entities)
+
+    def investors(self):
+        """Return the investors and big advertisers table as a DataFrame.
+        Lookups by media should use media_index(), which does not need
+        pandas.
+        """
+        return self._get('investors', _load_investors)
+
+    def media(self):
+        """Return the (media_name, media_url) pairs of the investors table.
+        """
+        return self._get('media', lambda: self.investors()[["media_name", "media_url"]].drop_duplicates())
+
+    def memo(self):
+        """Return the ExtractionMemo shared by the extractors.
+        """
+        def load():
+            from etiquetador_noticias.tjtool.memo import ExtractionMemo
+            return ExtractionMemo()
+        return self._get('memo', load)
+
+    def neardup(self):
+        """Return the NearDuplicateIndex shared by the extractors, stored in
+        the cache directory.
+        """
+        def load():
+            from etiquetador_noticias.analyser.media_index import DEFAULT_CACHE_DIR
+            from etiquetador_noticias.tjtool.neardup import NearDuplicateIndex
+            return NearDuplicateIndex(os.path.join(DEFAULT_CACHE_DIR, "neardup.sqlite"))
+        return self._get('neardup', load)
+
+    def data_fingerprint(self):
+        """Return a hash of the data files used by the extractors: the
+        reported verbs, the sources, the locations and the entities.
+        """
+        return self._get('data_fingerprint', _data_fingerprint)
+
+    def media_index(self):
+        """Return the compiled MediaIndex of the investors table.
+        """
+        def load():
+            from etiquetador_noticias.analyser.media_index import MediaIndex
+            return MediaIndex().load()
+        return self._get('media_index', load)
+
+    def banner_detector(self):
+        """Return the BannerDetector with the sponsorship rules of the media.
+        """
+        def load():
+            from etiquetador_noticias.analyser.banners import BannerDetector
+            return BannerDetector()
+        return self._get('banner_detector', load)
+
+    def sponsors(self, media_url):
+        """Return the (pat_entity, pat_type) pairs of the investors table for
+        the media of the url.
+        """
+        return self.media_index().sponsors(media_url)
+
+    def sponsor_matcher(self, media_url, ignore_case=False, ignore_accents=False):
+        """Return the automaton that finds the investors and advertisers of
+        the media in a text, built once per media and matching options.
+        """
+        record = self.media_index().lookup(media_url)
+        domain = record.domain if record is not None else None
+
+        def load():
+            from etiquetador_noticias.analyser.matcher import SponsorMatcher
+            return SponsorMatcher([entity for entity, _ in self.sponsors(media_url)],
+                                  ignore_case=ignore_case, ignore_accents=ignore_accents)
+        return self._get(('sponsor_matcher', domain, ignore_case, ignore_accents), load)
+
+    def punkt(self, download=False):
+        """Return the path of NLTK's punkt tokenizer, looked up locally.
+
+        Only when download is True is it fetched if missing; otherwise a
+        LookupError explains how to install it.
+        """
+        return self._get('punkt', lambda: _find_punkt(download))
+
+    def warm_up(self, nlp=True, taxonomy=True, entities=True, investors=True):
+        """ Load the requested resources in advance, so that the first
+        article analysed does not pay for it.
+        """
+        if nlp:
+            self.nlp()
+        if taxonomy:
+            self.taxonomy()
+        if entities:
+            self.entities()
+        if investors:
+            self.media_index()
+        return self
+
+    def reset(self):
+        """ Forget every loaded resource. They will be loaded again the next
+        time they are requested.
+        """
+        with self._lock:
+            if 'taxonomy_loader' in self._resources:
+                self._resources['taxonomy_loader'].unload()
+            self._resources.clear()
+
+
+def require(module, extra):
+    """Import an optional dependency of the package, or raise an ImportError
+    telling which extra installs it.
+    """
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        raise ImportError(f"{module} is not installed. "
+                          f"Install it with: pip install 'etiquetador_noticias[{extra}]'") from e
+
+
+def _load_nlp():
+    import es_core_news_md
+    return es_core_news_md.load()
+
+
+def _find_punkt(download):
+    import nltk
+    try:
+        return nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        if not download:
+            raise LookupError("NLTK's punkt tokenizer is not installed. "
+                              "Install it with: python -m nltk.downloader punkt")
+    nltk.download('punkt', quiet=True)
+    return nltk.data.find('tokenizers/punkt')
+
+
+# data files of the extractors
+EXTRACTOR_DATA_FILES = [os.path.join(this_dir, "tjtool", "data", name)
+                        for name in ("reported_verbs.txt", "sources.txt",
+                                     "locations.txt", "entities.csv")]
+
+
+def _data_fingerprint():
+    h = hashlib.sha256()
+    for file_name in EXTRACTOR_DATA_FILES:
+        with open(file_name, 'rb') as f:
+            h.update(f.read())
+        h.update(b'\0')
+    return h.hexdigest()[:16]
+
+
+def _load_entities():
+    from etiquetador_noticias.tjtool.tjtool import Entities
+    return Entities()
+
+
+def _load_investors():
+    import pandas as pd
+    table_file = os.path.join(this_dir, "analyser", "data", "tabla_de_inversores_y_grandes_anunciantes.xlsx")
+    return pd.read_excel(table_file)
+
+
+# the registry shared by the whole process
+registry = ResourceRegistry()
+
+
+def warm_up(**kwargs):
+    """Load the shared resources in advance. See ResourceRegistry.warm_up.
+    """
+    return registry.warm_up(**kwargs)
+
+
+def reset():
+    """Forget the shared resources. See ResourceRegistry.reset.
+    """
+    registry.reset()
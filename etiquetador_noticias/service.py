@@ -0,0 +1,513 @@
+"""Servicio local de etiquetado con los modelos precargados.
+
+    etiquetador serve --port 8080
+    etiquetador serve --socket /run/etiquetador.sock
+
+The resources are loaded once, when the service starts. Concurrent
+requests are queued and coalesced into micro-batches: the articles of a
+batch are downloaded and parsed by newspaper in a thread pool, their texts
+go through the extractor together (parse_many, which fills the shared
+memo) and then every article is analysed. The queue is bounded; when it is
+full the request is rejected with 503 and a Retry-After header.
+
+Endpoints (JSON):
+
+    POST /analyse   {"url": ..., "html": ..., "id": ..., "variant": ...}
+    GET  /health    whether the resources are loaded
+    GET  /stats     counters, throughput, latencies and batch sizes
+    GET  /metrics   per-stage profile in the Prometheus text format
+"""
+import os
+import json
+import time
+import queue
+import socket
+import threading
+import http.client
+import socketserver
+from collections import deque, namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from etiquetador_noticias import profiling
+from etiquetador_noticias.profiling import stage, percentile
+
+
+# latencies and completion times kept for the stats
+_WINDOW = 1000
+# seconds of the recent throughput
+_RECENT = 60
+
+_Job = namedtuple('_Job', ['url', 'html', 'variant', 'item_id', 'future', 'received'])
+
+
+class ServiceBusy(Exception):
+    """The queue of the service is full, the request can be retried later.
+    """
+
+
+class ServiceError(IOError):
+    """Error response of the service.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+class LabellingService(object):
+    """Servicio de etiquetado con micro-lotes y cola acotada.
+
+    Requests are submitted with submit(), which returns a Future of the
+    record of the article (the same record as analyse_many). A single
+    thread takes the requests from the queue in batches of up to max_batch
+    articles, waiting at most max_wait seconds for a batch to fill.
+    Identical requests in flight (same url, html and variant) share the
+    same Future.
+
+    The stages of the batches are reported to the profiler of the service
+    only, not to the profiler enabled in the process. An error in a batch
+    fails its articles and the next batches are still served.
+
+    Parameters
+    ----------
+    variant : str, optional
+        Default variant of the classification tree (default is "seria")
+    max_batch : int, optional
+        Maximum number of articles per batch (default is 16)
+    max_wait : float, optional
+        Seconds a batch waits for more articles (default is 0.01)
+    queue_size : int, optional
+        Maximum number of queued requests (default is 256)
+    prepare_workers : int, optional
+        Threads downloading and parsing the articles of a batch (default is 8)
+    cache : str, optional
+        Path of an ArticleCache file
+    spacy_engine : str, optional
+        Use a SpacyReporterExtractor with this engine ("pattern" or "spacy"),
+        whose spaCy stage is batched across the articles of a batch. By
+        default the ReporterExtractor of the Analyser is used
+
+    Examples
+    --------
+    >>> service = LabellingService().start()
+    >>> service.submit("https://elpais.com/...").result()["category"]
+    >>> service.close()
+    """
+
+    def __init__(self, variant="seria", max_batch=16, max_wait=0.01, queue_size=256,
+                 prepare_workers=8, cache=None, spacy_engine=None):
+        self.variant = variant
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.cache = cache
+        self.spacy_engine = spacy_engine
+        self.profiler = profiling.Profiler()
+        self.extractor = None
+        self.ready = threading.Event()
+        self.error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._prepare = ThreadPoolExecutor(max_workers=prepare_workers)
+        self._inflight = {}  # request key -> Future
+        self._lock = threading.Lock()
+        self._thread = None
+        self._started = None
+        self._counters = dict.fromkeys(['received', 'completed', 'failed', 'rejected',
+                                        'coalesced', 'batches', 'batched'], 0)
+        self._latencies = deque(maxlen=_WINDOW)
+        self._finished = deque(maxlen=_WINDOW)
+        self._batch_sizes = deque(maxlen=_WINDOW)
+
+    def start(self):
+        """ Start the batching thread, which loads the resources first.
+        """
+        self._started = time.time()
+        self._thread = threading.Thread(target=self._run, name="etiquetador-batcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """ Stop the batching thread once the queued requests are done.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._prepare.shutdown(wait=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, url, html=None, variant=None, item_id=None):
+        """ Queue an article and return the Future of its record.
+
+        Raises
+        ------
+        ServiceBusy
+            If the queue is full
+        """
+        variant = variant or self.variant
+        if variant not in ("seria", "gamberra"):
+            raise ValueError(f"Unknown variant {variant!r}")
+        key = (url, variant, hash(html))
+        with self._lock:
+            self._counters['received'] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self._counters['coalesced'] += 1
+            else:
+                future = Future()
+                try:
+                    self._queue.put_nowait(_Job(url, html, variant, item_id, future, time.perf_counter()))
+                except queue.Full:
+                    self._counters['rejected'] += 1
+                    raise ServiceBusy(f"The queue is full ({self._queue.maxsize} articles)")
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+        if item_id is None:
+            return future
+        # the id of the request is set in a copy of the shared record
+        tagged = Future()
+        future.add_done_callback(lambda f: tagged.set_result({**f.result(), "id": item_id}))
+        return tagged
+
+    def _forget(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _run(self):
+        from etiquetador_noticias.resources import registry
+        from etiquetador_noticias.analyser.batch import _failure
+        try:
+            registry.warm_up()
+            if self.spacy_engine is not None:
+                from etiquetador_noticias.tjtool import SpacyReporterExtractor
+                self.extractor = SpacyReporterExtractor(batch_size=self.max_batch, engine=self.spacy_engine)
+            else:
+                from etiquetador_noticias.tjtool import ReporterExtractor
+                self.extractor = ReporterExtractor()
+        except Exception as e:
+            # the requests fail with the error, reported by health() too
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.ready.set()
+        while True:
+            jobs = self._next_batch()
+            stop = jobs and jobs[-1] is None
+            jobs = [job for job in jobs if job is not None]
+            if jobs:
+                try:
+                    # the stages of the batch are reported to the profiler of the service
+                    with profiling.collect() as events:
+                        self._run_batch(jobs)
+                except Exception as e:
+                    # only the articles of the batch fail, the service goes on
+                    for job in jobs:
+                        if not job.future.done():
+                            self._finish(job, _failure(job.url, e))
+                self.profiler.add_many(events)
+            if stop:
+                return
+
+    def _next_batch(self):
+        """ Wait for a request and return it with the ones that arrive
+        before the batch is full or max_wait has passed.
+        """
+        jobs = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(jobs) < self.max_batch and jobs[-1] is not None:
+            remaining = deadline - time.perf_counter()
+            try:
+                jobs.append(self._queue.get(timeout=remaining) if remaining > 0
+                            else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return jobs
+
+    def _prepare_job(self, job):
+        """ Return the Analyser of the job, which downloads and parses the
+        article, reporting its stages to the profiler of the service.
+        """
+        with profiling.collect() as events:
+            try:
+                return self._analyser(job)
+            finally:
+                self.profiler.add_many(events)
+
+    def _analyser(self, job):
+        from etiquetador_noticias.analyser import Analyser
+        from etiquetador_noticias.analyser.batch import _open_cache
+        cache = _open_cache(self.cache) if self.cache is not None else None
+        return Analyser(job.url, variant=job.variant, html=job.html, cache=cache,
+                        extractor=self.extractor)
+
+    def _run_batch(self, jobs):
+        """ Analyse a batch of articles, the extraction of all of them at once.
+        """
+        from etiquetador_noticias.analyser.batch import _failure
+        if self.error is not None:
+            for job in jobs:
+                self._finish(job, _failure(job.url, RuntimeError(f"The service could not start: {self.error}")))
+            return
+        with stage('service_batch', articles=len(jobs)):
+            # download and parse the articles in parallel
+            futures = [self._prepare.submit(self._prepare_job, job) for job in jobs]
+            analysers = []
+            for job, future in zip(jobs, futures):
+                try:
+                    analysers.append(future.result())
+                except Exception as e:
+                    analysers.append(None)
+                    self._finish(job, _failure(job.url, e))
+            # one pass of the extractor over the texts of the batch fills the memo
+            texts = [analyser.article.text for analyser in analysers if analyser is not None]
+            try:
+                with stage('service_extract', articles=len(texts)):
+                    for _ in self.extractor.parse_many(texts):
+                        pass
+            except Exception:
+                # every article is extracted again on its own by analyse()
+                pass
+            for job, analyser in zip(jobs, analysers):
+                if analyser is None:
+                    continue
+                try:
+                    record = {"url": job.url, "ok": True, **analyser.analyse().to_dict()}
+                except Exception as e:
+                    record = _failure(job.url, e)
+                self._finish(job, record)
+        with self._lock:
+            self._counters['batches'] += 1
+            self._counters['batched'] += len(jobs)
+            self._batch_sizes.append(len(jobs))
+
+    def _finish(self, job, record):
+        now = time.perf_counter()
+        with self._lock:
+            self._counters['completed' if record["ok"] else 'failed'] += 1
+            self._latencies.append(now - job.received)
+            self._finished.append(now)
+        job.future.set_result(record)
+
+    def health(self):
+        """ Return the state of the service: "loading", "ok" or "error".
+        """
+        if not self.ready.is_set():
+            return {"status": "loading"}
+        if self.error is not None or self._thread is None:
+            return {"status": "error", "error": self.error}
+        return {"status": "ok", "uptime_seconds": time.time() - self._started}
+
+    def stats(self):
+        """ Return the counters, throughput, latencies and batch sizes.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            counters = dict(self._counters)
+            latencies = sorted(self._latencies)
+            recent = sum(1 for t in self._finished if now - t <= _RECENT)
+            batch_sizes = list(self._batch_sizes)
+        uptime = time.time() - self._started if self._started else 0.0
+        batched = counters.pop('batched')
+        done = counters['completed'] + counters['failed']
+        return {**counters,
+                "queued": self._queue.qsize(),
+                "queue_size": self._queue.maxsize,
+                "in_flight": len(self._inflight),
+                "uptime_seconds": uptime,
+                "articles_per_second": done / uptime if uptime else None,
+                "recent_articles_per_second": recent / min(uptime, _RECENT) if uptime else None,
+                "latency_ms": {f"p{q}": (percentile(latencies, q) or 0.0) * 1000 for q in (50, 90, 99)},
+                "mean_batch_size": batched / counters['batches'] if counters['batches'] else None,
+                "max_batch_size": max(batch_sizes) if batch_sizes else None}
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def address_string(self):
+        # the client address of a Unix socket is empty
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body, content_type="application/json", headers=()):
+        data = (json.dumps(body, ensure_ascii=False) if content_type == "application/json"
+                else body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        service = self.server.service
+        path = self.path.split("?")[0]
+        if path == "/health":
+            health = service.health()
+            self._send(200 if health["status"] == "ok" else 503, health)
+        elif path == "/stats":
+            self._send(200, service.stats())
+        elif path == "/metrics":
+            self._send(200, service.profiler.to_prometheus(), content_type="text/plain")
+        else:
+            self._send(404, {"error": f"Unknown path {path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        if self.path.split("?")[0] != "/analyse":
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length).decode("utf-8"))
+            if isinstance(request, str):
+                request = {"url": request}
+            future = service.submit(request["url"], request.get("html"), request.get("variant"),
+                                    request.get("id"))
+        except ServiceBusy as e:
+            self._send(503, {"error": str(e)}, headers=[("Retry-After", "1")])
+            return
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": f"Bad request: {type(e).__name__}: {e}"})
+            return
+        try:
+            record = future.result(timeout=self.server.request_timeout)
+        except Exception:
+            self._send(504, {"error": f"No result in {self.server.request_timeout} seconds"})
+            return
+        self._send(200 if record["ok"] else 500, record)
+
+
+class _TCPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(service, host="127.0.0.1", port=8080, socket_path=None, request_timeout=300,
+                verbose=False):
+    """Crear el servidor HTTP del servicio, en un puerto TCP o en un socket Unix.
+
+    Call serve_forever() on the result to serve the requests, and
+    shutdown() and server_close() to stop it.
+    """
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = _UnixServer(socket_path, _Handler)
+    else:
+        server = _TCPServer((host, port), _Handler)
+    server.service = service
+    server.request_timeout = request_timeout
+    server.verbose = verbose
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class ServiceClient(object):
+    """Cliente del servicio de etiquetado.
+
+    Only the standard library is used. A new connection is opened per
+    request, so a client can be shared by many threads.
+
+    Parameters
+    ----------
+    address : str, optional
+        "host:port", "http://host:port" or "unix:/path/of/the.sock"
+        (default is "127.0.0.1:8080")
+    timeout : float, optional
+        Seconds to wait for a response (default is 300)
+
+    Examples
+    --------
+    >>> client = ServiceClient("unix:/run/etiquetador.sock")
+    >>> client.analyse("https://elpais.com/...", html=html)["category"]
+    """
+
+    def __init__(self, address="127.0.0.1:8080", timeout=300):
+        self.address = address
+        self.timeout = timeout
+
+    def _connection(self):
+        if self.address.startswith("unix:"):
+            return _UnixHTTPConnection(self.address[len("unix:"):], self.timeout)
+        host = self.address.split("://", 1)[-1].rstrip("/")
+        return http.client.HTTPConnection(host, timeout=self.timeout)
+
+    def _request(self, method, path, body=None):
+        connection = self._connection()
+        try:
+            data = json.dumps(body).encode("utf-8") if body is not None else None
+            headers = {"Content-Type": "application/json"} if data is not None else {}
+            connection.request(method, path, body=data, headers=headers)
+            response = connection.getresponse()
+            text = response.read().decode("utf-8")
+            content_type = response.getheader("Content-Type", "")
+            return response.status, json.loads(text) if content_type.startswith("application/json") else text
+        finally:
+            connection.close()
+
+    def analyse(self, url, html=None, variant=None, item_id=None):
+        """ Return the record of the article. Articles that fail return a
+        record with "ok" set to False and the "error" message.
+
+        Raises
+        ------
+        ServiceBusy
+            If the queue of the service is full
+        ServiceError
+            For any other error response
+        """
+        request = {"url": url}
+        for name, value in (("html", html), ("variant", variant), ("id", item_id)):
+            if value is not None:
+                request[name] = value
+        status, body = self._request("POST", "/analyse", request)
+        if status == 503:
+            raise ServiceBusy(body["error"])
+        if status not in (200, 500) or "ok" not in body:
+            raise ServiceError(status, body.get("error") if isinstance(body, dict) else body)
+        return body
+
+    def health(self):
+        return self._request("GET", "/health")[1]
+
+    def stats(self):
+        return self._request("GET", "/stats")[1]
+
+    def metrics(self):
+        return self._request("GET", "/metrics")[1]
+
+    def wait_ready(self, timeout=300, interval=0.2):
+        """ Wait until the service has loaded its resources. Returns whether
+        it is ready.
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                if self.health().get("status") == "ok":
+                    return True
+            except OSError:
+                pass
+            time.sleep(interval)
+        return False
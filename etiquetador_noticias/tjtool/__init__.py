@@ -1 +1,2 @@
-from etiquetador_noticias.tjtool.tjtool import *
\ No newline at end of file
+from etiquetador_noticias.tjtool.tjtool import *
+from etiquetador_noticias.tjtool.triage import TriageExtractor
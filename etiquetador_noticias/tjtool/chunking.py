@@ -0,0 +1,68 @@
+import re
+
+
+# default maximum length in characters of the chunks parsed at once
+CHUNK_CHARS = 20000
+
+# end of a sentence: a full stop, closing quotes or brackets and whitespace
+# (question and exclamation marks are removed by the extractors' _clean)
+_SENTENCE_END = re.compile(r'[.…][)\]»”’]*\s+')
+
+
+def iter_chunks(text, max_chars=CHUNK_CHARS):
+    """ Split the text in consecutive chunks of at most max_chars characters
+    aligned to sentences, so that no sentence is shared by two chunks.
+
+    A chunk ends at the last paragraph break that fits, else at the last
+    end of sentence. Only a sentence longer than max_chars is cut, at the
+    last space that fits. Joined, the chunks are the text.
+    """
+    if max_chars <= 0:
+        raise ValueError("max_chars must be positive")
+    start, length = 0, len(text)
+    while length - start > max_chars:
+        limit = start + max_chars
+        cut = text.rfind('\n', start, limit) + 1
+        if cut <= start:
+            ends = [m.end() for m in _SENTENCE_END.finditer(text, start, limit)]
+            cut = ends[-1] if ends else text.rfind(' ', start, limit) + 1
+        if cut <= start:
+            cut = limit
+        yield text[start:cut]
+        start = cut
+    if start < length or not text:
+        yield text[start:]
+
+
+class WordPacker(object):
+    """ Incremental version of ReporterExtractor._pack_list: the words are
+    added chunk after chunk and only the strings of the packed names are
+    kept, so the trees of the chunks already parsed can be freed.
+
+    Consecutive words (position in the list minus the index of the word in
+    its sentence) are joined exactly as _pack_list does over the whole list.
+    """
+
+    def __init__(self):
+        self.names = []
+        self._count = 0
+        self._key = None
+        self._words = []
+
+    def extend(self, words):
+        for word in words:
+            key = self._count - word.index
+            self._count += 1
+            if key != self._key and self._words:
+                self.names.append(' '.join(self._words))
+                self._words = []
+            self._key = key
+            self._words.append(word.string)
+
+    def finish(self):
+        """ Return the packed names.
+        """
+        if self._words:
+            self.names.append(' '.join(self._words))
+            self._words = []
+        return self.names
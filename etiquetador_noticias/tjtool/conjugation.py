@@ -0,0 +1,121 @@
+from etiquetador_noticias.tjtool.tjtool import normalise_name
+
+
+# endings of the regular verbs, by the ending of the infinitive
+_ENDINGS = {
+    'ar': {'present': ['o', 'as', 'a', 'amos', 'ais', 'an'],
+           'subjunctive': ['e', 'es', 'e', 'emos', 'eis', 'en'],
+           'other': ['e', 'aste', 'o', 'amos', 'asteis', 'aron',
+                     'aba', 'abas', 'abamos', 'abais', 'aban',
+                     'ara', 'aras', 'aramos', 'arais', 'aran',
+                     'ase', 'ases', 'asemos', 'aseis', 'asen',
+                     'ado', 'ada', 'ados', 'adas', 'ando']},
+    'er': {'present': ['o', 'es', 'e', 'emos', 'eis', 'en'],
+           'subjunctive': ['a', 'as', 'amos', 'ais', 'an'],
+           'other': ['i', 'iste', 'io', 'imos', 'isteis', 'ieron',
+                     'ia', 'ias', 'iamos', 'iais', 'ian',
+                     'iera', 'ieras', 'ieramos', 'ierais', 'ieran',
+                     'iese', 'ieses', 'iesemos', 'ieseis', 'iesen',
+                     'ido', 'ida', 'idos', 'idas', 'iendo']},
+}
+_ENDINGS['ir'] = {'present': ['o', 'es', 'e', 'imos', 'is', 'en'],
+                  'subjunctive': _ENDINGS['er']['subjunctive'],
+                  'other': _ENDINGS['er']['other']}
+_FUTURE = ['e', 'as', 'a', 'emos', 'eis', 'an', 'ia', 'ias', 'iamos', 'iais', 'ian']
+# strong preterites: dij-o, pus-o, tuv-o...
+_STRONG = ['e', 'iste', 'o', 'imos', 'isteis', 'ieron', 'iera', 'ieras', 'ieramos', 'ierais',
+           'ieran', 'iese', 'ieses', 'iesemos', 'ieseis', 'iesen']
+
+# irregular verbs and the verbs derived from them (imponer, sostener...):
+# (strong preterite, stem of present "yo", stem of the future, participle)
+_IRREGULAR = {
+    'decir': ('dij', 'dig', 'dir', 'dicho'),
+    'poner': ('pus', 'pong', 'pondr', 'puesto'),
+    'tener': ('tuv', 'teng', 'tendr', None),
+    'hacer': ('hic', 'hag', 'har', 'hecho'),
+    'venir': ('vin', 'veng', 'vendr', None),
+    'ducir': ('duj', 'duzc', None, None),
+    'querer': ('quis', None, 'querr', None),
+    'escribir': (None, None, None, 'escrito'),
+}
+
+
+def _stem_changes(stem, ending):
+    """ Return the stems with the vowel changes of the present: e -> ie,
+    o -> ue and, for the -ir verbs, e -> i.
+    """
+    for i in range(len(stem) - 1, -1, -1):
+        if stem[i] in 'aeiou':
+            if stem[i] == 'e':
+                changed = [stem[:i] + 'ie' + stem[i + 1:]]
+                if ending == 'ir':
+                    changed.append(stem[:i] + 'i' + stem[i + 1:])
+                return changed
+            if stem[i] == 'o':
+                return [stem[:i] + 'ue' + stem[i + 1:]]
+            return []
+    return []
+
+
+def conjugate(lemma):
+    """ Return the set of the conjugated forms of a Spanish verb, normalised
+    like normalise_name (lowercase and without accents), including the
+    infinitive.
+
+    The regular paradigms are completed with the vowel changes of the
+    present (cuenta, niega, defiende), the spelling changes (indique,
+    niegue, recoja, reconozco, concluye, creyó) and the strong preterites and
+    irregular stems of decir, poner, tener and other common verbs, also in
+    their derived verbs (impuso, sostuvo). Forms that a verb does not
+    have can be included: the set is meant to find the texts where the
+    verb may appear.
+    """
+    lemma = normalise_name(lemma)
+    ending, stem = lemma[-2:], lemma[:-2]
+    if ending not in _ENDINGS or ' ' in lemma:
+        return {lemma}
+    paradigm = _ENDINGS[ending]
+    forms = {lemma}
+    forms.update(lemma + e for e in _FUTURE)
+    for endings in paradigm.values():
+        forms.update(stem + e for e in endings)
+    changes = _stem_changes(stem, ending)
+    for changed in changes:
+        forms.update(changed + e for e in paradigm['present'] + paradigm['subjunctive'])
+        if ending == 'ir':
+            forms.update(changed + e for e in ('io', 'ieron', 'iendo', 'iera', 'iese'))
+    # spelling changes before e: indique, niegue, empiece
+    if ending == 'ar':
+        for old, new in (('c', 'qu'), ('g', 'gu'), ('z', 'c')):
+            for base in [stem] + changes:
+                if base.endswith(old):
+                    forms.update(base[:-1] + new + e for e in paradigm['subjunctive'])
+    # -ger, -gir: recojo, recoja
+    if lemma.endswith(('ger', 'gir')):
+        for base in [stem] + changes:
+            forms.update(base[:-1] + 'j' + e for e in ['o'] + paradigm['subjunctive'])
+    # -cer, -cir after a vowel: reconozco, establezca
+    if lemma.endswith(('cer', 'cir')) and len(stem) > 1 and stem[-2] in 'aeiou':
+        forms.update(stem[:-1] + 'zc' + e for e in ['o'] + paradigm['subjunctive'])
+    # -uir: concluyo, concluye, concluyo, concluyeron
+    if lemma.endswith('uir'):
+        forms.update(stem + 'y' + e for e in ['o', 'es', 'e', 'en', 'a', 'as', 'amos', 'ais', 'an',
+                                              'eron', 'era', 'ese', 'endo'])
+    # a vowel before -er, -ir: creyo, creyeron, leyendo
+    if ending in ('er', 'ir') and stem and stem[-1] in 'aeou':
+        forms.update(stem + 'y' + e for e in ('o', 'eron', 'era', 'eras', 'eran', 'ese', 'endo'))
+    for base, (strong, present, future, participle) in _IRREGULAR.items():
+        if not lemma.endswith(base):
+            continue
+        prefix = lemma[:-len(base)]
+        if strong:
+            # dijeron, dijera: no i after j
+            endings = [e[1:] if strong.endswith('j') and e.startswith('ie') else e for e in _STRONG]
+            forms.update(prefix + strong + e for e in endings)
+        if present:
+            forms.update(prefix + present + e for e in ['o', 'a', 'as', 'amos', 'ais', 'an'])
+        if future:
+            forms.update(prefix + future + e for e in _FUTURE)
+        if participle:
+            forms.update(prefix + participle[:-1] + e for e in ('o', 'a', 'os', 'as'))
+    return forms
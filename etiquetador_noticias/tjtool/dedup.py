@@ -0,0 +1,35 @@
+from collections import defaultdict
+
+
+def remove_contained(names, gram=3):
+    """ Remove the names contained in other names, e.g. 'Sánchez' when
+    'Pedro Sánchez' is also in the list. Duplicates are removed as well and
+    the result keeps the order of first appearance.
+
+    Instead of comparing every pair of names, names are indexed by their
+    character n-grams of size gram: a name can only be contained in the
+    names that share its rarest n-gram, so only those are checked. Names
+    shorter than gram are counted in the text of all names joined.
+    """
+    unique = list(dict.fromkeys(names))
+    grams_of = []
+    index = defaultdict(list)  # n-gram -> positions of the names with it
+    for i, name in enumerate(unique):
+        grams = {name[k:k + gram] for k in range(len(name) - gram + 1)}
+        grams_of.append(grams)
+        for g in grams:
+            index[g].append(i)
+    joined = '\0'.join(unique)
+
+    kept = []
+    for i, name in enumerate(unique):
+        grams = grams_of[i]
+        if grams:
+            candidates = min((index[g] for g in grams), key=len)
+            contained = any(j != i and name in unique[j] for j in candidates)
+        else:
+            # every name but itself holds no occurrence, names have no '\0'
+            contained = joined.count(name) > 1
+        if not contained:
+            kept.append(name)
+    return kept
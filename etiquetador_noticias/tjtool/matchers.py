@@ -0,0 +1,29 @@
+import os
+
+
+this_dir, this_filename = os.path.split(__file__)
+
+
+def _read_terms(file_name):
+    with open(os.path.join(this_dir, "data", file_name), encoding="utf-8") as f:
+        return [term.strip() for term in f if term.strip()]
+
+
+def build_spacy_matchers(nlp):
+    """ Build the spaCy matchers equivalent to the pattern taxonomy.
+
+    Returns the Matcher of reported speech verbs, which matches the lemmas
+    of reported_verbs.txt and 'según', and the PhraseMatcher of the terms
+    of sources.txt (label SOURCE) and locations.txt (label LOCATION),
+    matched regardless of case.
+    """
+    from spacy.matcher import Matcher, PhraseMatcher
+
+    verbs = Matcher(nlp.vocab)
+    lemmas = [verb.lower() for verb in _read_terms("reported_verbs.txt")]
+    verbs.add('RPTVRB', [[{'LEMMA': {'IN': lemmas}}], [{'LOWER': 'según'}]])
+
+    gazetteer = PhraseMatcher(nlp.vocab, attr='LOWER')
+    gazetteer.add('SOURCE', [nlp.make_doc(term) for term in _read_terms("sources.txt")])
+    gazetteer.add('LOCATION', [nlp.make_doc(term) for term in _read_terms("locations.txt")])
+    return verbs, gazetteer
@@ -0,0 +1,91 @@
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class ExtractionMemo(object):
+    """ Memoizes the sources, reporters and entities extracted from a text.
+
+    Results are keyed on the hash of the cleaned text, the extractor and a
+    fingerprint of the data files, so that identical texts (e.g. wire
+    stories republished by many media) are only parsed once, and editing
+    the data files invalidates the stored results.
+
+    There is an in-memory LRU tier with maxsize entries and, when a path is
+    given, a persistent sqlite tier shared between runs and processes.
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits, self.misses = 0, 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+            with self._db:
+                self._db.execute("""CREATE TABLE IF NOT EXISTS extractions
+                    (key TEXT PRIMARY KEY, result TEXT NOT NULL)""")
+
+    @staticmethod
+    def key(namespace, fingerprint, text):
+        """ Return the key of the text for the extractor namespace and the
+        data files fingerprint.
+        """
+        h = hashlib.sha256()
+        for part in (namespace, fingerprint, text):
+            h.update(part.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def _remember(self, key, result):
+        self._lru[key] = result
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def get(self, key):
+        """ Return the stored result for the key, or None.
+        """
+        with self._lock:
+            result = self._lru.get(key)
+            if result is not None:
+                self._lru.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute("SELECT result FROM extractions WHERE key = ?",
+                                       (key,)).fetchone()
+                if row is not None:
+                    result = json.loads(row[0])
+                    self._remember(key, result)
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return result
+
+    def put(self, key, result):
+        """ Store the result (a dict of lists of strings) for the key.
+        """
+        with self._lock:
+            self._remember(key, result)
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("INSERT OR REPLACE INTO extractions VALUES (?, ?)",
+                                     (key, json.dumps(result)))
+
+    def clear(self):
+        """ Forget every stored result, in memory and on disk.
+        """
+        with self._lock:
+            self._lru.clear()
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM extractions")
+
+    def __len__(self):
+        return len(self._lru)
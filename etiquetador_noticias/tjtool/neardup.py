@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+
+# Mersenne prime of the MinHash permutations, the signatures fit in 32 bits
+_PRIME = (1 << 31) - 1
+# shingles hashed at once, bounds the memory of the permutations
+_BLOCK = 4096
+# texts indexed between two prunes of the old texts
+_PRUNE_EVERY = 256
+_WORD = re.compile(r'\w+')
+
+
+class NearDuplicateIndex(object):
+    """ Index of the texts already parsed, to reuse the sources, reporters
+    and entities of near-duplicate texts, e.g. wire stories republished by
+    many media with a new headline or a trimmed paragraph.
+
+    Every text is summarised by the MinHash signature of its shingles
+    (sequences of shingle words) and the signature is split in bands for
+    locality sensitive hashing: texts sharing a band are the candidates,
+    so a lookup does not depend on the number of texts indexed. A candidate
+    is a near-duplicate when the estimated Jaccard similarity of their
+    shingles is at least threshold. Texts shorter than min_words words
+    are not indexed.
+
+    The signatures and the results are stored in a sqlite file (in memory
+    without path) shared between runs and processes. Results are stored
+    under a namespace, the extractor and the fingerprint of its data files,
+    like in ExtractionMemo. The index keeps at most max_documents texts,
+    none older than ttl seconds: the oldest ones are pruned every few
+    insertions and expired texts are never returned.
+
+    >>> index = NearDuplicateIndex("neardup.sqlite")
+    >>> sketch = index.sketch(text)
+    >>> index.get(namespace, sketch) or index.put(namespace, sketch, parse(text))
+    """
+
+    def __init__(self, path=None, threshold=0.8, num_perm=128, bands=16, shingle=5,
+                 min_words=50, seed=1, max_documents=100000, ttl=30 * 24 * 3600):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle = shingle
+        self.min_words = min_words
+        self.seed = seed
+        self.max_documents = max_documents
+        self.ttl = ttl
+        self.hits, self.misses = 0, 0
+        self._puts = 0
+        self._permutations = None
+        self._lock = threading.Lock()
+        if path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path or ':memory:', timeout=60, check_same_thread=False)
+        with self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS documents
+                (id INTEGER PRIMARY KEY, namespace TEXT NOT NULL, signature BLOB NOT NULL,
+                 result TEXT NOT NULL, created REAL NOT NULL)""")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS buckets
+                (bucket INTEGER NOT NULL, document INTEGER NOT NULL)""")
+            self._db.execute("CREATE INDEX IF NOT EXISTS buckets_bucket ON buckets (bucket)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS buckets_document ON buckets (document)")
+        self.prune()
+
+    def _cutoff(self):
+        """ Return the creation time of the oldest text still valid.
+        """
+        return time.time() - self.ttl if self.ttl is not None else 0.0
+
+    def _hash_parameters(self):
+        import numpy as np
+        if self._permutations is None:
+            rnd = np.random.RandomState(self.seed)
+            self._permutations = (rnd.randint(1, _PRIME, size=self.num_perm).astype(np.uint64),
+                                  rnd.randint(0, _PRIME, size=self.num_perm).astype(np.uint64))
+        return self._permutations
+
+    def sketch(self, text):
+        """ Return the MinHash signature of the text (a numpy array of
+        num_perm uint32), or None when the text is too short.
+        """
+        import numpy as np
+        words = _WORD.findall(text.lower())
+        if len(words) < max(self.min_words, self.shingle):
+            return None
+        shingles = {' '.join(words[i:i + self.shingle]) for i in range(len(words) - self.shingle + 1)}
+        hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        a, b = self._hash_parameters()
+        signature = np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        for start in range(0, len(hashes), _BLOCK):
+            block = hashes[start:start + _BLOCK]
+            # a * x + b < 2**63 for x < 2**32, no overflow in uint64
+            permuted = (np.outer(a, block) + b[:, None]) % _PRIME
+            np.minimum(signature, permuted.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def _buckets(self, namespace, signature):
+        rows = self.num_perm // self.bands
+        prefix = namespace.encode('utf-8') + b'\0'
+        buckets = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(prefix + band.to_bytes(2, 'big') +
+                                     signature[band * rows:(band + 1) * rows].tobytes(),
+                                     digest_size=8).digest()
+            buckets.append(int.from_bytes(digest, 'big', signed=True))
+        return buckets
+
+    def similar(self, namespace, sketch):
+        """ Return the (similarity, result) of the most similar text indexed
+        under the namespace, or None when no candidate shares a band.
+        """
+        import numpy as np
+        if sketch is None:
+            return None
+        buckets = self._buckets(namespace, sketch)
+        with self._lock:
+            rows = self._db.execute(
+                f"""SELECT signature, result FROM documents WHERE namespace = ? AND created >= ? AND id IN
+                    (SELECT document FROM buckets WHERE bucket IN ({','.join('?' * len(buckets))}))""",
+                [namespace, self._cutoff()] + buckets).fetchall()
+        best = None
+        for signature, result in rows:
+            similarity = float(np.mean(np.frombuffer(signature, dtype=np.uint32) == sketch))
+            if best is None or similarity > best[0]:
+                best = (similarity, result)
+        return None if best is None else (best[0], json.loads(best[1]))
+
+    def get(self, namespace, sketch):
+        """ Return the result of a near-duplicate of the text of the sketch,
+        or None.
+        """
+        found = self.similar(namespace, sketch)
+        if found is not None and found[0] >= self.threshold:
+            self.hits += 1
+            return found[1]
+        self.misses += 1
+        return None
+
+    def put(self, namespace, sketch, result):
+        """ Index the sketch of a text with its result (a dict of lists of
+        strings). Short texts, without sketch, are not indexed.
+        """
+        if sketch is None:
+            return
+        buckets = self._buckets(namespace, sketch)
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO documents (namespace, signature, result, created) VALUES (?, ?, ?, ?)",
+                (namespace, sketch.tobytes(), json.dumps(result), time.time()))
+            self._db.executemany("INSERT INTO buckets VALUES (?, ?)",
+                                 [(bucket, cursor.lastrowid) for bucket in buckets])
+            self._puts += 1
+        if self._puts % _PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """ Remove the texts older than ttl and the oldest ones beyond
+        max_documents. Returns the number of texts removed.
+        """
+        stale = """SELECT id FROM documents WHERE created < ? OR id <= COALESCE(
+                       (SELECT id FROM documents ORDER BY id DESC LIMIT 1 OFFSET ?), 0)"""
+        params = (self._cutoff(), self.max_documents if self.max_documents is not None else 1 << 62)
+        with self._lock, self._db:
+            self._db.execute(f"DELETE FROM buckets WHERE document IN ({stale})", params)
+            return self._db.execute(f"DELETE FROM documents WHERE id IN ({stale})", params).rowcount
+
+    def clear(self):
+        """ Forget every indexed text.
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM buckets")
+            self._db.execute("DELETE FROM documents")
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
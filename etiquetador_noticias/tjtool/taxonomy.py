@@ -0,0 +1,95 @@
+import os
+import hashlib
+import threading
+
+
+this_dir, this_filename = os.path.split(__file__)
+
+# data files loaded in the taxonomy and the tag of their terms
+CATEGORIES = (("reported_verbs.txt", 'RPTVRB'),
+              ("sources.txt", 'SOURCE'),
+              ("locations.txt", 'LOCATION'))
+
+
+class TaxonomyLoader(object):
+    """ Loads the reported verbs, sources and locations into pattern's
+    global taxonomy.
+
+    The terms are loaded once per process, whatever the number of
+    extractors created. reload() reads the data files again and applies
+    only the differences: terms removed from the files are removed from
+    the taxonomy and new ones are added, so the taxonomy can be updated
+    after editing the files without leaking entries. Every reload that
+    changes something increases version.
+    """
+
+    def __init__(self, data_dir=None):
+        self.data_dir = data_dir or os.path.join(this_dir, "data")
+        self.version = 0
+        self.fingerprint = None
+        self._terms = {}  # normalised term -> (term, set of tags)
+        self._lock = threading.RLock()
+
+    def _read(self):
+        """ Read the data files and return the terms with their tags and
+        the fingerprint of the files.
+        """
+        terms = {}
+        h = hashlib.sha256()
+        for file_name, tag in CATEGORIES:
+            with open(os.path.join(self.data_dir, file_name), encoding="utf-8") as f:
+                content = f.read()
+            h.update(content.encode("utf-8"))
+            for term in content.splitlines():
+                term = term.strip()
+                if term:
+                    terms.setdefault(term.lower(), (term, set()))[1].add(tag)
+        return terms, h.hexdigest()[:16]
+
+    def load(self):
+        """ Return the taxonomy, loading the terms if not done yet.
+        """
+        from pattern.search import taxonomy
+        if self.fingerprint is None:
+            with self._lock:
+                if self.fingerprint is None:
+                    self.reload()
+        return taxonomy
+
+    def reload(self):
+        """ Apply the current content of the data files to the taxonomy.
+        Returns the version of the taxonomy.
+        """
+        from pattern.search import taxonomy
+        with self._lock:
+            terms, fingerprint = self._read()
+            if fingerprint == self.fingerprint:
+                return self.version
+            # remove the terms gone from the files or whose tags changed
+            for key, (term, tags) in self._terms.items():
+                if key not in terms or terms[key][1] != tags:
+                    taxonomy.remove(term)
+            for key, (term, tags) in terms.items():
+                if key not in self._terms or self._terms[key][1] != tags:
+                    for tag in sorted(tags):
+                        taxonomy.append(term, type=tag)
+            self._terms = terms
+            self.fingerprint = fingerprint
+            self.version += 1
+            return self.version
+
+    def unload(self):
+        """ Remove every loaded term from the taxonomy. The version is kept,
+        the next load is a new version.
+        """
+        if not self._terms:
+            return
+        from pattern.search import taxonomy
+        with self._lock:
+            for term, tags in self._terms.values():
+                taxonomy.remove(term)
+            self._terms = {}
+            self.fingerprint = None
+
+    def __contains__(self, term):
+        return term.lower() in self._terms
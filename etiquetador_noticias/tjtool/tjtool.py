@@ -1,26 +1,84 @@
 import os
-import sys
-import pkg_resources
-import codecs
 import csv
-import json
-import argparse
-import numpy as np
+import unicodedata
+from array import array
 from itertools import groupby
 from operator import itemgetter
-from pattern.es import parsetree
-from pattern.search import Pattern, search, taxonomy, TAXONOMY, STRICT, Word
-# libraries for spacy version
-import spacy
-import es_core_news_md
-import nltk
-nltk.download('punkt')
+# pattern and spacy are imported on first use, they are slow to import
+from etiquetador_noticias.resources import registry
+from etiquetador_noticias.profiling import stage
+from etiquetador_noticias.tjtool.memo import ExtractionMemo
+from etiquetador_noticias.tjtool.neardup import NearDuplicateIndex
+from etiquetador_noticias.tjtool.dedup import remove_contained
+from etiquetador_noticias.tjtool.chunking import CHUNK_CHARS, iter_chunks, WordPacker
 
 
 this_dir, this_filename = os.path.split(__file__)
 
 
-class ReporterExtractor(object):
+class _ResultReuse(object):
+    """ Reuse of the results of the extractors: the memo of identical
+    cleaned texts and, when enabled, the index of near-duplicate texts.
+    The extractors define _namespace().
+    """
+
+    def _setup_reuse(self, memo, neardup):
+        """ Set the memo (the shared one by default, False disables it) and
+        the near-duplicate index (disabled by default, True for the shared
+        one in the cache directory).
+        """
+        if memo is None:
+            memo = registry.memo()
+        self.memo = memo if memo is not False else None
+        if neardup is True:
+            neardup = registry.neardup()
+        self.neardup = neardup if neardup is not None and neardup is not False else None
+
+    def _memo_key(self, text):
+        """ Return the memo key of the cleaned text, or None without memo.
+        """
+        if self.memo is None:
+            return None
+        return self.memo.key(self._namespace(), registry.data_fingerprint(), text)
+
+    def _neardup_namespace(self):
+        return f"{self._namespace()}:{registry.data_fingerprint()}"
+
+    def _reuse(self, text):
+        """ Return the memo key, the near-duplicate sketch and the stored
+        results of the cleaned text, or of a near-duplicate of it, if any.
+        """
+        key = self._memo_key(text)
+        if key is not None:
+            with stage('memo') as s:
+                result = self.memo.get(key)
+                s.cache_hit = result is not None
+            if result is not None:
+                return key, None, result
+        if self.neardup is None:
+            return key, None, None
+        namespace = self._neardup_namespace()
+        with stage('neardup', chars=len(text)) as s:
+            sketch = self.neardup.sketch(text)
+            result = self.neardup.get(namespace, sketch)
+            s.cache_hit = result is not None
+        if result is not None:
+            if key is not None:
+                self.memo.put(key, result)
+            return key, None, result
+        return key, sketch, None
+
+    def _store(self, key, sketch, result):
+        """ Store the results of a text parsed in the memo and the
+        near-duplicate index.
+        """
+        if key is not None:
+            self.memo.put(key, result)
+        if sketch is not None:
+            self.neardup.put(self._neardup_namespace(), sketch, result)
+
+
+class ReporterExtractor(_ResultReuse):
     """ This class is in charge of parsing the sentences and extracting the
     sources, reporters and entities from the text.
 
@@ -30,15 +88,26 @@ class ReporterExtractor(object):
     a reported speech verb is used. Whether a reporter is not clearly
     identified as the proper noun in the subject of the sentence, then
     see the list of entities as potential reporters.
-    """
 
-    __has_taxonomy = False  # to avoid load the taxonomy once and again
+    The results are memoized on the cleaned text (see ExtractionMemo). By
+    default the memo shared by the whole process is used; pass memo=False
+    to disable it. The results of near-duplicate texts, such as the same
+    wire story in several media, can be reused as well (see
+    NearDuplicateIndex): pass neardup=True to use the index persisted in
+    the cache directory, or a NearDuplicateIndex. It is disabled by
+    default, so the results do not depend on the texts of earlier runs.
+
+    Texts are parsed in sentence-aligned chunks of at most chunk_size
+    characters (see iter_chunks) and only the strings of the names found
+    are kept between chunks, so the memory used by long texts does not
+    grow with their length.
+    """
 
-    def __init__(self):
+    def __init__(self, memo=None, chunk_size=CHUNK_CHARS, neardup=False):
         """ Initialize the extractor
         """
-        # Create the taxonomy from files
-        self._create_taxonomy()
+        # Make sure the shared taxonomy is loaded
+        registry.taxonomy()
 
         # List of words
         self.__sources, self.__reporters, self.__entities = [], [], []
@@ -46,34 +115,12 @@ class ReporterExtractor(object):
         # Store the tree with the POS-Tagging, lemmata and gramatical relations
         self._tree = None
 
-    def _create_taxonomy(self):
-        """ Create a new taxonomy from the data files.
-        """
-        if not self.__has_taxonomy:
-            reported_verbs_file = os.path.join(this_dir, "data", "reported_verbs.txt")
-            self._add_category(file_name=reported_verbs_file,
-                               tag='RPTVRB')
-            sources_file = os.path.join(this_dir, "data", "sources.txt")
-            self._add_category(file_name=sources_file,
-                               tag='SOURCE')
-            locations_file = os.path.join(this_dir, "data", "locations.txt")
-            self._add_category(file_name=locations_file,
-                               tag='LOCATION')            
-            # self._add_category(file_name='data/reported_verbs.txt',
-            #                    tag='RPTVRB')
-            # self._add_category(file_name='data/sources.txt',
-            #                    tag='SOURCE')
-            # self._add_category(file_name='data/locations.txt',
-            #                    tag='LOCATION')
-            self.__has_taxonomy = True
-
-    def _add_category(self, file_name, tag):
-        """ Loads the terms into the taxonomy with the data from the specified
-        file and assigns them the specified tag
-        """
-        with open(file_name) as f:
-            for term in f:
-                taxonomy.append(term.rstrip('\n'), type=tag)
+        # Maximum length in characters of the chunks of text parsed at once
+        self.chunk_size = chunk_size
+
+        # Memo of results, index of near-duplicates and the results of the last parse
+        self._setup_reuse(memo, neardup)
+        self._result = {'reporters': [], 'entities': [], 'sources': []}
 
     def _pack_list(self, data):
         """ Given a list of words as a tuples (string, index), it returns a
@@ -85,6 +132,7 @@ class ReporterExtractor(object):
     def _extract_sources(self):
         """ Extract those well-known sources from the text.
         """
+        from pattern.search import Pattern, TAXONOMY, STRICT
         # search for well-known sources in the tree
         pattern = Pattern.fromstring('SOURCE', STRICT, taxonomy=TAXONOMY)
 
@@ -108,6 +156,8 @@ class ReporterExtractor(object):
         """ Extract the reporters and entities from those sentence of the text
             where a reported speech verb is used.
         """
+        from pattern.search import Pattern, search, TAXONOMY, STRICT
+        taxonomy = registry.taxonomy()
         # search for those sentences with reported speech verbs
         sentences = [s for s in self.__tree if search('RPTVRB|según', s)]
         # search for proper nouns that are not locations
@@ -134,14 +184,13 @@ class ReporterExtractor(object):
     def _clean(self, text):
         """ Performs some cleaning in the text
         """
-        # some chars to remove
-        for c in ['"', '\'', '”', '“', '¿', '?', '!', '¡']:
-            text = text.replace(c, '')
-        # some chars to replace by space
-        for c in ['/', '─']:
-            text = text.replace(c, ' ')
+        return clean_text(text)
 
-        return text
+    def _namespace(self):
+        """ Return the namespace of the results of this extractor, which
+        depend on the size of the chunks of long texts.
+        """
+        return f"{type(self).__name__}:{self.chunk_size}"
 
     def parse(self, text):
         """ Parses the text and extract the sources, reporters and entities.
@@ -149,77 +198,198 @@ class ReporterExtractor(object):
         self.__sources, self.__reporters, self.__entities = [], [], []
         text = self._clean(text)
 
-        # POS-Tagging with relations and lemmas
-        self.__tree = parsetree(text, relations=True, lemmata=True)
+        # Reuse the results of an identical or near-duplicate text
+        key, sketch, self._result = self._reuse(text)
+        if self._result is not None:
+            return
+
+        self._result = self._parse_chunks(text)
+        self._store(key, sketch, self._result)
+
+    def parse_many(self, texts):
+        """ Parses many texts and yields, in order, a dict with the
+        reporters, entities and sources of each one, like
+        SpacyReporterExtractor.parse_many. pattern has no batch API, so the
+        texts are parsed one after the other.
+        """
+        for text in texts:
+            self.parse(text)
+            yield {'reporters': self.get_reporters(),
+                   'entities': self.get_entities(),
+                   'sources': self.get_sources()}
+
+    def _parse_chunks(self, text):
+        """ Parses the text chunk after chunk and returns the results. The
+        words of every chunk are packed into strings before the next one
+        is parsed, and its tree is dropped.
+        """
+        from pattern.es import parsetree
+        sources, reporters, entities = WordPacker(), WordPacker(), WordPacker()
+        for chunk in iter_chunks(text, self.chunk_size):
+            # POS-Tagging with relations and lemmas
+            with stage('parsetree', chars=len(chunk)) as s:
+                self.__tree = parsetree(chunk, relations=True, lemmata=True)
+                s.sizes['sentences'] = len(self.__tree)
+
+            # Extract the information
+            with stage('extract', sentences=len(self.__tree)) as s:
+                self.__sources, self.__reporters, self.__entities = [], [], []
+                self._extract_sources()
+                self._extract_reporters()
+                sources.extend(self.__sources)
+                reporters.extend(self.__reporters)
+                entities.extend(self.__entities)
+                s.sizes['entities'] = len(self.__reporters) + len(self.__entities)
+            self.__tree = None
+        self.__sources, self.__reporters, self.__entities = [], [], []
+        return self._merge(sources.finish(), reporters.finish(), entities.finish())
+
+    def _merge(self, sources, reporters, entities):
+        """ Builds the results from the packed names.
+        """
+        return {'reporters': self.remove_duplicates(reporters),
+                'entities': list(set(entities)-set(reporters)),
+                'sources': sources}
 
-        # Extract the information
-        self._extract_sources()
-        self._extract_reporters()
-        
     def remove_duplicates(self,name_list):
         """ Remove entities contained in others
         """
-        new_name_list = []
-        for w1 in name_list:
-            repeated = False
-            remain = set(name_list)-set([w1])
-            for w2 in remain:
-                if w1 in w2:
-                    repeated = True
-            if not repeated:
-                new_name_list.append(w1)
-        new_name_list = list(set(new_name_list))
-        # TODO - maybe only apply this to PER ent type and not to ORG type     
-        return new_name_list
+        # TODO - maybe only apply this to PER ent type and not to ORG type
+        return remove_contained(name_list)
 
     def get_reporters(self):
         """Return reporters (list): the identified reporters
         """
-        #self.reporters_out = self.__reporters
-        self.reporters_out = self._pack_list(self.__reporters)
-        self.reporters_out = self.remove_duplicates(self.reporters_out)
+        self.reporters_out = list(self._result['reporters'])
         return self.reporters_out
 
     def get_entities(self):
         """Return entities (list): the identified proper nouns
         """
-        return list(set(self._pack_list(self.__entities))-
-                    set(self._pack_list(self.__reporters)))
+        return list(self._result['entities'])
 
     def get_sources(self):
         """Return sources (list): the list of identified well-known sources
         """
-        return self._pack_list(self.__sources)
+        return list(self._result['sources'])
+
+def clean_text(text):
+    """ Performs some cleaning in the text before it is parsed: quotes and
+    question and exclamation marks are removed, slashes and box-drawing
+    dashes replaced by spaces.
+    """
+    # some chars to remove
+    for c in ['"', '\'', '”', '“', '¿', '?', '!', '¡']:
+        text = text.replace(c, '')
+    # some chars to replace by space
+    for c in ['/', '─']:
+        text = text.replace(c, ' ')
+
+    return text
+
+
+def normalise_name(name):
+    """ Normalises a name for the lookups: case, accents, punctuation and
+    whitespace are ignored, e.g. 'Unidas-Podemos ' -> 'unidas podemos'.
+    """
+    name = unicodedata.normalize('NFKD', name)
+    name = ''.join(' ' if unicodedata.category(c)[0] in 'PS' else c
+                   for c in name if not unicodedata.combining(c))
+    return ' '.join(name.casefold().split())
+
 
 class Entities(object):
     """This class manage the translation between usual names and their
     corresponding entities' full name.
+
+    Names are looked up in a hash index of normalised keys (see
+    normalise_name). Besides the 'Entity', 'Type' and 'FullName' columns
+    the csv may have an 'Aliases' column with other names of the entity
+    separated by '|'. Rows are kept in compact parallel lists, so big
+    catalogues can be loaded with from_csv.
     """
 
-    def __init__(self):
-        csvfile_name = os.path.join(this_dir, "data", "entities.csv")
-        with open(csvfile_name) as csvfile:
+    def __init__(self, file_name=None):
+        self._names, self._fullnames = [], []
+        self._types, self._type_ids = [], array('H')
+        self._index = {}  # normalised name or alias -> row
+        if file_name is None:
+            file_name = os.path.join(this_dir, "data", "entities.csv")
+        with open(file_name, encoding='utf-8') as csvfile:
             reader = csv.DictReader(csvfile, delimiter=',')
-            self._entities_dict = {row['Entity'].lower():row
-                                   for row in reader}
+            for row in reader:
+                aliases = (row.get('Aliases') or '').split('|')
+                self.add(row['Entity'], row['Type'], row['FullName'], aliases)
+
+    @classmethod
+    def from_csv(cls, file_name):
+        """Return the entities of a csv file with the columns of
+        data/entities.csv.
+        """
+        return cls(file_name)
+
+    def _type_id(self, entity_type):
+        try:
+            return self._types.index(entity_type)
+        except ValueError:
+            self._types.append(entity_type)
+            return len(self._types) - 1
+
+    def add(self, name, entity_type=None, fullname=None, aliases=()):
+        """Add an entity. A later entity with the same name replaces it.
+        """
+        row = len(self._names)
+        self._names.append(name)
+        self._fullnames.append(fullname or '')
+        self._type_ids.append(self._type_id(entity_type))
+        self._index[normalise_name(name)] = row
+        for alias in aliases:
+            self.add_alias(alias, name)
+
+    def add_alias(self, alias, name):
+        """Make alias another name of the entity name. Aliases never
+        replace an entity of their own.
+        """
+        key = normalise_name(alias)
+        row = self._index.get(normalise_name(name))
+        if key and row is not None:
+            self._index.setdefault(key, row)
+
+    def _lookup(self, name):
+        return self._index.get(normalise_name(name))
 
     def getFullName(self, name):
-        if (name.lower() in list(self._entities_dict.keys()) and
-            self._entities_dict[name.lower()]['FullName']):
-                return self._entities_dict[name.lower()]['FullName']
+        row = self._lookup(name)
+        if row is not None and self._fullnames[row]:
+            return self._fullnames[row]
         else:
             return name
 
     def getType(self, name):
-        if name.lower() in list(self._entities_dict.keys()):
-            return self._entities_dict[name.lower()]['Type']
+        row = self._lookup(name)
+        if row is not None:
+            return self._types[self._type_ids[row]]
         else:
             return None
 
     def getFullDescription(self, name):
+        row = self._lookup(name)
+        if row is None:
+            return {'name': name, 'fullname': name, 'type': None}
         return {'name': name,
-                'fullname': self.getFullName(name),
-                'type':self.getType(name)}
+                'fullname': self._fullnames[row] or name,
+                'type': self._types[self._type_ids[row]]}
+
+    def describe_many(self, names):
+        """Return the full description of every name.
+        """
+        return [self.getFullDescription(name) for name in names]
+
+    def __contains__(self, name):
+        return self._lookup(name) is not None
+
+    def __len__(self):
+        return len(self._names)
 
 
 
@@ -227,7 +397,7 @@ class Entities(object):
 # sys.setdefaultencoding('utf-8')
 
 
-class SpacyReporterExtractor(object):
+class SpacyReporterExtractor(_ResultReuse):
     """ This class is in charge of parsing the sentences and extracting the
     sources, reporters and entities from the text.
 
@@ -237,15 +407,42 @@ class SpacyReporterExtractor(object):
     a reported speech verb is used. Whether a reporter is not clearly
     identified as the proper noun in the subject of the sentence, then
     see the list of entities as potential reporters.
+
+    The sentences with a reported speech verb are sent to spaCy in batches
+    of batch_size sentences, using n_process processes, and only the
+    entity recognizer of the pipeline is run.
+
+    With engine='spacy' pattern is not used at all: the whole text is
+    parsed once by spaCy, which splits the sentences, finds the reported
+    verbs by their lemma and the sources and locations with matchers built
+    from the data files. Locations are not taken as reporters.
+
+    The results are memoized on the cleaned text (see ExtractionMemo). By
+    default the memo shared by the whole process is used; pass memo=False
+    to disable it. The results of near-duplicate texts, such as the same
+    wire story in several media, can be reused as well (see
+    NearDuplicateIndex): pass neardup=True to use the index persisted in
+    the cache directory, or a NearDuplicateIndex. It is disabled by
+    default, so the results do not depend on the texts of earlier runs.
+
+    Both engines parse the texts in sentence-aligned chunks of at most
+    chunk_size characters (see iter_chunks), which also keeps the spaCy
+    docs under nlp.max_length, and only the strings of the names found are
+    kept between chunks.
     """
 
-    __has_taxonomy = False  # to avoid load the taxonomy once and again
+    ENGINES = ('pattern', 'spacy')
 
-    def __init__(self):
+    def __init__(self, batch_size=64, n_process=1, memo=None, engine='pattern',
+                 chunk_size=CHUNK_CHARS, neardup=False):
         """ Initialize the extractor
         """
-        # Create the taxonomy from files
-        self._create_taxonomy()
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, use one of {self.ENGINES}")
+        self.engine = engine
+
+        # Make sure the shared taxonomy is loaded
+        registry.taxonomy()
 
         # List of words
         self.__sources, self.__reporters, self.__entities = [], [], []
@@ -253,42 +450,24 @@ class SpacyReporterExtractor(object):
         # Store the tree with the POS-Tagging, lemmata and gramatical relations
         self._tree = None
         
-        # load the language model for spacy
-        self.nlp = es_core_news_md.load()
+        # shared language model for spacy
+        self.nlp = registry.nlp()
+
+        # Options for nlp.pipe
+        self.batch_size = batch_size
+        self.n_process = n_process
+
+        # Maximum length in characters of the chunks of text parsed at once
+        self.chunk_size = min(chunk_size, self.nlp.max_length)
+
+        # Memo of results, index of near-duplicates and the results of the last parse
+        self._setup_reuse(memo, neardup)
+        self._result = {'reporters': [], 'entities': [], 'sources': []}
         
         # Set maximum character distance that we allow between the reported verb and the recognized entity to consider that it is a font        
         self._max_dist = 100
         
         
-    def _create_taxonomy(self):
-        """ Create a new taxonomy from the data files.
-        """
-        if not self.__has_taxonomy:
-            reported_verbs_file = os.path.join(this_dir, "data", "reported_verbs.txt")
-            self._add_category(file_name=reported_verbs_file,
-                               tag='RPTVRB')
-            sources_file = os.path.join(this_dir, "data", "sources.txt")
-            self._add_category(file_name=sources_file,
-                               tag='SOURCE')
-            locations_file = os.path.join(this_dir, "data", "locations.txt")
-            self._add_category(file_name=locations_file,
-                               tag='LOCATION') 
-            # self._add_category(file_name='data/reported_verbs.txt',
-            #                    tag='RPTVRB')
-            # self._add_category(file_name='data/sources.txt',
-            #                    tag='SOURCE')
-            # self._add_category(file_name='data/locations.txt',
-            #                    tag='LOCATION')
-            self.__has_taxonomy = True
-
-    def _add_category(self, file_name, tag):
-        """ Loads the terms into the taxonomy with the data from the specified
-        file and assigns them the specified tag
-        """
-        with open(file_name) as f:
-            for term in f:
-                taxonomy.append(term.rstrip('\n'), type=tag)
-
     def _pack_list(self, data):
         """ Given a list of words as a tuples (string, index), it returns a
         new list containing only the string of the words. If words are
@@ -299,6 +478,7 @@ class SpacyReporterExtractor(object):
     def _extract_sources(self):
         """ Extract those well-known sources from the text.
         """
+        from pattern.search import Pattern, TAXONOMY, STRICT
         # search for well-known sources in the tree
         pattern = Pattern.fromstring('SOURCE', STRICT, taxonomy=TAXONOMY)
 
@@ -310,50 +490,137 @@ class SpacyReporterExtractor(object):
                     self.__sources.append(w)
     
     
-    def _get_distance(self,w1, w2, txt):
-        pos_w1 = txt.find(w1)
-        pos_w2 = txt.find(w2)
-        return pos_w2 - pos_w1
+    def _closest_reporters(self, ents, verbs):
+        """ Return the PER and ORG entities closest to each reported verb.
 
-    def _extract_reporters(self):
+        ents are (text, label, start, end) and verbs (start, end) character
+        spans of the same sentence. The distance is measured between the
+        spans and only entities closer than _max_dist are taken. Entities
+        overlapping a verb are never reporters.
+        """
+        candidates = [(start, end, text) for text, label, start, end in ents
+                      if label in ["PER","ORG"] and
+                      not any(start < v_end and v_start < end for v_start, v_end in verbs)]
+        reporters = []
+        for v_start, v_end in verbs:
+            closest, closest_dist = None, self._max_dist
+            for start, end, text in candidates:
+                dist = max(0, start - v_end, v_start - end)
+                if dist < closest_dist:
+                    closest, closest_dist = text, dist
+            if closest is not None and closest not in reporters:
+                reporters.append(closest)
+        return reporters
+
+    def _reported_sentences(self):
+        """ Return the sentences of the tree with reported speech verbs,
+        together with the character spans of the verbs in the sentence
+        string.
+        """
+        from pattern.search import search
+        sentences = []
+        for s in self.__tree:
+            matches = search('RPTVRB|según', s)
+            if matches:
+                # the words of the sentence string are joined by spaces
+                starts, pos = [], 0
+                for w in s.words:
+                    starts.append(pos)
+                    pos += len(w.string) + 1
+                verbs = [(starts[m.words[0].index],
+                          starts[m.words[-1].index] + len(m.words[-1].string))
+                         for m in matches]
+                sentences.append((s, verbs))
+        return sentences
+
+    def _pipe(self, texts):
+        """ Run the entity recognizer over the texts in batches.
+        """
+        # only the entities are used, so skip the rest of the pipeline
+        disable = [name for name in self.nlp.pipe_names if name != 'ner']
+        return self.nlp.pipe(texts, batch_size=self.batch_size,
+                             n_process=self.n_process, disable=disable)
+
+    def _extract_reporters(self, sentences=None, docs=None):
         """ Extract the reporters and entities from those sentence of the text
             where a reported speech verb is used.
+
+            The sentences and their spaCy docs can be given when they have
+            already been computed (see parse_many).
         """
+        from pattern.search import Word
         # search for those sentences with reported speech verbs
-        sentences = [s for s in self.__tree if search('RPTVRB|según', s)]
-
-        for s in sentences:
-            s_str = s.string
-            sent_nlp = self.nlp(s_str)           
-            verb = search('RPTVRB|según',s)[0].string
-            shortest_dist = np.inf
-            shortest_word = []
-            for ent in sent_nlp.ents:
-                # calculate distance
-                dist = self._get_distance(verb, ent.text, s_str)
-                # store all proper nouns in entities
-                word = Word(s, ent.text, tag=None, index=s.id)
-                self.__entities.append(word)
-                # PER and ORG type entities closest to a reporter verb
-                if ent.label_ in ["PER","ORG"] and abs(dist) < shortest_dist:
-                    word = Word(s, ent.text, tag='NNP', index=s.id)
-                    shortest_dist = abs(dist)
-                    shortest_word = word
-            if shortest_word and abs(dist) < self._max_dist:
-                self.__reporters.append(shortest_word)
+        if sentences is None:
+            sentences = self._reported_sentences()
+        if docs is None:
+            with stage('spacy_ner', sentences=len(sentences)) as st:
+                docs = list(self._pipe(s.string for s, _ in sentences))
+                st.sizes['entities'] = sum(len(doc.ents) for doc in docs)
+
+        for (s, verbs), sent_nlp in zip(sentences, docs):
+            ents = [(ent.text, ent.label_, ent.start_char, ent.end_char)
+                    for ent in sent_nlp.ents]
+            # store all proper nouns in entities
+            for text, _, _, _ in ents:
+                self.__entities.append(Word(s, text, tag=None, index=s.id))
+            # PER and ORG type entities closest to a reporter verb
+            for text in self._closest_reporters(ents, verbs):
+                self.__reporters.append(Word(s, text, tag='NNP', index=s.id))
+
+
+    def _pack_tokens(self, doc, indexes):
+        """ Like _pack_list, for the indexes of the tokens of a spaCy doc.
+        """
+        indexes = sorted(set(indexes))
+        return [' '.join(doc[i].text for i in map(itemgetter(1), g))
+                for k, g in groupby(enumerate(indexes), lambda i_j: i_j[0]-i_j[1])]
 
+    def _extract_doc(self, doc):
+        """ Extract the sources, reporters and entities from the spaCy doc of
+            the whole text (engine 'spacy') and return the results.
+        """
+        verbs, gazetteer = registry.spacy_matchers()
+        source_id = doc.vocab.strings['SOURCE']
+
+        sources, locations = [], set()
+        for match_id, start, end in gazetteer(doc):
+            if match_id == source_id:
+                sources.extend(range(start, end))
+            else:
+                locations.add(doc[start:end].text.lower())
+
+        # character spans of the reported verbs of every sentence with one
+        reported = {}
+        for _, start, end in sorted(verbs(doc), key=itemgetter(1)):
+            verb = doc[start:end]
+            reported.setdefault(verb.sent.start, (verb.sent, []))[1].append(
+                (verb.start_char, verb.end_char))
+
+        reporters, entities = [], []
+        for sent, verb_spans in sorted(reported.values(), key=lambda s_v: s_v[0].start):
+            ents = [(ent.text, ent.label_, ent.start_char, ent.end_char)
+                    for ent in sent.ents]
+            # store all proper nouns in entities
+            entities.extend(text for text, _, _, _ in ents)
+            # PER and ORG type entities closest to a reporter verb
+            ents = [ent for ent in ents if ent[0].lower() not in locations]
+            reporters.extend(self._closest_reporters(ents, verb_spans))
+
+        reporters = self.remove_duplicates(reporters)
+        return {'reporters': reporters,
+                'entities': list(set(entities)-set(reporters)),
+                'sources': self._pack_tokens(doc, sources)}
 
     def _clean(self, text):
         """ Performs some cleaning in the text
         """
-        # some chars to remove
-        for c in ['"', '\'', '”', '“', '¿', '?', '!', '¡']:
-            text = text.replace(c, '')
-        # some chars to replace by space
-        for c in ['/', '─']:
-            text = text.replace(c, ' ')
+        return clean_text(text)
 
-        return text
+    def _namespace(self):
+        """ Return the namespace of the results of this extractor, which
+        depend on the size of the chunks of long texts.
+        """
+        return f"{type(self).__name__}:{self.engine}:{self._max_dist}:{self.chunk_size}"
 
     def parse(self, text):
         """ Parses the text and extract the sources, reporters and entities.
@@ -361,46 +628,164 @@ class SpacyReporterExtractor(object):
         self.__sources, self.__reporters, self.__entities = [], [], []
         text = self._clean(text)
 
-        # POS-Tagging with relations and lemmas
-        self.__tree = parsetree(text, relations=True, lemmata=True)
+        # Reuse the results of an identical or near-duplicate text
+        key, sketch, self._result = self._reuse(text)
+        if self._result is not None:
+            return
+
+        if self.engine == 'spacy':
+            self._result = self._parse_doc_chunks(text)
+        else:
+            self._result = self._parse_chunks(text)
+        self._store(key, sketch, self._result)
+
+    def _parse_chunks(self, text):
+        """ Parses the text chunk after chunk with pattern and returns the
+        results. The words of every chunk are turned into strings before
+        the next one is parsed, and its tree is dropped.
+        """
+        from pattern.es import parsetree
+        sources, reporters, entities = WordPacker(), [], []
+        for chunk in iter_chunks(text, self.chunk_size):
+            # POS-Tagging with relations and lemmas
+            with stage('parsetree', chars=len(chunk)) as s:
+                self.__tree = parsetree(chunk, relations=True, lemmata=True)
+                s.sizes['sentences'] = len(self.__tree)
+
+            # Extract the information
+            with stage('extract', sentences=len(self.__tree)) as s:
+                self.__sources, self.__reporters, self.__entities = [], [], []
+                self._extract_sources()
+                self._extract_reporters()
+                sources.extend(self.__sources)
+                reporters.extend(w.string for w in self.__reporters)
+                entities.extend(w.string for w in self.__entities)
+            self.__tree = None
+        self.__sources, self.__reporters, self.__entities = [], [], []
+        return self._merge(sources.finish(), reporters, entities)
+
+    def _parse_doc_chunks(self, text):
+        """ Parses the text chunk after chunk with spaCy (engine 'spacy')
+        and returns the merged results of the docs.
+        """
+        results = []
+        for chunk in iter_chunks(text, self.chunk_size):
+            with stage('spacy_parse', chars=len(chunk)) as s:
+                doc = self.nlp(chunk)
+                s.sizes['entities'] = len(doc.ents)
+            with stage('extract') as s:
+                results.append(self._extract_doc(doc))
+            doc = None
+        if len(results) == 1:
+            return results[0]
+        return self._merge([name for r in results for name in r['sources']],
+                           [name for r in results for name in r['reporters']],
+                           [name for r in results for name in r['entities']])
+
+    def parse_many(self, texts):
+        """ Parses many texts and yields, in order, a dict with the
+        reporters, entities and sources of each one.
+
+        The reported speech sentences of all the texts go through spaCy
+        together, so the batches are filled across articles. Texts already
+        in the memo, or near-duplicates of texts already parsed, are not
+        parsed.
+        """
+        if self.engine == 'spacy':
+            yield from self._parse_many_docs(texts)
+            return
+
+        from pattern.es import parsetree
+        results, articles = [], []
+        for text in texts:
+            text = self._clean(text)
+            key, sketch, result = self._reuse(text)
+            if result is None and len(text) > self.chunk_size:
+                # long texts are parsed on their own, chunk after chunk
+                result = self._parse_chunks(text)
+                self._store(key, sketch, result)
+            elif result is None:
+                self.__sources = []
+                self.__tree = parsetree(text, relations=True, lemmata=True)
+                self._extract_sources()
+                articles.append((key, sketch, self.__sources, self._reported_sentences()))
+            results.append(result)
+        self.__tree = None
+
+        docs = iter(self._pipe(s.string for _, _, _, sentences in articles for s, _ in sentences))
+        parsed = iter(articles)
+        for result in results:
+            if result is None:
+                key, sketch, sources, sentences = next(parsed)
+                self.__sources, self.__reporters, self.__entities = sources, [], []
+                self._extract_reporters(sentences, [next(docs) for _ in sentences])
+                result = self._merge(self._pack_list(self.__sources),
+                                     [w.string for w in self.__reporters],
+                                     [w.string for w in self.__entities])
+                self._store(key, sketch, result)
+            self._result = result
+            yield {'reporters': self.get_reporters(),
+                   'entities': self.get_entities(),
+                   'sources': self.get_sources()}
+
+    def _parse_many_docs(self, texts):
+        """ parse_many for the engine 'spacy': the whole texts go through
+        nlp.pipe.
+        """
+        results, missing = [], []
+        for text in texts:
+            text = self._clean(text)
+            key, sketch, result = self._reuse(text)
+            if result is None and len(text) > self.chunk_size:
+                # long texts are parsed on their own, chunk after chunk
+                result = self._parse_doc_chunks(text)
+                self._store(key, sketch, result)
+            elif result is None:
+                missing.append((key, sketch, text))
+            results.append(result)
+
+        docs = self.nlp.pipe((text for _, _, text in missing),
+                             batch_size=self.batch_size, n_process=self.n_process)
+        parsed = zip(missing, docs)
+        for result in results:
+            if result is None:
+                (key, sketch, _), doc = next(parsed)
+                result = self._extract_doc(doc)
+                self._store(key, sketch, result)
+            self._result = result
+            yield {'reporters': self.get_reporters(),
+                   'entities': self.get_entities(),
+                   'sources': self.get_sources()}
+
+    def _merge(self, sources, reporters, entities):
+        """ Builds the results from the names found in the text, or in all
+        its chunks.
+        """
+        reporters = self.remove_duplicates(reporters)
+        return {'reporters': reporters,
+                'entities': list(set(entities)-set(reporters)),
+                'sources': sources}
+
 
-        # Extract the information
-        self._extract_sources()
-        self._extract_reporters()
-        
     def remove_duplicates(self,name_list):
         """ Remove entities contained in others
         """
-        new_name_list = []
-        for w1 in name_list:
-            repeated = False
-            remain = set(name_list)-set([w1])
-            for w2 in remain:
-                if w1 in w2:
-                    repeated = True
-            if not repeated:
-                new_name_list.append(w1)
-        new_name_list = list(set(new_name_list))
-        # TODO - maybe only apply this to PER ent type and not to ORG type     
-        return new_name_list
+        # TODO - maybe only apply this to PER ent type and not to ORG type
+        return remove_contained(name_list)
         
 
     def get_reporters(self):
         """Return reporters (list): the identified reporters
         """
-        self.reporters_out = [w.string for w in self.__reporters]
-        self.reporters_out = self.remove_duplicates(self.reporters_out)
-        
+        self.reporters_out = list(self._result['reporters'])
         return self.reporters_out
 
     def get_entities(self):
         """Return entities (list): the identified proper nouns
         """
-        self.entities_out = [w.string for w in self.__entities]
-        return list(set(self.entities_out)-
-                    set(self.reporters_out))
+        return list(self._result['entities'])
 
     def get_sources(self):
         """Return sources (list): the list of identified well-known sources
         """
-        return self._pack_list(self.__sources)
\ No newline at end of file
+        return list(self._result['sources'])
\ No newline at end of file
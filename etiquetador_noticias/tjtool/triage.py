@@ -0,0 +1,234 @@
+import os
+import re
+from functools import lru_cache
+
+from etiquetador_noticias.resources import registry
+from etiquetador_noticias.profiling import stage
+from etiquetador_noticias.tjtool.dedup import remove_contained
+from etiquetador_noticias.tjtool.tjtool import clean_text, normalise_name
+
+
+this_dir, this_filename = os.path.split(__file__)
+
+# sentences: up to a full stop or a line break
+_SENTENCE = re.compile(r'[^.…\n]+[.…]*')
+_TOKEN = re.compile(r'\w+')
+# words joining the parts of a composed name: 'Luis de Guindos'
+_CONNECTORS = frozenset(['de', 'del', 'en'])
+
+
+@lru_cache(maxsize=65536)
+def _fold(word):
+    return normalise_name(word)
+
+
+class Gazetteer(object):
+    """ The reported verbs, sources and locations of the data files compiled
+    for the lookups of the TriageExtractor: every conjugated form of the
+    verbs (see conjugate) and the sources and locations indexed by their
+    first normalised word, the longest terms first.
+    """
+
+    def __init__(self, data_dir=None):
+        from etiquetador_noticias.tjtool.taxonomy import CATEGORIES
+        from etiquetador_noticias.tjtool.conjugation import conjugate
+        data_dir = data_dir or os.path.join(this_dir, "data")
+        self.verbs = {_fold('según')}
+        self._terms = {}  # first word -> [(words, tag)]
+        for file_name, tag in CATEGORIES:
+            with open(os.path.join(data_dir, file_name), encoding="utf-8") as f:
+                terms = [term.strip() for term in f if term.strip()]
+            if tag == 'RPTVRB':
+                for verb in terms:
+                    self.verbs.update(conjugate(verb))
+                continue
+            for term in terms:
+                words = tuple(normalise_name(term).split())
+                if words:
+                    self._terms.setdefault(words[0], []).append((words, tag))
+        for candidates in self._terms.values():
+            candidates.sort(key=lambda c: -len(c[0]))
+
+    def match(self, folded, i):
+        """ Return the (length, tag) of the longest term starting at the
+        word i of the folded words, or None.
+        """
+        for words, tag in self._terms.get(folded[i], ()):
+            if tuple(folded[i:i + len(words)]) == words:
+                return len(words), tag
+        return None
+
+
+class TriageExtractor(object):
+    """ Fast extractor of the sources, reporters and entities that skips the
+    dependency parsing.
+
+    The text is split in sentences and words with regular expressions and
+    looked up in the Gazetteer: the sources are the terms of sources.txt,
+    and in the sentences with a conjugated form of a reported verb (or
+    'según') the capitalised names that are not locations are entities,
+    the closest one to every verb being its reporter, like in
+    SpacyReporterExtractor.
+
+    The estimate is only used when it is far from the boundary of the
+    classification, more than two reporters and sources (see classify):
+    texts whose count of reporters and sources is within margin of it are
+    escalated to the full extractor, a ReporterExtractor by default. The
+    number of texts of each kind is counted in triaged and escalated.
+
+    >>> extractor = TriageExtractor()
+    >>> extractor.parse(text)
+    >>> extractor.get_reporters(), extractor.escalated
+    """
+
+    def __init__(self, full=None, boundary=2, margin=1):
+        """ Initialize the extractor
+        """
+        self.gazetteer = registry.gazetteer()
+        # the full extractor is created on the first escalation
+        self._full = full
+        self.boundary = boundary
+        self.margin = margin
+        self.triaged, self.escalated = 0, 0
+        self._result = {'reporters': [], 'entities': [], 'sources': []}
+
+        # Maximum character distance between a reported verb and its reporter
+        self._max_dist = 100
+
+    @property
+    def full(self):
+        """ The extractor of the escalated texts.
+        """
+        if self._full is None:
+            from etiquetador_noticias.tjtool.tjtool import ReporterExtractor
+            self._full = ReporterExtractor()
+        return self._full
+
+    def _names(self, sentence, tokens, folded, skip, verbs):
+        """ Return the (name, start, end) of the capitalised names of the
+        sentence, the words in skip and the verbs excluded. A capitalised
+        first word is only a name when it is followed by another
+        capitalised word or by a verb.
+        """
+        def joined(j):
+            # the words of a name are only separated by spaces
+            return (j not in skip and j not in verbs and
+                    sentence[tokens[j - 1].end():tokens[j].start()].isspace())
+
+        names, i = [], 0
+        while i < len(tokens):
+            if i in skip or i in verbs or not tokens[i].group()[0].isupper():
+                i += 1
+                continue
+            j = i + 1
+            while j < len(tokens) and joined(j):
+                if tokens[j].group()[0].isupper():
+                    j += 1
+                elif (folded[j] in _CONNECTORS and j + 1 < len(tokens) and joined(j + 1) and
+                      tokens[j + 1].group()[0].isupper()):
+                    j += 2
+                else:
+                    break
+            if i > 0 or j - i > 1 or j in verbs:
+                start, end = tokens[i].start(), tokens[j - 1].end()
+                names.append((sentence[start:end], start, end))
+            i = j
+        return names
+
+    def _closest(self, names, verbs):
+        """ Return the name closest to each verb, within _max_dist.
+        """
+        reporters = []
+        for v_start, v_end in verbs:
+            closest, closest_dist = None, self._max_dist
+            for name, start, end in names:
+                dist = max(0, start - v_end, v_start - end)
+                if dist < closest_dist:
+                    closest, closest_dist = name, dist
+            if closest is not None and closest not in reporters:
+                reporters.append(closest)
+        return reporters
+
+    def estimate(self, text):
+        """ Return the estimated reporters, entities and sources of the
+        cleaned text.
+        """
+        sources, reporters, entities = [], [], []
+        for m in _SENTENCE.finditer(text):
+            sentence = m.group()
+            tokens = list(_TOKEN.finditer(sentence))
+            if not tokens:
+                continue
+            folded = [_fold(t.group()) for t in tokens]
+            skip, verbs, i = set(), {}, 0
+            while i < len(tokens):
+                found = self.gazetteer.match(folded, i)
+                if found is None:
+                    if folded[i] in self.gazetteer.verbs:
+                        verbs[i] = (tokens[i].start(), tokens[i].end())
+                    i += 1
+                    continue
+                length, tag = found
+                if tag == 'SOURCE':
+                    sources.append(sentence[tokens[i].start():tokens[i + length - 1].end()])
+                else:
+                    skip.update(range(i, i + length))
+                i += length
+            if verbs:
+                names = self._names(sentence, tokens, folded, skip, verbs)
+                reporters.extend(r for r in self._closest(names, verbs.values()) if r not in reporters)
+                entities.extend(name for name, _, _ in names)
+        reporters = remove_contained(reporters)
+        return {'reporters': reporters,
+                'entities': list(set(entities) - set(reporters)),
+                'sources': sources}
+
+    def near_boundary(self, result):
+        """ Whether the count of reporters and sources of the result is
+        within margin of the boundary of the classification.
+        """
+        count = len(result['reporters']) + len(result['sources'])
+        return self.boundary - self.margin < count <= self.boundary + self.margin
+
+    def parse(self, text):
+        """ Estimates the sources, reporters and entities of the text, and
+        parses it with the full extractor near the boundary.
+        """
+        with stage('triage', chars=len(text)) as s:
+            self._result = self.estimate(clean_text(text))
+            escalate = self.near_boundary(self._result)
+            s.sizes['escalated'] = int(escalate)
+        if not escalate:
+            self.triaged += 1
+            return
+        self.escalated += 1
+        full = self.full
+        full.parse(text)
+        self._result = {'reporters': full.get_reporters(),
+                        'entities': full.get_entities(),
+                        'sources': full.get_sources()}
+
+    def parse_many(self, texts):
+        """ Parses many texts and yields, in order, a dict with the
+        reporters, entities and sources of each one.
+        """
+        for text in texts:
+            self.parse(text)
+            yield {'reporters': self.get_reporters(),
+                   'entities': self.get_entities(),
+                   'sources': self.get_sources()}
+
+    def get_reporters(self):
+        """Return reporters (list): the identified reporters
+        """
+        return list(self._result['reporters'])
+
+    def get_entities(self):
+        """Return entities (list): the identified proper nouns
+        """
+        return list(self._result['entities'])
+
+    def get_sources(self):
+        """Return sources (list): the list of identified well-known sources
+        """
+        return list(self._result['sources'])
@@ -26,5 +26,12 @@ setup(
     packages=find_packages(exclude=['tests']),
     license=license(),
     install_requires=requirements,
+    extras_require={
+        'arrow': ['pyarrow==2.0.0'],
+        'async': ['aiohttp==3.7.3'],
+    },
+    entry_points={
+        'console_scripts': ['etiquetador = etiquetador_noticias.cli:main'],
+    },
     # package_data={'': ['data/*']}
 )
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from etiquetador_noticias.analyser.banners import BannerDetector, BANNER_RULES
+
+
+def _page(body):
+    return f"<html><body>{body}</body></html>"
+
+
+def test_media_badge():
+    found = BannerDetector().detect(_page('<a class="badge_link">Ofrecido por Banco X</a>'),
+                                    "https://elpais.com/economia/1.html")
+    assert found.sponsored and found.sponsor == "Banco X" and found.method == "media"
+
+
+def test_collaboration_in_a_paragraph_is_not_a_sponsor():
+    html = _page("<p>El ministro, en colaboración con Sanidad, anunció…</p>")
+    for url in ("https://www.elmundo.es/espana/1.html", "https://elpais.com/espana/1.html"):
+        found = BannerDetector().detect(html, url)
+        assert not found.sponsored and found.sponsor is None
+
+
+def test_branded_content_menu_link_is_not_a_badge():
+    html = _page('<nav><a href="/branded">Branded content</a><a href="/">Portada</a></nav>'
+                 "<p>La reforma laboral se aprobará antes del verano según el Gobierno.</p>")
+    for url in ("https://www.elmundo.es/espana/1.html", "https://elpais.com/espana/1.html"):
+        assert not BannerDetector().detect(html, url).sponsored
+
+
+def test_media_without_rules_do_not_use_the_markers():
+    html = _page("<span>Contenido patrocinado por Banco X</span>")
+    found = BannerDetector().detect(html, "https://www.elmundo.es/espana/1.html")
+    assert found == (False, None, None, False)
+
+
+def test_fallback_is_opt_in(tmp_path):
+    with open(BANNER_RULES, encoding="utf-8") as f:
+        rules = json.load(f)
+    rules["media"]["elmundo.es"] = {"selectors": [], "fallback": True}
+    rules_file = tmp_path / "rules.json"
+    rules_file.write_text(json.dumps(rules), encoding="utf-8")
+    html = _page("<span>Contenido patrocinado por</span> <b>Banco X</b>")
+    found = BannerDetector(str(rules_file)).detect(html, "https://www.elmundo.es/espana/1.html")
+    assert found.sponsored and found.sponsor == "Banco X" and found.method == "fallback"
+
+
+def test_investors_media_use_the_markers():
+    html = _page('<div class="kicker">Contenido patrocinado por</div> <b>Banco X</b>'
+                 "<p>La entidad presenta su nueva cuenta para jóvenes con ventajas exclusivas.</p>")
+    found = BannerDetector().detect(html, "https://okdiario.com/economia/1.html")
+    assert found == (True, "Banco X", "fallback", True)
+
+
+def test_every_media_of_the_investors_table_opts_in():
+    pytest.importorskip("pandas")
+    from etiquetador_noticias.resources import registry
+    detector = BannerDetector()
+    for url in registry.media()["media_url"]:
+        rules = detector.rules_for(url)
+        assert rules is not None and rules.get("fallback"), url
@@ -0,0 +1,32 @@
+import time
+
+from etiquetador_noticias.analyser import batch
+from etiquetador_noticias.analyser.batch import analyse_many
+
+
+def test_analyse_many_yields_in_completion_order(monkeypatch):
+    delays = {"https://elpais.com/lenta.html": 0.3, "https://elpais.com/rapida.html": 0.05}
+
+    def download(url):
+        time.sleep(delays[url])
+        return f"<html>{url}</html>"
+
+    def analyse_article(url, html, variant, cache, profile, terms, engine):
+        if "rota" in url:
+            raise ValueError("html sin artículo")
+        return {"url": url, "ok": True, "category": "Información", "html": html}
+
+    monkeypatch.setattr(batch, "download", download)
+    monkeypatch.setattr(batch, "analyse_article", analyse_article)
+    items = ["https://elpais.com/lenta.html",
+             {"url": "https://elpais.com/con-html.html", "html": "<html></html>", "id": "b"},
+             "https://elpais.com/rapida.html",
+             {"url": "https://elpais.com/rota.html", "html": "<html></html>", "id": "d"}]
+    records = list(analyse_many(items, workers=0, download_workers=2))
+    assert [r["url"] for r in records] == ["https://elpais.com/con-html.html", "https://elpais.com/rota.html",
+                                           "https://elpais.com/rapida.html", "https://elpais.com/lenta.html"]
+    assert [r["ok"] for r in records] == [True, False, True, True]
+    assert records[1] == {"url": "https://elpais.com/rota.html", "ok": False,
+                          "error": "ValueError: html sin artículo", "id": "d"}
+    assert records[0]["id"] == "b" and "id" not in records[2]
+    assert records[3]["html"] == "<html>https://elpais.com/lenta.html</html>"
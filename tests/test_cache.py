@@ -0,0 +1,104 @@
+import pytest
+
+from etiquetador_noticias.analyser import cache as cache_module
+from etiquetador_noticias.analyser.cache import ArticleCache, content_hash, normalise_url
+
+
+HTML = "<html><body><p>{}</p></body></html>"
+
+
+class _Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+def _put(cache, url, text):
+    return cache.put(url, HTML.format(text), text, ["Redacción"], "2020-11-03T09:30:00")
+
+
+def _cached(cache):
+    """ The cached urls, without marking them as used. """
+    return sorted(url.rsplit("/", 1)[1][:-5] for url, in cache._db.execute("SELECT url FROM urls"))
+
+
+def test_normalise_url():
+    assert normalise_url(" HTTPS://ElPais.com:443/economia/x.html/?b=2&utm_source=tw&a=1#comentarios ") == \
+        "https://elpais.com/economia/x.html?a=1&b=2"
+    assert normalise_url("http://elpais.com:80") == "http://elpais.com/"
+    assert normalise_url("http://elpais.com:8080/x?fbclid=1&ref=portada") == "http://elpais.com:8080/x"
+    assert normalise_url("elpais.com/x") != normalise_url("https://elpais.com/x")
+
+
+def test_urls_are_stored_normalised(tmp_path, clock):
+    cache = ArticleCache(str(tmp_path / "cache.sqlite"))
+    _put(cache, "https://elpais.com/x.html?utm_medium=social", "texto")
+    article = cache.get("https://ELPAIS.com/x.html/#arriba")
+    assert article.url == "https://ELPAIS.com/x.html/#arriba"
+    assert (article.html, article.text, article.authors) == (HTML.format("texto"), "texto", ["Redacción"])
+    assert len(cache) == 1
+
+
+def test_ttl(tmp_path, clock):
+    cache = ArticleCache(str(tmp_path / "cache.sqlite"), ttl=60)
+    _put(cache, "https://elpais.com/x.html", "texto")
+    clock.now += 60
+    assert cache.get("https://elpais.com/x.html") is not None
+    clock.now += 1
+    assert cache.get("https://elpais.com/x.html") is None
+    assert "https://elpais.com/x.html" not in cache
+    assert cache.get("https://elpais.com/x.html", expired=True).text == "texto"
+    # reading does not renew the entry, a not modified answer does
+    cache.touch("https://elpais.com/x.html")
+    assert cache.get("https://elpais.com/x.html").text == "texto"
+
+
+def test_get_by_hash(tmp_path, clock):
+    cache = ArticleCache(str(tmp_path / "cache.sqlite"))
+    chash = _put(cache, "https://elpais.com/x.html", "texto")
+    assert chash == content_hash(HTML.format("texto")) == content_hash(HTML.format("texto").encode("utf-8"))
+    article = cache.get_by_hash(chash)
+    assert article.url is None and article.text == "texto"
+    # the same html of another url shares the content
+    assert _put(cache, "https://elpais.com/y.html", "texto") == chash
+    assert len(cache) == 2
+    assert cache.get_by_hash(content_hash("<html></html>")) is None
+    assert cache.put(None, "<html></html>", "", [], None) == content_hash("<html></html>")
+    assert cache.get_by_hash(content_hash("<html></html>")).text == ""
+
+
+def test_the_least_recently_used_urls_are_evicted(tmp_path, clock):
+    cache = ArticleCache(str(tmp_path / "cache.sqlite"))
+    _put(cache, "https://elpais.com/a.html", "a" * 1000)
+    size = cache._db.execute("SELECT size FROM contents").fetchone()[0]
+    cache.max_bytes = 3 * size
+    for name in "bc":
+        clock.now += 1
+        _put(cache, f"https://elpais.com/{name}.html", name * 1000)
+    # a is read, b is the least recently used
+    clock.now += 1
+    cache.get("https://elpais.com/a.html")
+    cache.set_validators("https://elpais.com/b.html", '"v1"', None)
+    clock.now += 1
+    _put(cache, "https://elpais.com/d.html", "d" * 1000)
+    assert _cached(cache) == ["a", "c", "d"]
+    assert cache.get_validators("https://elpais.com/b.html") == (None, None)
+
+    # a content shared with a newer url is kept
+    clock.now += 1
+    _put(cache, "https://elpais.com/c-copia.html", "c" * 1000)
+    clock.now += 1
+    _put(cache, "https://elpais.com/e.html", "e" * 1000)
+    assert _cached(cache) == ["c-copia", "d", "e"]
+    total = cache._db.execute("SELECT SUM(size) FROM contents").fetchone()[0]
+    assert total <= cache.max_bytes
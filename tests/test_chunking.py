@@ -0,0 +1,116 @@
+from collections import namedtuple
+
+import pytest
+
+from etiquetador_noticias.tjtool.chunking import WordPacker, iter_chunks
+
+
+# a word of a pattern sentence: its string and its index in the sentence
+Word = namedtuple('Word', ['string', 'index'])
+
+TEXT = ("Según Europa Press, el ministro habló con Luis de Guindos. "
+        "Luis de Guindos afirmó que la economía crecerá este año.\n"
+        "La ministra Nadia Calviño aseguró que habrá acuerdo con Ecologistas en Acción. "
+        "Ecologistas en Acción declaró que estudiará la propuesta, informa EFE.")
+
+
+def test_chunks_join_into_the_text():
+    for max_chars in (1, 10, 60, 100, len(TEXT)):
+        chunks = list(iter_chunks(TEXT, max_chars))
+        assert ''.join(chunks) == TEXT
+        assert all(len(chunk) <= max_chars for chunk in chunks)
+    assert list(iter_chunks("")) == [""]
+    with pytest.raises(ValueError):
+        list(iter_chunks(TEXT, 0))
+
+
+def test_chunks_end_at_a_newline_then_a_sentence_then_a_space():
+    text = "Uno dos. Tres cuatro.\nCinco seis siete. Ocho."
+    # the newline fits in the first chunk
+    assert list(iter_chunks(text, 25))[0] == "Uno dos. Tres cuatro.\n"
+    # it does not: the last end of sentence
+    assert list(iter_chunks(text, 20))[0] == "Uno dos. "
+    # no end of sentence: the last space
+    assert list(iter_chunks("Uno dos tres cuatro cinco", 12)) == ["Uno dos ", "tres cuatro ", "cinco"]
+
+
+def test_chunks_never_cut_inside_a_word():
+    for max_chars in range(12, 80):
+        for chunk in list(iter_chunks(TEXT, max_chars))[:-1]:
+            assert chunk[-1].isspace() or chunk.endswith(('.', ',')), (max_chars, chunk)
+    # only a word longer than the chunk is cut
+    assert list(iter_chunks("Supercalifragilístico", 10)) == ["Supercalif", "ragilístic", "o"]
+
+
+def _words(sentences):
+    return [Word(string, index) for sentence in sentences for index, string in enumerate(sentence.split())]
+
+
+def _pack_list(words):
+    from etiquetador_noticias.tjtool.tjtool import ReporterExtractor
+    return ReporterExtractor._pack_list(None, words)
+
+
+def test_packer_joins_names_across_chunks_like_pack_list():
+    sentence = _words(["Luis de Guindos afirmó", "Ecologistas en Acción"])
+    # the words found are the names: indexes 0-2 of the first sentence and the whole second one
+    found = sentence[:3] + sentence[4:]
+    expected = _pack_list(found)
+    assert expected == ["Luis de Guindos", "Ecologistas en Acción"]
+    for cut in range(len(found) + 1):
+        packer = WordPacker()
+        packer.extend(found[:cut])
+        packer.extend(found[cut:])
+        assert packer.finish() == expected, cut
+
+
+def test_packer_keeps_separate_names_of_consecutive_chunks():
+    # the last word of a chunk and the first one of the next chunk are not one name
+    first, second = _words(["dijo Calviño"])[1:], _words(["Guindos respondió"])[:1]
+    packer = WordPacker()
+    packer.extend(first)
+    packer.extend(second)
+    assert packer.finish() == _pack_list(first + second) == ["Calviño", "Guindos"]
+
+
+def _results(extractor, text):
+    extractor.parse(text)
+    return (sorted(extractor.get_reporters()), sorted(extractor.get_entities()),
+            sorted(extractor.get_sources()))
+
+
+# the sentences are shorter than the chunks, and the composed names end and
+# start the chunks
+CHUNK_SIZES = [80, 120]
+
+
+def test_composed_names_are_at_the_chunk_boundaries():
+    for max_chars in CHUNK_SIZES:
+        chunks = list(iter_chunks(TEXT, max_chars))
+        assert all(chunk.rstrip().endswith('.') for chunk in chunks)
+        assert any(chunk.rstrip().endswith(("Luis de Guindos.", "Ecologistas en Acción.")) for chunk in chunks)
+        assert any(chunk.startswith(("Luis de Guindos", "Ecologistas en Acción")) for chunk in chunks[1:])
+
+
+@pytest.mark.parametrize("max_chars", CHUNK_SIZES)
+def test_pattern_extractor_gives_the_same_results_in_chunks(max_chars):
+    pytest.importorskip("pattern.es")
+    from etiquetador_noticias.tjtool import ReporterExtractor
+    whole = ReporterExtractor(memo=False)
+    chunked = ReporterExtractor(memo=False, chunk_size=max_chars)
+    assert _results(chunked, TEXT) == _results(whole, TEXT)
+
+
+@pytest.mark.parametrize("max_chars", CHUNK_SIZES)
+def test_spacy_engine_keeps_the_names_at_the_chunk_boundaries(max_chars):
+    pytest.importorskip("es_core_news_md")
+    from etiquetador_noticias.tjtool import SpacyReporterExtractor
+    whole = SpacyReporterExtractor(engine="spacy", memo=False)
+    chunked = SpacyReporterExtractor(engine="spacy", memo=False, chunk_size=max_chars)
+    whole_reporters, _, whole_sources = _results(whole, TEXT)
+    reporters, entities, sources = _results(chunked, TEXT)
+    # the entity recognizer sees a different context in every chunk, only
+    # the sources and the composed names are compared
+    assert sources == whole_sources
+    assert "Luis de Guindos" in reporters and "Luis de Guindos" in whole_reporters
+    assert "Ecologistas en Acción" in entities
@@ -0,0 +1,96 @@
+import io
+import json
+
+import pytest
+
+from etiquetador_noticias.cli import Checkpoint, main, read_records
+from etiquetador_noticias.analyser.batch import analyse_many
+
+
+def test_invalid_lines_yield_failed_records():
+    stream = io.StringIO('https://elpais.com/a.html\n'
+                         '\n'
+                         '{"url": "https://elpais.com/b.html", "id": 7\n'
+                         '{"id": "sin-url"}\n'
+                         '"https://elpais.com/c.html"\n')
+    records = dict(read_records(stream))
+    assert records[0] == {"url": "https://elpais.com/a.html"}
+    assert records[1] is None
+    assert records[2]["ok"] is False and records[2]["error"].startswith("JSONDecodeError")
+    assert records[3] == {"url": None, "ok": False, "error": "ValueError: line 4 has no url",
+                          "id": "sin-url"}
+    assert records[4] == {"url": "https://elpais.com/c.html"}
+
+
+def test_analyse_many_isolates_items_without_url():
+    records = list(analyse_many([{"id": 1}, ("only-one",), {"url": "", "id": 2}], workers=0,
+                                download_workers=1))
+    assert [r["ok"] for r in records] == [False, False, False]
+    assert sorted(r["id"] for r in records if "id" in r) == [1, 2]
+
+
+def _label(tmp_path, lines, *options):
+    source = tmp_path / "in.jsonl"
+    source.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+    out = tmp_path / "out.jsonl"
+    status = main(["label", str(source), "-o", str(out), "--workers", "0", "--download-workers", "1",
+                   "--checkpoint", str(tmp_path / "checkpoint.json"), *options])
+    return status, out
+
+
+def test_label_continues_after_invalid_lines(tmp_path):
+    status, out = _label(tmp_path, ['{"id": "a"', '{"id": "b"}', "", '[1, 2]'])
+    assert status == 0
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [r["ok"] for r in records] == [False, False, False]
+    assert [r["id"] for r in records] == [0, "b", 3]
+
+
+def test_resume_truncates_the_output_to_the_checkpoint(tmp_path):
+    lines = ['{"id": %d}' % n for n in range(5)]
+    _, out = _label(tmp_path, lines, "--checkpoint-every", "2")
+    assert len(out.read_text(encoding="utf-8").splitlines()) == 5
+
+    # a crash after the checkpoint of the first two results: the output has
+    # two more results and a partial line that the checkpoint does not know
+    first_two = "".join(out.read_text(encoding="utf-8").splitlines(True)[:2])
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+    checkpoint.next_line, checkpoint.done = 2, set()
+    checkpoint.save(len(first_two.encode("utf-8")))
+    with open(out, "a", encoding="utf-8") as f:
+        f.write('{"id": 2, "ok": false}\n{"id": 3, "ok": false}\n{"id": 4, "o')
+
+    _label(tmp_path, lines, "--checkpoint-every", "2")
+    records = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [r["id"] for r in records] == [0, 1, 2, 3, 4]
+
+
+def test_resume_does_not_duplicate_the_store(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    from etiquetador_noticias.analyser import batch
+    from etiquetador_noticias.analyser.store import ResultStore
+
+    def analyse_article(url, html, variant, cache, profile, terms, engine):
+        return {"url": url, "ok": True, "variant": variant, "publish_date": "2020-11-03T09:30:00",
+                "category": "Información"}
+
+    monkeypatch.setattr(batch, "analyse_article", analyse_article)
+    lines = ['{"url": "https://elpais.com/%d.html", "html": "<html></html>"}' % n for n in range(5)]
+    _, out = _label(tmp_path, lines, "--checkpoint-every", "2", "--store", str(tmp_path / "almacen"))
+    store = ResultStore(str(tmp_path / "almacen"))
+    assert len(store) == 5
+
+    # a crash after the store got the second batch but before the checkpoint
+    # was saved: the checkpoint only knows the first batch
+    # (the results are written in completion order)
+    first_two = out.read_text(encoding="utf-8").splitlines(True)[:2]
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+    checkpoint.next_line, checkpoint.done, checkpoint.batch = 0, set(), 1
+    for line in first_two:
+        checkpoint.mark(json.loads(line)["id"])
+    checkpoint.save(len("".join(first_two).encode("utf-8")))
+
+    _label(tmp_path, lines, "--checkpoint-every", "2", "--store", str(tmp_path / "almacen"))
+    urls = sorted(url for frame in store.scan(["url"]) for url in frame["url"])
+    assert urls == sorted(f"https://elpais.com/{n}.html" for n in range(5))
+    assert len(out.read_text(encoding="utf-8").splitlines()) == 5
@@ -0,0 +1,33 @@
+import pytest
+
+from etiquetador_noticias.bench.dedup import quadratic_remove_contained, synthetic_names
+from etiquetador_noticias.tjtool.dedup import remove_contained
+
+
+def _check(names, gram=3):
+    """ Same names as the quadratic filter, in order of first appearance. """
+    result = remove_contained(names, gram)
+    reference = set(quadratic_remove_contained(names))
+    assert result == [name for name in dict.fromkeys(names) if name in reference]
+    return result
+
+
+@pytest.mark.parametrize("n", [10, 100, 500])
+def test_agrees_with_the_quadratic_filter(n):
+    _check(synthetic_names(n, seed=n))
+
+
+@pytest.mark.parametrize("gram", [1, 2, 3, 5])
+def test_names_shorter_than_the_gram(gram):
+    assert _check(["Ana", "Ana Botín", "PP", "PSOE", "P", "Pablo Casado", "EFE"], gram) == [
+        "Ana Botín", "PP", "PSOE", "Pablo Casado", "EFE"]
+    assert _check(["aa", "aaaa", "a", "b"], gram) == ["aaaa", "b"]
+    assert _check(["Ana", "an"], gram) == ["Ana", "an"]
+
+
+def test_duplicates_and_order():
+    names = ["Sánchez", "Pedro Sánchez", "Europa Press", "EFE", "Pedro Sánchez", "EFE", "Calviño"]
+    assert _check(names) == ["Pedro Sánchez", "Europa Press", "EFE", "Calviño"]
+    assert _check(["EFE", "EFE"]) == ["EFE"]
+    assert _check(["", "EFE"]) == ["EFE"]
+    assert _check([]) == []
@@ -0,0 +1,65 @@
+import csv
+import os
+
+import pytest
+
+from etiquetador_noticias.tjtool.tjtool import Entities, normalise_name
+
+
+ENTITIES = os.path.join(os.path.dirname(__file__), os.pardir, "etiquetador_noticias", "tjtool", "data",
+                        "entities.csv")
+
+
+@pytest.fixture
+def entities(tmp_path):
+    path = tmp_path / "entities.csv"
+    path.write_text("Entity,Type,FullName,Aliases\n"
+                    "Unidas Podemos,PAR,Unidas Podemos (coalición),UP|Unidos Podemos\n"
+                    "Banco Santander,ORG,Banco Santander S.A.,Santander\n"
+                    "Santander,LOC,,\n"
+                    "Telefónica,ORG,,\n", encoding="utf-8")
+    return Entities.from_csv(str(path))
+
+
+def test_normalise_name():
+    assert normalise_name("Unidas-Podemos ") == "unidas podemos"
+    assert normalise_name("  TELEFÓNICA,  S.A.") == normalise_name("telefonica s a") == "telefonica s a"
+
+
+def test_variants_resolve_to_the_same_row(entities):
+    for name in ("Unidas Podemos", "unidas podemos", "UNIDAS-PODEMOS", "Unidas  Podemos.", "UP", "unidos podemos"):
+        assert entities.getFullName(name) == "Unidas Podemos (coalición)"
+        assert entities.getType(name) == "PAR"
+        assert name in entities
+    for name in ("Telefónica", "telefonica", "TELEFONICA"):
+        assert entities.getFullDescription(name) == {"name": name, "fullname": name, "type": "ORG"}
+    assert len(entities) == 4
+
+
+def test_aliases_do_not_replace_entities(entities):
+    assert entities.getType("Santander") == "LOC"
+    assert entities.getFullName("Santander") == "Santander"
+    assert entities.getFullName("banco santander") == "Banco Santander S.A."
+
+
+def test_unknown_names_keep_the_baseline_description(entities):
+    assert entities.getFullDescription("Vodafone") == {"name": "Vodafone", "fullname": "Vodafone", "type": None}
+    assert entities.getFullName("Vodafone") == "Vodafone"
+    assert entities.getType("") is None
+    assert "Vodafone" not in entities
+
+
+def test_describe_many(entities):
+    names = ["UP", "Vodafone", "UP", "Banco Santander"]
+    assert entities.describe_many(names) == [entities.getFullDescription(name) for name in names]
+    assert entities.describe_many([]) == []
+
+
+def test_the_table_is_described_as_before():
+    with open(ENTITIES, encoding="utf-8") as f:
+        rows = {row["Entity"].lower(): row for row in csv.DictReader(f)}
+    entities = Entities()
+    for row in rows.values():
+        name = row["Entity"]
+        assert entities.getFullDescription(name) == {"name": name, "fullname": row["FullName"] or name,
+                                                     "type": row["Type"]}
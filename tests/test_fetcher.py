@@ -0,0 +1,150 @@
+import time
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from etiquetador_noticias.analyser.cache import ArticleCache
+from etiquetador_noticias.analyser.fetcher import AsyncFetcher
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def _send(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] += 1
+            hits = server.hits[self.path]
+            server.conditional[self.path] = self.headers.get("If-None-Match")
+        if self.path == "/flaky":
+            if hits <= 2:
+                return self._send(503)
+            return self._send(200, b"<html>ok</html>")
+        if self.path == "/down":
+            return self._send(503)
+        if self.path == "/missing":
+            return self._send(404)
+        if self.path.startswith("/slow"):
+            with server.lock:
+                server.active += 1
+                server.max_active = max(server.max_active, server.active)
+            time.sleep(0.1)
+            with server.lock:
+                server.active -= 1
+            return self._send(200, b"<html>slow</html>")
+        if self.path == "/etag":
+            if self.headers.get("If-None-Match") == '"v1"':
+                return self._send(304)
+            return self._send(200, b"<html>v1</html>", [("ETag", '"v1"')])
+        if self.path == "/not-modified":
+            return self._send(304)
+        self._send(404)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.lock = threading.Lock()
+    httpd.hits, httpd.conditional = Counter(), {}
+    httpd.active = httpd.max_active = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    httpd.base = f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _fetcher(**options):
+    options = dict({"delay": 0, "backoff": 0.01, "timeout": 5}, **options)
+    return AsyncFetcher(**options)
+
+
+def test_retries_the_retryable_statuses(server):
+    with _fetcher(retries=3) as fetcher:
+        flaky = fetcher.submit(server.base + "/flaky").result()
+        down = fetcher.submit(server.base + "/down").result()
+        missing = fetcher.submit(server.base + "/missing").result()
+    assert (flaky.status, flaky.html, flaky.error) == (200, "<html>ok</html>", None)
+    assert server.hits["/flaky"] == 3
+    assert (down.html, down.error) == (None, "HTTP 503")
+    assert server.hits["/down"] == 4
+    assert (missing.html, missing.error) == (None, "HTTP 404")
+    assert server.hits["/missing"] == 1
+
+
+def test_limits_the_requests_per_host(server):
+    urls = [f"{server.base}/slow/{n}" for n in range(8)]
+    with _fetcher(per_host=2) as fetcher:
+        results = list(fetcher.fetch_many(urls))
+    assert sorted(r.url for r in results) == sorted(urls)
+    assert all(r.html == "<html>slow</html>" for r in results)
+    assert server.max_active == 2
+
+
+def test_not_modified_returns_the_cached_html(server, tmp_path):
+    cache = ArticleCache(str(tmp_path / "articles.sqlite"))
+    url = server.base + "/etag"
+    with _fetcher(cache=cache) as fetcher:
+        first = fetcher.submit(url).result()
+        cache.put(url, first.html, "v1", [], None)
+        second = fetcher.submit(url).result()
+    assert (first.html, first.not_modified) == ("<html>v1</html>", False)
+    assert server.conditional["/etag"] == '"v1"'
+    assert (second.status, second.html, second.not_modified) == (304, "<html>v1</html>", True)
+
+
+def test_not_modified_without_cached_copy_fails(server, tmp_path):
+    cache = ArticleCache(str(tmp_path / "articles.sqlite"))
+    with _fetcher(cache=cache) as fetcher:
+        result = fetcher.submit(server.base + "/not-modified").result()
+    assert server.conditional["/not-modified"] is None
+    assert result.html is None and not result.not_modified
+    assert result.error == "HTTP 304 without a cached copy"
+
+
+class _RecordingCache(ArticleCache):
+    """ An ArticleCache that records the threads of its calls.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.threads = []
+
+    def get(self, url, expired=False):
+        self.threads.append(threading.current_thread())
+        return super().get(url, expired)
+
+    def touch(self, url):
+        self.threads.append(threading.current_thread())
+        super().touch(url)
+
+    def set_validators(self, url, etag, last_modified):
+        self.threads.append(threading.current_thread())
+        super().set_validators(url, etag, last_modified)
+
+
+def test_cache_is_not_used_in_the_event_loop(server, tmp_path):
+    cache = _RecordingCache(str(tmp_path / "articles.sqlite"))
+    url = server.base + "/etag"
+    with _fetcher(cache=cache) as fetcher:
+        loop_thread = fetcher._thread
+        first = fetcher.submit(url).result()
+        cache.put(url, first.html, "v1", [], None)
+        assert fetcher.submit(url).result().not_modified
+    assert len(cache.threads) == 4
+    assert loop_thread not in cache.threads
@@ -0,0 +1,67 @@
+import json
+import os
+import re
+
+from etiquetador_noticias.analyser.matcher import SponsorMatcher, fold
+from etiquetador_noticias.resources import registry
+
+
+DATA = os.path.join(os.path.dirname(__file__), "data")
+
+
+def _search_each(patterns, text):
+    """ The previous detection: a search of every pattern in the text. """
+    found = {}
+    for pattern in dict.fromkeys(p for p in patterns if p):
+        offsets = [(m.start(), m.start() + len(pattern))
+                   for m in re.finditer(f"(?=({re.escape(pattern)}))", text)]
+        if offsets:
+            found[pattern] = {"count": len(offsets), "offsets": offsets}
+    return found
+
+
+def test_offsets_and_counts():
+    matcher = SponsorMatcher(["Vodafone", "Sabadell", "Vodafone", ""])
+    assert len(matcher) == 2
+    text = "Vodafone y Sabadell; Vodafone otra vez"
+    assert matcher.search(text) == {"Vodafone": {"count": 2, "offsets": [(0, 8), (21, 29)]},
+                                    "Sabadell": {"count": 1, "offsets": [(11, 19)]}}
+    for start, end, pattern in matcher.finditer(text):
+        assert text[start:end] == pattern
+    assert matcher.search("Ni rastro de patrocinadores") == {}
+
+
+def test_nested_and_overlapping_names():
+    matcher = SponsorMatcher(["Banco Santander", "Santander", "Amber Capital", "Capital Group", "aa"])
+    found = matcher.search("El Banco Santander y Amber Capital Group; aaa")
+    assert found["Banco Santander"]["offsets"] == [(3, 18)]
+    assert found["Santander"]["offsets"] == [(9, 18)]
+    assert found["Amber Capital"]["offsets"] == [(21, 34)]
+    assert found["Capital Group"]["offsets"] == [(27, 40)]
+    assert found["aa"] == {"count": 2, "offsets": [(42, 44), (43, 45)]}
+
+
+def test_ignore_case_and_accents():
+    text = "TELEFÓNICA y telefonica"
+    assert SponsorMatcher(["Telefónica"]).search(text) == {}
+    assert SponsorMatcher(["Telefónica"], ignore_case=True).search(text)["Telefónica"]["offsets"] == [(0, 10)]
+    assert SponsorMatcher(["Telefónica"], ignore_accents=True).search(text) == {}
+    found = SponsorMatcher(["Telefónica"], ignore_case=True, ignore_accents=True).search(text)
+    assert found["Telefónica"]["offsets"] == [(0, 10), (13, 23)]
+
+
+def test_fold_keeps_the_offsets():
+    for text in ("Ağır İstanbul", "Ñandú Über straße", "ﬁnanzas"):
+        assert len(fold(text, ignore_case=True, ignore_accents=True)) == len(text)
+
+
+def test_agrees_with_a_search_of_every_name():
+    with open(os.path.join(DATA, "parity.jsonl"), encoding="utf-8") as f:
+        texts = [json.loads(line)["text"] for line in f]
+    for record in registry.media_index():
+        names = [name for name, _ in record.sponsors]
+        # the names of the media mentioned inside words, one after another and alone
+        texts += [" ".join(names), "".join(names[::-1]), "; ".join(f"{n} y {n}" for n in names[:10])]
+        matcher = SponsorMatcher(names)
+        for text in texts:
+            assert matcher.search(text) == _search_each(names, text)
@@ -0,0 +1,75 @@
+import shutil
+
+import pytest
+
+from etiquetador_noticias.analyser.media_index import (INVESTORS_TABLE, MediaIndex, domain_candidates,
+                                                       domain_of)
+
+
+def test_domain_candidates():
+    assert list(domain_candidates("https://www.cincodias.elpais.com:443/x?y=1")) == [
+        "cincodias.elpais.com", "elpais.com"]
+    assert list(domain_candidates("WWW.ElPais.com.")) == ["elpais.com"]
+    assert list(domain_candidates("https://localhost/x")) == []
+    assert domain_of("https://www.okdiario.com/") == "okdiario.com"
+
+
+@pytest.fixture
+def table(tmp_path):
+    pytest.importorskip("openpyxl")
+    path = tmp_path / "inversores.xlsx"
+    shutil.copy(INVESTORS_TABLE, path)
+    return path
+
+
+@pytest.fixture
+def compiled(monkeypatch):
+    tables = []
+    compile_table = MediaIndex.compile
+
+    def compile(self):
+        tables.append(self.table_file)
+        return compile_table(self)
+
+    monkeypatch.setattr(MediaIndex, "compile", compile)
+    return tables
+
+
+def test_lookup_by_subdomain_and_www(table):
+    index = MediaIndex(str(table), cache_dir=None)
+    for url in ("https://www.elpais.com/economia/x.html", "https://cincodias.elpais.com/x.html",
+                "elpais.com"):
+        assert index.lookup(url).media_name == "EL PAÍS"
+    assert "https://www.okdiario.com/espana/x.html" in index
+    assert index.lookup("https://elpais.com.example.org/x.html") is None
+    assert index.sponsors("https://www.elmundo.es/") == []
+
+
+def test_the_compiled_index_is_rebuilt_when_the_table_changes(table, tmp_path, compiled):
+    import pandas as pd
+    cache_dir = str(tmp_path / "cache")
+    assert len(MediaIndex(str(table), cache_dir=cache_dir)) == 2
+    assert len(MediaIndex(str(table), cache_dir=cache_dir)) == 2
+    assert len(compiled) == 1
+
+    df = pd.read_excel(table)
+    row = {"media_name": "EL MUNDO", "media_url": "https://www.elmundo.es/",
+           "pat_entity": "Iberdrola", "pat_type": "gran anunciante"}
+    pd.concat([df, pd.DataFrame([row])]).to_excel(table, index=False)
+    index = MediaIndex(str(table), cache_dir=cache_dir)
+    assert index.sponsors("https://elmundo.es/x.html") == [("Iberdrola", "gran anunciante")]
+    assert len(compiled) == 2
+    # the new version is stored
+    assert len(MediaIndex(str(table), cache_dir=cache_dir)) == 3
+    assert len(compiled) == 2
+
+
+def test_an_unreadable_compiled_index_is_rebuilt(table, tmp_path, compiled):
+    cache_dir = str(tmp_path / "cache")
+    index_file = MediaIndex(str(table), cache_dir=cache_dir).load()._index_file()
+    # written by a module that cannot be imported, and truncated
+    for data in (b"cmedia_index\nMediaRecord\n.", b"\x80\x04\x95"):
+        with open(index_file, "wb") as f:
+            f.write(data)
+        assert len(MediaIndex(str(table), cache_dir=cache_dir)) == 2
+    assert len(compiled) == 3
@@ -0,0 +1,29 @@
+import pytest
+
+from etiquetador_noticias.tjtool.memo import ExtractionMemo
+
+
+@pytest.fixture
+def extractor():
+    pytest.importorskip("es_core_news_md")
+    from etiquetador_noticias.tjtool import SpacyReporterExtractor
+
+    def make(chunk_size, memo):
+        return SpacyReporterExtractor(engine="spacy", chunk_size=chunk_size, memo=memo)
+    return make
+
+
+def test_chunk_size_is_part_of_the_memo_key(extractor):
+    memo = ExtractionMemo()
+    small, large = extractor(200, memo), extractor(5000, memo)
+    text = "Pedro Sánchez afirmó que el Gobierno aprobará los presupuestos."
+    assert small._memo_key(text) != large._memo_key(text)
+    assert extractor(200, memo)._memo_key(text) == small._memo_key(text)
+
+
+def test_results_are_not_shared_between_chunk_sizes(extractor):
+    memo = ExtractionMemo()
+    text = "Pedro Sánchez afirmó que el Gobierno aprobará los presupuestos."
+    extractor(200, memo).parse(text)
+    extractor(5000, memo).parse(text)
+    assert (memo.hits, memo.misses) == (0, 2)
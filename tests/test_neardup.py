@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from etiquetador_noticias.tjtool.neardup import NearDuplicateIndex
+
+
+def _text(n):
+    return " ".join(f"palabra{n}_{i}" for i in range(80))
+
+
+def test_near_duplicate_is_reused():
+    index = NearDuplicateIndex()
+    text = _text(0)
+    index.put("ns", index.sketch(text), {"sources": ["EFE"]})
+    assert index.get("ns", index.sketch(text + " fin")) == {"sources": ["EFE"]}
+    assert index.get("other", index.sketch(text)) is None
+
+
+def test_oldest_texts_are_pruned():
+    index = NearDuplicateIndex(max_documents=3)
+    sketches = [index.sketch(_text(n)) for n in range(5)]
+    for n, sketch in enumerate(sketches):
+        index.put("ns", sketch, {"n": n})
+    assert index.prune() == 2
+    assert len(index) == 3
+    assert index.get("ns", sketches[0]) is None
+    assert index.get("ns", sketches[4]) == {"n": 4}
+
+
+def test_expired_texts_are_not_returned():
+    index = NearDuplicateIndex(ttl=-1)
+    sketch = index.sketch(_text(0))
+    index.put("ns", sketch, {"n": 0})
+    assert index.get("ns", sketch) is None
+    assert index.prune() == 1 and len(index) == 0
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from etiquetador_noticias.bench.parity import DEFAULT_MIN_AGREEMENT, compare, load_texts, main
+
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "parity.jsonl")
+
+
+@pytest.fixture(scope="module")
+def report():
+    pytest.importorskip("pattern.search")
+    pytest.importorskip("es_core_news_md")
+    from etiquetador_noticias.tjtool import SpacyReporterExtractor
+    reference = SpacyReporterExtractor(engine="pattern", memo=False, neardup=False)
+    candidate = SpacyReporterExtractor(engine="spacy", memo=False, neardup=False)
+    return compare(load_texts([CORPUS]), reference, candidate)
+
+
+def test_engines_find_the_same_sources(report):
+    assert report["texts"] == 6
+    assert report["exact"]["sources"] == report["texts"], report["differences"]
+
+
+def test_engines_agree_on_the_reporters(report):
+    assert report["jaccard"]["reporters"] >= DEFAULT_MIN_AGREEMENT, report["differences"]
+
+
+def test_main_fails_below_the_agreement(report):
+    assert main([CORPUS]) == 0
+    assert main([CORPUS, "--min-agreement", "1.01"]) == 1
@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from etiquetador_noticias.bench.parity import load_texts
+
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "parity.jsonl")
+
+
+def _texts():
+    texts = [text for _, text in load_texts([CORPUS])]
+    # a repeated text and a text without sentences
+    return texts + texts[:1] + [""]
+
+
+def _comparable(result):
+    # the entities are built from a set, their order is not meaningful
+    return dict(result, entities=sorted(result['entities']))
+
+
+def _single(extractor, texts):
+    results = []
+    for text in texts:
+        extractor.parse(text)
+        results.append({'reporters': extractor.get_reporters(),
+                        'entities': sorted(extractor.get_entities()),
+                        'sources': extractor.get_sources()})
+    return results
+
+
+@pytest.mark.parametrize("engine", ["pattern", "spacy"])
+@pytest.mark.parametrize("chunk_size", [20000, 120])
+def test_parse_many_matches_parse(engine, chunk_size):
+    pytest.importorskip("es_core_news_md")
+    if engine == "pattern":
+        pytest.importorskip("pattern.es")
+    from etiquetador_noticias.tjtool import SpacyReporterExtractor
+    texts = _texts()
+    batched = SpacyReporterExtractor(engine=engine, memo=False, batch_size=4, chunk_size=chunk_size)
+    single = SpacyReporterExtractor(engine=engine, memo=False, chunk_size=chunk_size)
+    assert [_comparable(r) for r in batched.parse_many(texts)] == _single(single, texts)
@@ -0,0 +1,129 @@
+import json
+import threading
+
+import pytest
+
+from etiquetador_noticias import profiling
+from etiquetador_noticias.profiling import Profiler, collect, percentile, stage
+
+
+@pytest.fixture
+def profiler():
+    profiler = profiling.enable()
+    yield profiler
+    profiling.disable()
+
+
+def test_nested_stages(profiler):
+    with stage("article", chars=10) as outer:
+        with stage("article_cache") as inner:
+            inner.cache_hit = False
+        with stage("article_download") as download:
+            download.sizes["bytes"] = 300
+        outer.sizes["chars"] += 5
+    assert outer.wall >= inner.wall + download.wall
+    stages = profiler.snapshot()
+    assert list(stages) == ["article", "article_cache", "article_download"]
+    assert stages["article"]["sizes"] == {"chars": 15}
+    assert stages["article_download"]["sizes"] == {"bytes": 300}
+    assert (stages["article_cache"]["cache_hits"], stages["article_cache"]["cache_misses"]) == (0, 1)
+    assert all(s["count"] == 1 for s in stages.values())
+
+
+def test_stages_are_reported_when_they_fail(profiler):
+    with pytest.raises(ValueError):
+        with stage("reporters"):
+            raise ValueError("texto vacío")
+    assert profiler.snapshot()["reporters"]["count"] == 1
+
+
+def test_nothing_is_reported_when_disabled():
+    assert profiling.get_profiler() is None
+    with stage("banners") as s:
+        pass
+    assert s.wall >= 0 and s.cpu >= 0
+
+
+def _publi():
+    with stage("publi"):
+        pass
+
+
+def test_collect():
+    names = []
+    with collect() as outer:
+        with stage("banners"):
+            with collect() as inner:
+                with stage("reporters"):
+                    pass
+        # the stages of other threads are not collected
+        thread = threading.Thread(target=_publi)
+        thread.start()
+        thread.join()
+    with stage("category"):
+        pass
+    assert [event[0] for event in inner] == ["reporters"]
+    assert [event[0] for event in outer] == ["reporters", "banners"]
+
+    profiler = Profiler()
+    profiler.add_callback(lambda event: names.append(event[0]))
+    profiler.add_many([list(event) for event in outer])
+    assert names == ["reporters", "banners"]
+    assert set(profiler.snapshot()) == {"reporters", "banners"}
+
+
+def _profiler():
+    profiler = Profiler(buckets=(0.1, 1.0))
+    for event in [("parse", 0.05, 0.04, {"chars": 100}, True),
+                  ("parse", 0.1, 0.1, {"chars": 50}, False),
+                  ("parse", 0.5, 0.2, {}, None),
+                  ("parse", 3.0, 1.0, {"chars": 10}, True),
+                  ("download", 0.2, 0.0, {}, None)]:
+        profiler.add(event)
+    return profiler
+
+
+def test_json_format():
+    data = json.loads(_profiler().to_json())
+    assert data["buckets"] == [0.1, 1.0]
+    assert data["stages"]["parse"] == {"count": 4, "wall_seconds": 3.65, "cpu_seconds": 1.34,
+                                       "histogram": {"0.1": 2, "1.0": 1, "+Inf": 1},
+                                       "sizes": {"chars": 160}, "cache_hits": 2, "cache_misses": 1}
+
+
+def test_prometheus_format():
+    lines = _profiler().to_prometheus(prefix="etq").splitlines()
+    assert lines[:2] == ["# HELP etq_stage_seconds Wall time of the stages of the analysis.",
+                         "# TYPE etq_stage_seconds histogram"]
+    # the buckets are cumulative
+    assert [line for line in lines if line.startswith('etq_stage_seconds_bucket{stage="parse"')] == [
+        'etq_stage_seconds_bucket{stage="parse",le="0.1"} 2',
+        'etq_stage_seconds_bucket{stage="parse",le="1.0"} 3',
+        'etq_stage_seconds_bucket{stage="parse",le="+Inf"} 4']
+    assert 'etq_stage_seconds_count{stage="download"} 1' in lines
+    assert 'etq_stage_input_total{stage="parse",unit="chars"} 160' in lines
+    assert 'etq_stage_cache_total{stage="parse",result="miss"} 1' in lines
+    assert not any(line.startswith('etq_stage_cache_total{stage="download"') for line in lines)
+    # every sample has a name, labels and a value
+    for line in lines:
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            assert name.startswith("etq_stage_") and name.endswith("}")
+            float(value)
+
+
+def test_write(tmp_path):
+    profiler = _profiler()
+    profiler.write(str(tmp_path / "perfil.json"))
+    profiler.write(str(tmp_path / "perfil.prom"), "prometheus")
+    assert json.loads((tmp_path / "perfil.json").read_text(encoding="utf-8"))["stages"]["download"]["count"] == 1
+    assert (tmp_path / "perfil.prom").read_text(encoding="utf-8") == profiler.to_prometheus()
+    profiler.reset()
+    assert profiler.snapshot() == {}
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([1.0], 99) == 1.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
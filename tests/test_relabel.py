@@ -0,0 +1,89 @@
+import copy
+
+from etiquetador_noticias.analyser import batch, relabel as relabel_module
+from etiquetador_noticias.analyser.relabel import ANALYSE, TermIndex, article_terms, diff_snapshots, relabel
+
+
+SNAPSHOT = {"reported_verbs": ["afirmar"], "sources": [], "locations": [], "entities": {},
+            "sponsors": {}, "banner_rules": {"elpais.com": "{}"}, "banner_fallback": "{}"}
+
+A, B = "https://elpais.com/a.html", "https://elpais.com/b.html"
+
+
+def _record(url, engine, text="texto del articulo"):
+    record = {"url": url, "ok": True, "variant": "seria", "engine": engine, "category": "Información",
+              "reporters": [], "entities": [], "sources": []}
+    record["terms"] = article_terms(text, record)
+    return record
+
+
+def _index(tmp_path):
+    index = TermIndex(str(tmp_path / "index.sqlite"))
+    index.add_many([_record(A, "triage"), _record(B, "full")])
+    index.set_snapshot(SNAPSHOT)
+    return index
+
+
+def _fake_analysis(monkeypatch, fail):
+    calls = []
+
+    def analyse_article(url, html, variant, cache, profile, terms, engine):
+        calls.append((url, engine))
+        if url in fail:
+            raise RuntimeError("no se pudo analizar")
+        return _record(url, engine)
+
+    monkeypatch.setattr(batch, "download", lambda url: "<html></html>")
+    monkeypatch.setattr(batch, "analyse_article", analyse_article)
+    return calls
+
+
+def test_relabel_keeps_failed_articles_pending(tmp_path, monkeypatch):
+    index = _index(tmp_path)
+    changed = copy.deepcopy(SNAPSHOT)
+    changed["banner_rules"]["elpais.com"] = '{"markers": ["patrocinado"]}'
+    monkeypatch.setattr(relabel_module, "data_snapshot", lambda: changed)
+
+    calls = _fake_analysis(monkeypatch, fail={B})
+    records = list(relabel(index, workers=0, download_workers=1))
+    assert sorted(calls) == [(A, "triage"), (B, "full")]
+    assert {r["url"]: r["ok"] for r in records} == {A: True, B: False}
+    assert index.snapshot() == changed
+    assert [index.urls([a])[a] for a in index.pending()] == [B]
+
+    # the data files did not change again, only the failed article is analysed
+    calls = _fake_analysis(monkeypatch, fail=set())
+    records = list(relabel(index, workers=0, download_workers=1))
+    assert calls == [(B, "full")]
+    assert [r["ok"] for r in records] == [True]
+    assert index.pending() == set()
+
+
+def test_records_without_engine_are_analysed_with_the_full_engine(tmp_path, monkeypatch):
+    index = TermIndex(str(tmp_path / "index.sqlite"))
+    old = _record(A, None)
+    del old["engine"]
+    index.add(old)
+    index.set_snapshot(SNAPSHOT)
+    changed = copy.deepcopy(SNAPSHOT)
+    changed["reported_verbs"].append("asegurar")
+    changed["banner_rules"] = {}
+    monkeypatch.setattr(relabel_module, "data_snapshot", lambda: changed)
+
+    calls = _fake_analysis(monkeypatch, fail=set())
+    list(relabel(index, workers=0, download_workers=1))
+    assert calls == [(A, "full")]
+
+
+def test_sponsor_changes_affect_every_article_of_the_media(tmp_path):
+    # the sponsors are found inside words and regardless of case and
+    # accents, so none of the words of the text is the name of the sponsor
+    index = TermIndex(str(tmp_path / "index.sqlite"))
+    index.add_many([_record(A, "full", "los accionistas de ACCIONAGRUPO votan"),
+                    _record(B, "full", "sin patrocinadores"),
+                    _record("https://okdiario.com/c.html", "full", "accion agrupo")])
+    changed = copy.deepcopy(SNAPSHOT)
+    changed["sponsors"] = {"elpais.com": ["Acción"]}
+    affected = index.affected(diff_snapshots(SNAPSHOT, changed))
+    assert set(index.urls(affected).values()) == {A, B}
+    assert set(affected.values()) == {ANALYSE}
@@ -0,0 +1,13 @@
+import pytest
+
+from etiquetador_noticias.resources import require
+
+
+def test_require_returns_the_module():
+    import json
+    assert require("json", "arrow") is json
+
+
+def test_require_names_the_extra_of_a_missing_module():
+    with pytest.raises(ImportError, match=r"pip install 'etiquetador_noticias\[arrow\]'"):
+        require("etiquetador_noticias_missing_module", "arrow")
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from etiquetador_noticias.analyser.result import STAGES, AnalysisResult, classify
+
+
+# (pat, pub_text, num_total_sources) -> category of the "seria" and "gamberra" variants
+TREE = [
+    ((True, True, 0), "Publicidad", "Publicidad"),
+    ((True, True, 5), "Publicidad", "Publicidad"),
+    ((True, False, 0), "Contenido Patrocinado", "Publicidad"),
+    ((True, False, 5), "Contenido Patrocinado", "Publicidad"),
+    ((False, True, 3), "Publicidad Encubierta", "Publicidad Encubierta"),
+    ((False, False, 3), "Información", "Información"),
+    # two sources are not enough to be information
+    ((False, True, 2), "Publicidad Encubierta", "Publicidad Encubierta"),
+    ((False, False, 2), "Contenido Parcial", "Contenido Parcial"),
+    ((False, False, 0), "Contenido Parcial", "Contenido Parcial"),
+]
+
+
+@pytest.mark.parametrize("inputs, seria, gamberra", TREE)
+def test_classify(inputs, seria, gamberra):
+    assert classify("seria", *inputs) == seria
+    assert classify("gamberra", *inputs) == gamberra
+
+
+def _result(**fields):
+    described = [{"name": "Nadia Calviño", "fullname": "Nadia Calviño Santamaría", "type": "PER"}]
+    values = dict(url="https://elpais.com/economia/x.html", source_url="https://elpais.com",
+                  variant="seria", media_name="EL PAÍS", recognized_media=True,
+                  publish_date="2020-11-03T09:30:00", authors=["Redacción"], sponsored=True,
+                  sponsor="Banco Sabadell", banner_rules=True, reporters=described, entities=[],
+                  sources=[{"name": "EFE", "fullname": "Agencia EFE", "type": "MED"}],
+                  num_total_sources=2, pub_text=True, detected_pat=["Telefónica"],
+                  detected_pat_types=["inversor"], category="Publicidad",
+                  timings={stage: 0.5 for stage in STAGES})
+    values.update(fields)
+    return AnalysisResult(**values)
+
+
+def test_json_round_trip():
+    result = _result()
+    text = result.to_json()
+    assert "EL PAÍS" in text
+    assert AnalysisResult.from_json(text) == result
+    assert AnalysisResult.from_json(text).to_dict() == json.loads(text)
+    # missing fields are None, other keys of the records are ignored
+    record = {"url": "https://elpais.com/x.html", "ok": True, "id": 7}
+    assert AnalysisResult.from_dict(record) == AnalysisResult(url="https://elpais.com/x.html")
+    assert AnalysisResult.from_json(AnalysisResult().to_json()) == AnalysisResult()
+
+
+def test_unknown_fields():
+    with pytest.raises(TypeError, match="Unknown fields of AnalysisResult: ok"):
+        AnalysisResult(url="https://elpais.com/x.html", ok=True)
+    assert _result() != _result(category="Información")
+    assert _result() != _result().to_dict()
+
+
+def test_render_report():
+    report = _result().render_report()
+    assert "Fecha de publicación: 03-11-2020 09:30:00" in report
+    assert "patrocinado por Banco Sabadell" in report
+    assert "['Nadia Calviño', 'EFE']" in report
+    assert "habla sobre Telefónica, que es un inversor de EL PAÍS" in report
+    assert report.endswith("El artículo ha sido clasificado como Publicidad\n")
+    assert "Fecha de publicación: desconocida" in _result(publish_date=None).render_report()
+
+
+def test_arrow_round_trip():
+    pytest.importorskip("pyarrow")
+    results = [_result(), _result(url="https://okdiario.com/x.html", sponsor=None, timings={"article": 1.0})]
+    rows = AnalysisResult.to_arrow(results).to_pylist()
+    assert AnalysisResult.from_dict(rows[0]) == results[0]
+    assert rows[1]["timings"] == {stage: (1.0 if stage == "article" else None) for stage in STAGES}
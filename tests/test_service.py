@@ -0,0 +1,115 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from etiquetador_noticias.bench.suite import CORPUS
+from etiquetador_noticias.service import LabellingService, ServiceClient, make_server
+
+
+@pytest.fixture(scope="module")
+def articles():
+    pytest.importorskip("newspaper")
+    pytest.importorskip("es_core_news_md")
+    with open(CORPUS, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _single(article):
+    """ The record of the article analysed on its own, without memo.
+    """
+    from etiquetador_noticias.analyser import Analyser
+    from etiquetador_noticias.tjtool import SpacyReporterExtractor
+    extractor = SpacyReporterExtractor(engine="spacy", memo=False)
+    analyser = Analyser(article["url"], html=article["html"], extractor=extractor)
+    return {"url": article["url"], "ok": True, **analyser.analyse().to_dict()}
+
+
+def _without_timings(record):
+    return {key: value for key, value in record.items() if key != "timings"}
+
+
+def test_micro_batched_results_match_single_requests(articles, tmp_path):
+    service = LabellingService(max_batch=len(articles), max_wait=0.5, spacy_engine="spacy").start()
+    server = make_server(service, socket_path=str(tmp_path / "etiquetador.sock"), request_timeout=120)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        client = ServiceClient("unix:" + str(tmp_path / "etiquetador.sock"), timeout=120)
+        assert client.wait_ready(timeout=120)
+        with ThreadPoolExecutor(max_workers=len(articles)) as pool:
+            batched = list(pool.map(lambda a: client.analyse(a["url"], html=a["html"], item_id=a["id"]),
+                                    articles))
+        stats = client.stats()
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+    assert stats["completed"] == len(articles)
+    assert stats["max_batch_size"] > 1
+    for article, record in zip(articles, batched):
+        assert record.pop("id") == article["id"]
+        assert _without_timings(record) == _without_timings(_single(article))
+
+
+class _Extractor(object):
+
+    def parse_many(self, texts):
+        for _ in texts:
+            yield {}
+
+
+class _Analyser(object):
+
+    def __init__(self, url):
+        self.url = url
+
+    @property
+    def article(self):
+        if "rota" in self.url:
+            raise AttributeError("el artículo no tiene texto")
+        return self
+
+    text = "texto"
+
+    def analyse(self):
+        from etiquetador_noticias.analyser.result import AnalysisResult
+        return AnalysisResult(url=self.url, category="Información")
+
+
+@pytest.fixture
+def service(monkeypatch):
+    from etiquetador_noticias import tjtool
+    from etiquetador_noticias.resources import registry
+    monkeypatch.setattr(registry, "warm_up", lambda: registry)
+    monkeypatch.setattr(tjtool, "ReporterExtractor", _Extractor)
+    service = LabellingService(max_batch=4, max_wait=0.05)
+    monkeypatch.setattr(service, "_analyser", lambda job: _Analyser(job.url))
+    with service:
+        yield service
+
+
+def test_an_error_in_a_batch_fails_only_its_articles(service):
+    # the error of the broken article escapes the analysis of its batch
+    futures = [service.submit(f"https://elpais.com/{name}.html") for name in ("a", "rota")]
+    records = [future.result(timeout=10) for future in futures]
+    assert [r["ok"] for r in records] == [False, False]
+    assert records[1]["error"] == "AttributeError: el artículo no tiene texto"
+    # the batcher thread is still alive
+    record = service.submit("https://elpais.com/b.html").result(timeout=10)
+    assert record["ok"] and record["category"] == "Información"
+    assert service.stats()["failed"] == 2
+
+
+def test_the_profiler_of_the_service_is_not_global(service):
+    from etiquetador_noticias import profiling
+    from etiquetador_noticias.profiling import stage
+    assert service.submit("https://elpais.com/a.html").result(timeout=10)["ok"]
+    assert profiling.get_profiler() is None
+    with stage("fuera_del_servicio"):
+        pass
+    stages = service.profiler.snapshot()
+    assert stages["service_batch"]["count"] == 1
+    assert "fuera_del_servicio" not in stages
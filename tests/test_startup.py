@@ -0,0 +1,33 @@
+import os
+import sys
+import json
+import subprocess
+
+from etiquetador_noticias.cli import HEAVY_MODULES, STARTUP_BUDGET
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SCRIPT = """
+import sys, time, json
+t = time.perf_counter()
+import etiquetador_noticias, etiquetador_noticias.tjtool, etiquetador_noticias.analyser, etiquetador_noticias.cli
+elapsed = time.perf_counter() - t
+print(json.dumps({"seconds": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def _measure():
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])))
+    out = subprocess.run([sys.executable, "-c", _SCRIPT % HEAVY_MODULES], check=True, cwd=ROOT, env=env,
+                         stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(out)
+
+
+def test_import_does_not_load_heavy_modules():
+    assert _measure()["heavy"] == []
+
+
+def test_import_is_within_the_startup_budget():
+    best = min(_measure()["seconds"] for _ in range(3))
+    assert best <= STARTUP_BUDGET, f"import took {best * 1000:.0f} ms, budget {STARTUP_BUDGET * 1000:.0f} ms"
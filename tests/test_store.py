@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("pandas")
+
+from etiquetador_noticias.analyser.result import AnalysisResult
+from etiquetador_noticias.analyser.store import ResultStore, UNKNOWN_MONTH, partition_of
+
+
+def _record(url, date, category, detected_pat=(), sponsor=None, **fields):
+    described = [{"name": "Europa Press", "fullname": "Europa Press", "type": "agency"}]
+    record = {"url": url, "ok": True, "source_url": None, "variant": "seria", "media_name": "EL PAÍS",
+              "recognized_media": True, "publish_date": date, "authors": ["Laura Ibáñez"],
+              "sponsored": sponsor is not None, "sponsor": sponsor, "banner_rules": True,
+              "reporters": [], "entities": [], "sources": described, "num_total_sources": 1,
+              "pub_text": bool(detected_pat), "detected_pat": list(detected_pat),
+              "detected_pat_types": ["investor"] * len(detected_pat), "category": category,
+              "timings": {"article": 0.1, "category": 0.0}}
+    record.update(fields)
+    return record
+
+
+RECORDS = [
+    _record("https://elpais.com/a.html", "2020-10-03T09:30:00", "Información"),
+    _record("https://elpais.com/b.html", "2020-10-20T09:30:00", "Publicidad Encubierta",
+            detected_pat=["Banco Santander", "Banco Santander"]),
+    _record("https://elpais.com/c.html", "2020-11-02T09:30:00", "Publicidad", sponsor="Iberdrola",
+            detected_pat=["Iberdrola"]),
+    _record("https://okdiario.com/d.html", None, "Contenido Parcial", media_name="OK DIARIO",
+            detected_pat=["Banco Santander"]),
+    {"url": "https://elpais.com/e.html", "ok": False, "error": "IOError: no se pudo descargar"},
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultStore(str(tmp_path / "almacen"))
+    assert store.append(RECORDS[:2]) == 2
+    assert store.append(RECORDS[2:]) == 2
+    return store
+
+
+def test_partition_of():
+    assert partition_of(RECORDS[0]) == ("elpais.com", "2020-10")
+    assert partition_of(RECORDS[3]) == ("okdiario.com", UNKNOWN_MONTH)
+    assert partition_of(dict(RECORDS[3], source_url="https://www.elpais.com")) == ("elpais.com", UNKNOWN_MONTH)
+
+
+def test_append_writes_hive_partitions(store):
+    assert store.partitions() == [("elpais.com", "2020-10"), ("elpais.com", "2020-11"),
+                                  ("okdiario.com", UNKNOWN_MONTH)]
+    directory = os.path.join(store.path, "media=elpais.com", "month=2020-10")
+    files = os.listdir(directory)
+    assert len(files) == 1 and files[0].endswith(".parquet") and not files[0].startswith(".")
+    assert len(store) == 4
+
+
+def test_append_accepts_results(tmp_path):
+    store = ResultStore(str(tmp_path / "almacen"))
+    assert store.append([AnalysisResult.from_dict(RECORDS[0])]) == 1
+    frame = next(store.scan(["url", "category", "media", "month"]))
+    assert frame.to_dict("records") == [{"url": RECORDS[0]["url"], "category": "Información",
+                                         "media": "elpais.com", "month": "2020-10"}]
+
+
+def test_count_and_category_share(store):
+    counts = store.count()
+    assert counts[("elpais.com", "2020-10")] == 2 and counts.sum() == 4
+    share = store.category_share(where={"media": "elpais.com"})
+    october = share.loc[("elpais.com", "2020-10")]
+    assert october["Información"] == october["Publicidad Encubierta"] == 0.5
+    assert october["total"] == 2
+    assert share.loc[("elpais.com", "2020-11")]["Publicidad"] == 1.0
+    assert store.category_share(where={"month": "1999-01"}).empty
+
+
+def test_mentions(store):
+    mentions = store.mentions("Banco Santander")
+    assert sorted(mentions["url"]) == ["https://elpais.com/b.html", "https://okdiario.com/d.html"]
+    # the sponsor of the banner is a mention too
+    assert list(store.mentions("Iberdrola")["url"]) == ["https://elpais.com/c.html"]
+    assert store.mentions("Nadie").empty
+    assert list(store.mentions("Banco Santander", where={"month": "2020-10"})["url"]) == \
+        ["https://elpais.com/b.html"]
+
+
+def test_mention_counts(store):
+    counts = store.mention_counts()
+    # a name counts once per article
+    assert counts[("elpais.com", "Banco Santander")] == 1
+    assert counts[("okdiario.com", "Banco Santander")] == 1
+    assert counts[("elpais.com", "Iberdrola")] == 1
+    assert counts.sum() == 3
+
+
+def test_compact_joins_the_files_of_a_partition(store):
+    store.append([_record("https://elpais.com/f.html", "2020-10-21T09:30:00", "Información")])
+    directory = os.path.join(store.path, "media=elpais.com", "month=2020-10")
+    assert len(os.listdir(directory)) == 2
+    assert store.compact() == 1
+    assert len(os.listdir(directory)) == 1
+    assert len(store) == 5
+    assert store.count()[("elpais.com", "2020-10")] == 3
@@ -0,0 +1,130 @@
+import os
+
+import pytest
+
+from etiquetador_noticias.tjtool.conjugation import conjugate
+from etiquetador_noticias.tjtool.triage import Gazetteer, TriageExtractor, _fold
+
+
+class _Full(object):
+    """ The full extractor of the escalated texts, which records them.
+    """
+
+    def __init__(self):
+        self.texts = []
+
+    def parse(self, text):
+        self.texts.append(text)
+
+    def get_reporters(self):
+        return ["Reportero"]
+
+    def get_entities(self):
+        return []
+
+    def get_sources(self):
+        return ["Fuente"]
+
+
+NO_SOURCES = "La lluvia volvió a la costa durante el fin de semana."
+# one reporter and one source: within the margin of the boundary
+NEAR = "Luis de Guindos afirmó que la economía crecerá este año, informa Europa Press."
+# five sources: far from the boundary
+FAR = "Según Europa Press, EFE, Reuters y Agencias, el Gobierno aprobará el plan. Lo confirma AP."
+
+
+def _folded(text):
+    return [_fold(word) for word in text.split()]
+
+
+@pytest.fixture(scope="module")
+def gazetteer():
+    return Gazetteer()
+
+
+def test_gazetteer_finds_the_longest_term(gazetteer):
+    words = _folded("según Europa Press y el EP en Abu Dabi")
+    assert gazetteer.match(words, 1) == (2, 'SOURCE')
+    assert gazetteer.match(words, 5) == (1, 'SOURCE')
+    assert gazetteer.match(words, 7) == (2, 'LOCATION')
+    assert gazetteer.match(words, 0) is None
+    assert gazetteer.match(words, 3) is None
+
+
+def test_gazetteer_lookups_ignore_case_and_accents(gazetteer):
+    assert gazetteer.match(_folded("EUROPA press"), 0) == (2, 'SOURCE')
+    assert gazetteer.match(_folded("Afganistan"), 0) == (1, 'LOCATION')
+
+
+def test_gazetteer_has_the_conjugated_verbs(gazetteer):
+    for form in ("afirmo", "dijo", "aseguraron", "segun", "explique", "sostuvo"):
+        assert form in gazetteer.verbs
+    assert "economia" not in gazetteer.verbs
+
+
+def test_estimate(gazetteer):
+    triage = TriageExtractor(full=_Full())
+    assert triage.estimate(NO_SOURCES) == {'reporters': [], 'entities': [], 'sources': []}
+    near = triage.estimate(NEAR)
+    assert "Luis de Guindos" in near['reporters'] and near['sources'] == ["Europa Press"]
+    assert triage.estimate(FAR)['sources'] == ["Europa Press", "EFE", "Reuters", "Agencias", "AP"]
+
+
+def test_near_boundary_is_the_margin_around_the_boundary():
+    triage = TriageExtractor(full=_Full(), boundary=2, margin=1)
+    near = [count for count in range(8)
+            if triage.near_boundary({'reporters': ['r'] * count, 'sources': []})]
+    assert near == [2, 3]
+    triage = TriageExtractor(full=_Full(), boundary=2, margin=2)
+    near = [count for count in range(8)
+            if triage.near_boundary({'reporters': [], 'sources': ['s'] * count})]
+    assert near == [1, 2, 3, 4]
+
+
+def test_only_texts_near_the_boundary_are_escalated():
+    full = _Full()
+    triage = TriageExtractor(full=full)
+    results = list(triage.parse_many([NO_SOURCES, NEAR, FAR]))
+    assert full.texts == [NEAR]
+    assert (triage.triaged, triage.escalated) == (2, 1)
+    assert results[0] == {'reporters': [], 'entities': [], 'sources': []}
+    assert results[1] == {'reporters': ["Reportero"], 'entities': [], 'sources': ["Fuente"]}
+    assert len(results[2]['sources']) == 5
+
+
+@pytest.mark.parametrize("verb, forms", [
+    ("afirmar", ["afirma", "afirmo", "afirmaron", "afirmado", "afirmando", "afirme"]),
+    ("decir", ["dice", "dijo", "dijeron", "dicho", "dira", "diga"]),
+    ("explicar", ["explico", "explique"]),
+    ("negar", ["niega", "nego", "niegue"]),
+    ("contar", ["cuenta", "conto"]),
+    ("defender", ["defiende", "defendio"]),
+    ("reconocer", ["reconoce", "reconozco", "reconocio"]),
+    ("recoger", ["recoge", "recojo", "recoja"]),
+    ("concluir", ["concluye", "concluyo", "concluyeron"]),
+    ("creer", ["cree", "creyo", "creyeron"]),
+    ("sostener", ["sostiene", "sostuvo", "sostenido"]),
+    ("imponer", ["impone", "impuso", "impuesto"]),
+    ("escribir", ["escribe", "escribio", "escrito"]),
+    ("señalar", ["senala", "senalo"]),
+])
+def test_conjugate_has_the_forms_of_the_texts(verb, forms):
+    conjugated = conjugate(verb)
+    assert verb.replace("ñ", "n") in conjugated
+    assert set(forms) <= conjugated
+
+
+def test_conjugate_keeps_other_terms():
+    assert conjugate("Según") == {"segun"}
+    assert conjugate("dar cuenta") == {"dar cuenta"}
+
+
+def test_every_reported_verb_is_conjugated():
+    from etiquetador_noticias.analyser.relabel import TJTOOL_DATA
+    with open(os.path.join(TJTOOL_DATA, "reported_verbs.txt"), encoding="utf-8") as f:
+        verbs = [line.strip() for line in f if line.strip()]
+    for verb in verbs:
+        forms = conjugate(verb)
+        # the present and the preterite of the third person
+        stem = _fold(verb)[:-2]
+        assert len(forms) > 40 and (stem + "o" in forms or stem + "io" in forms), verb